@@ -2,10 +2,17 @@ from fastapi import FastAPI
 from routes.character_routes import character_router
 from routes.eye_color_routes import eye_color_router
 from routes.keyphrase_routes import keyphrase_router
+from routes.metrics_routes import metrics_router
 from routes.user_routes import router as user_router
 from routes.sso_routes import router as sso_router
-from services.database import init_db
+from services.database import init_db, issue_consistency_token, CONSISTENCY_TOKEN_HEADER
 from services.redis_service import redis_service
+from services.keyphrase_job_service import keyphrase_job_service
+from services.phrase_write_buffer import phrase_write_buffer
+from services.character_service import character_service
+from services.prometheus_metrics import (
+    HTTP_REQUESTS, HTTP_REQUEST_DURATION, HTTP_REQUESTS_IN_FLIGHT, route_label, mark_worker_dead,
+)
 from fastapi.middleware.cors import CORSMiddleware
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
@@ -15,6 +22,7 @@ from slowapi.middleware import SlowAPIMiddleware
 from utils.logger import setup_logger
 import logging
 import os
+import time
 
 
 class StarWarsAPI:
@@ -52,10 +60,34 @@ class StarWarsAPI:
             response.headers["X-XSS-Protection"] = "1; mode=block"
             response.headers["Permissions-Policy"] = "geolocation=(), microphone=(), camera=()"
             return response
+        # Hand out a consistency token after writes so the client's next reads skip the replicas
+        @self.app.middleware("http")
+        async def add_consistency_token(request: Request, call_next):
+            response: Response = await call_next(request)
+            if getattr(request.state, "committed_write", False):
+                response.headers[CONSISTENCY_TOKEN_HEADER] = issue_consistency_token()
+            return response
+        # Request count, latency and in-flight metrics, labelled by route template rather than raw path
+        @self.app.middleware("http")
+        async def record_request_metrics(request: Request, call_next):
+            start = time.perf_counter()
+            status = 500
+            HTTP_REQUESTS_IN_FLIGHT.inc()
+            try:
+                response: Response = await call_next(request)
+                status = response.status_code
+                return response
+            finally:
+                HTTP_REQUESTS_IN_FLIGHT.dec()
+                route = route_label(request)
+                HTTP_REQUEST_DURATION.labels(route, request.method).observe(time.perf_counter() - start)
+                HTTP_REQUESTS.labels(route, request.method, str(status)).inc()
         # Add global rate limiting
         limiter = Limiter(key_func=get_remote_address, default_limits=["5/minute"])
         self.app.state.limiter = limiter
         self.app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+        # Prometheus scrapes every few seconds and must never be throttled
+        limiter.exempt(metrics_router.get_prometheus_metrics)
         self.limiter = limiter
     
     def setup_routes(self):
@@ -64,6 +96,7 @@ class StarWarsAPI:
         self.app.include_router(character_router.get_router())
         self.app.include_router(eye_color_router.get_router())
         self.app.include_router(keyphrase_router.get_router())
+        self.app.include_router(metrics_router.get_router())
         self.app.include_router(user_router)
         self.app.include_router(sso_router)
         
@@ -89,12 +122,19 @@ class StarWarsAPI:
                 except Exception as e:
                     logging.error(f"Error initializing database: {e}")
             await redis_service.initialize()
+            if hasattr(self.app.state, "database_service"):
+                await keyphrase_job_service.start(self.app.state.database_service.SessionLocal)
+                phrase_write_buffer.start(self.app.state.database_service.SessionLocal)
+                await character_service.warm_up(self.app.state.database_service.SessionLocal)
         
         @self.app.on_event("shutdown")
         async def on_shutdown():
             """Cleanup on shutdown"""
             logging.info("Application shutting down")
+            await keyphrase_job_service.stop()
+            await phrase_write_buffer.stop()
             await redis_service.close()
+            mark_worker_dead()
     
     def get_app(self) -> FastAPI:
         """Get the FastAPI application instance"""
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from models.base import BaseModel
 
@@ -6,6 +6,21 @@ from models.base import BaseModel
 class Character(BaseModel):
     """Character model representing Star Wars characters"""
     __tablename__ = "characters"
+    # On a sharded database characters are spread over the shards by id (see services/sharding.py)
+    __shard_key__ = "id"
+    __table_args__ = (
+        # Foreign key lookups and the list-by-eye-color-then-id pattern (eye color
+        # filters, eye color deletes checking for referencing characters)
+        Index("ix_characters_eye_color_id_id", "eye_color_id", "id"),
+        # Indexes backing the filter/sort combinations accepted by CharacterService.list_characters;
+        # the primary key is implicitly the last column of each
+        Index("ix_characters_eye_color_id_height", "eye_color_id", "height"),
+        Index("ix_characters_eye_color_id_mass", "eye_color_id", "mass"),
+        Index("ix_characters_height", "height"),
+        Index("ix_characters_mass", "mass"),
+        Index("ix_characters_hair_color", "hair_color"),
+        Index("ix_characters_skin_color", "skin_color"),
+    )
 
     name = Column(String(100), index=True)
     height = Column(Integer)
@@ -6,6 +6,8 @@ from .base import BaseModel
 class EyeColor(BaseModel):
     """Eye color model representing different eye colors for characters"""
     __tablename__ = "eye_colors"
+    # Copied to every shard so characters can be joined to their eye color locally
+    __replicated_to_shards__ = True
 
     id = Column(Integer, primary_key=True, index=True)
     color = Column(String(50), unique=True, nullable=False)
@@ -1,16 +1,33 @@
 # models/key_phrase.py
 
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey, UniqueConstraint, DDL, event
 from sqlalchemy.orm import relationship
 from .base import BaseModel
 
 
+def normalize_phrase(phrase: str) -> str:
+    """Normalize a phrase for duplicate detection (case and whitespace insensitive)"""
+    return " ".join(phrase.lower().split())
+
+
+def default_normalized_phrase(context) -> str:
+    """Column default that derives normalized_phrase from the phrase being inserted"""
+    return normalize_phrase(context.get_current_parameters()["phrase"])
+
+
 class KeyPhrase(BaseModel):
     """Key phrase model representing memorable phrases for characters"""
     __tablename__ = "key_phrases"
+    # Stored on the shard of their character
+    __shard_key__ = "character_id"
+    __table_args__ = (
+        # Leads with character_id, so its index also serves per-character lookups
+        UniqueConstraint("character_id", "normalized_phrase", name="uq_key_phrases_character_phrase"),
+    )
     
     character_id = Column(Integer, ForeignKey("characters.id"), nullable=False)
     phrase = Column(String(255), nullable=False)
+    normalized_phrase = Column(String(255), nullable=False, default=default_normalized_phrase)
 
     character = relationship("Character", back_populates="key_phrases")
     
@@ -31,4 +48,35 @@ class KeyPhrase(BaseModel):
         )
     
     def __repr__(self):
-        return f"<KeyPhrase(id={self.id}, character_id={self.character_id}, phrase='{self.phrase[:20]}...')>"
\ No newline at end of file
+        return f"<KeyPhrase(id={self.id}, character_id={self.character_id}, phrase='{self.phrase[:20]}...')>"
+
+
+# Full-text search index over phrases, kept in sync by the database itself.
+# SQLite uses an external-content FTS5 table maintained by triggers, Postgres a GIN
+# index on the tsvector expression and MySQL a FULLTEXT index.
+FULL_TEXT_INDEX_DDL = {
+    "sqlite": [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS key_phrases_fts USING fts5("
+        "phrase, content='key_phrases', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+        "CREATE TRIGGER IF NOT EXISTS key_phrases_fts_insert AFTER INSERT ON key_phrases BEGIN "
+        "INSERT INTO key_phrases_fts(rowid, phrase) VALUES (new.id, new.phrase); END",
+        "CREATE TRIGGER IF NOT EXISTS key_phrases_fts_delete AFTER DELETE ON key_phrases BEGIN "
+        "INSERT INTO key_phrases_fts(key_phrases_fts, rowid, phrase) VALUES ('delete', old.id, old.phrase); END",
+        "CREATE TRIGGER IF NOT EXISTS key_phrases_fts_update AFTER UPDATE ON key_phrases BEGIN "
+        "INSERT INTO key_phrases_fts(key_phrases_fts, rowid, phrase) VALUES ('delete', old.id, old.phrase); "
+        "INSERT INTO key_phrases_fts(rowid, phrase) VALUES (new.id, new.phrase); END",
+        "INSERT INTO key_phrases_fts(key_phrases_fts) VALUES ('rebuild')",
+    ],
+    "postgresql": [
+        "CREATE INDEX IF NOT EXISTS ix_key_phrases_phrase_tsv ON key_phrases USING GIN (to_tsvector('simple', phrase))",
+    ],
+    "mysql": [
+        "CREATE FULLTEXT INDEX ix_key_phrases_phrase_fulltext ON key_phrases (phrase)",
+    ],
+}
+
+for dialect_name, statements in FULL_TEXT_INDEX_DDL.items():
+    for statement in statements:
+        event.listen(KeyPhrase.__table__, "after_create", DDL(statement).execute_if(dialect=dialect_name))
+
+event.listen(KeyPhrase.__table__, "before_drop", DDL("DROP TABLE IF EXISTS key_phrases_fts").execute_if(dialect="sqlite"))
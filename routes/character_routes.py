@@ -1,12 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Union
+from typing import List, Optional, Union
 import os
-from services.database import get_db
+from services.database import get_db, get_read_db
 from services.character_service import character_service
 from services.cosmos_character_service import CosmosCharacterService
 from services.cosmos_service import get_cosmos_container
-from schemas.character import CharacterCreate, CharacterResponse, CharacterDeleteResponse
+from schemas.character import CharacterCreate, CharacterUpdate, CharacterResponse, CharacterDeleteResponse, CharacterWithPhrasesResponse, SimilarCharacterResponse, NeighborCharacterResponse, CharacterQuery
 from .base_router import BaseRouter
 from routes.user_routes import get_current_user, require_admin_user
 import logging
@@ -20,6 +22,32 @@ def get_character_service():
     else:
         return character_service
 
+def get_character_query(
+    height_gt: Optional[int] = Query(None, description="Only characters taller than this (cm)"),
+    height_lt: Optional[int] = Query(None, description="Only characters shorter than this (cm)"),
+    mass_gt: Optional[int] = Query(None, description="Only characters heavier than this (kg)"),
+    mass_lt: Optional[int] = Query(None, description="Only characters lighter than this (kg)"),
+    eye_color_id: Optional[int] = Query(None, description="ID of the eye color"),
+    eye_color: Optional[str] = Query(None, description="Eye color name"),
+    hair_color: Optional[str] = Query(None, description="Hair color"),
+    skin_color: Optional[str] = Query(None, description="Skin color"),
+    sort: Optional[str] = Query(None, description="Comma-separated sort fields, '-' prefix for descending, e.g. 'height,-mass'"),
+    limit: Optional[int] = Query(None, description="Maximum number of characters returned (1-1000, default 50)"),
+    offset: Optional[int] = Query(None, description="Number of characters to skip"),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+) -> CharacterQuery:
+    """Dependency that collects the character filter/sort query parameters"""
+    parameters = {
+        "height_gt": height_gt, "height_lt": height_lt, "mass_gt": mass_gt, "mass_lt": mass_lt,
+        "eye_color_id": eye_color_id, "eye_color": eye_color, "hair_color": hair_color, "skin_color": skin_color,
+        "sort": sort, "limit": limit, "offset": offset, "cursor": cursor,
+    }
+    try:
+        # Only pass what the client sent, so model_fields_set tells whether any parameter was used
+        return CharacterQuery(**{name: value for name, value in parameters.items() if value is not None})
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+
 class CharacterRouter(BaseRouter):
     """Router class for character-related endpoints"""
     
@@ -34,7 +62,39 @@ class CharacterRouter(BaseRouter):
             methods=["GET"],
             response_model=List[CharacterResponse],
             summary="Get all characters",
-            description="Retrieves a list of all characters with their details including eye color as string",
+            description="Retrieves a list of all characters with their details including eye color as string. "
+                        "Filter, sort and limit parameters are evaluated in the database (SQL only); "
+                        "the next page cursor is returned in the X-Next-Cursor header.",
+            dependencies=[Depends(get_current_user)]
+        )
+        
+        self.router.add_api_route(
+            "/search",
+            self.search_characters,
+            methods=["GET"],
+            response_model=List[CharacterResponse],
+            summary="Search characters by name (SQL Only)",
+            description="Case-insensitive prefix and typo-tolerant name search ranked by trigram similarity",
+            dependencies=[Depends(get_current_user)]
+        )
+        
+        self.router.add_api_route(
+            "/stats",
+            self.get_stats,
+            methods=["GET"],
+            summary="Get character statistics (SQL Only)",
+            description="Counts per eye, hair and skin color plus height and mass histograms and percentiles",
+            dependencies=[Depends(get_current_user)]
+        )
+        
+        self.router.add_api_route(
+            "/query",
+            self.query_characters,
+            methods=["GET"],
+            response_model=List[CharacterResponse],
+            summary="Filter and sort characters in memory (SQL Only)",
+            description="Filters, sorts and paginates characters from the in-memory columnar snapshot "
+                        "(requires CHARACTER_SNAPSHOT_ENABLED=true)",
             dependencies=[Depends(get_current_user)]
         )
         
@@ -79,19 +139,59 @@ class CharacterRouter(BaseRouter):
             dependencies=[Depends(require_admin_user)]
         )
         
+        self.router.add_api_route(
+            "/{id}",
+            self.patch_character,
+            methods=["PATCH"],
+            response_model=CharacterResponse,
+            summary="Partially update a character (SQL Only)",
+            description="Updates only the fields sent in the body; nothing is written when no value changes",
+            dependencies=[Depends(require_admin_user)]
+        )
+        
         self.router.add_api_route(
             "/{id}/phrases",
             self.get_character_with_phrases,
             methods=["GET"],
+            response_model=CharacterWithPhrasesResponse,
             summary="Get character with phrases (SQL Only)",
             description="Retrieves a character with all their key phrases. This endpoint only works with the SQL database.",
             dependencies=[Depends(get_current_user)]
         )
+        
+        self.router.add_api_route(
+            "/{id}/similar-by-phrases",
+            self.get_similar_by_phrases,
+            methods=["GET"],
+            response_model=List[SimilarCharacterResponse],
+            summary="Get characters with similar phrases (SQL Only)",
+            description="Characters whose key phrases are most similar, by cosine similarity of TF-IDF phrase vectors",
+            dependencies=[Depends(get_current_user)]
+        )
+        
+        self.router.add_api_route(
+            "/{id}/neighbors",
+            self.get_neighbors,
+            methods=["GET"],
+            response_model=List[NeighborCharacterResponse],
+            summary="Get similar characters by attributes (SQL Only)",
+            description="The k nearest characters by standardized height and mass and one-hot encoded colors",
+            dependencies=[Depends(get_current_user)]
+        )
     
-    async def get_all_characters(self, service = Depends(get_character_service), db: AsyncSession = Depends(get_db)):
+    async def get_all_characters(self, response: Response, query: CharacterQuery = Depends(get_character_query),
+                                 service = Depends(get_character_service), db: AsyncSession = Depends(get_read_db)):
         """Get all characters endpoint"""
         logging.info("Getting all characters")
         try:
+            if query.model_fields_set:
+                if isinstance(service, CosmosCharacterService):
+                    raise HTTPException(status_code=400, detail="Filtering and sorting are not supported for CosmosDB.")
+                characters, next_cursor = await service.list_characters(db, query)
+                if next_cursor:
+                    response.headers["X-Next-Cursor"] = next_cursor
+                logging.debug(f"{len(characters)} characters found")
+                return characters
             if isinstance(service, CosmosCharacterService):
                 characters = await service.get_all_characters()
             else:
@@ -102,7 +202,7 @@ class CharacterRouter(BaseRouter):
             logging.error(f"Error getting all characters: {e}")
             raise self.handle_exception(e)
     
-    async def get_character_by_name(self, name: str, service = Depends(get_character_service), db: AsyncSession = Depends(get_db)):
+    async def get_character_by_name(self, name: str, service = Depends(get_character_service), db: AsyncSession = Depends(get_read_db)):
         """Get characters by name endpoint"""
         logging.info(f"Getting characters by name: {name}")
         try:
@@ -123,6 +223,50 @@ class CharacterRouter(BaseRouter):
             logging.error(f"Error getting characters by name '{name}': {e}")
             raise self.handle_exception(e)
     
+    async def search_characters(self, q: str = Query(..., min_length=1), limit: int = Query(10, ge=1, le=50), db: AsyncSession = Depends(get_read_db)):
+        """Search characters by name endpoint"""
+        db_type = os.getenv("DB_TYPE", "sql")
+        if db_type == "cosmos":
+            raise HTTPException(status_code=400, detail="Name search is not supported for CosmosDB.")
+
+        logging.info(f"Searching characters for: {q}")
+        try:
+            characters = await character_service.search_characters(db, q, limit)
+            logging.debug(f"{len(characters)} characters found for: {q}")
+            return characters
+        except Exception as e:
+            logging.error(f"Error searching characters for '{q}': {e}")
+            raise self.handle_exception(e)
+    
+    async def get_stats(self, db: AsyncSession = Depends(get_read_db)):
+        """Get character statistics endpoint"""
+        db_type = os.getenv("DB_TYPE", "sql")
+        if db_type == "cosmos":
+            raise HTTPException(status_code=400, detail="Statistics are not supported for CosmosDB.")
+
+        logging.info("Getting character statistics")
+        try:
+            return await character_service.get_stats(db)
+        except Exception as e:
+            logging.error(f"Error getting character statistics: {e}")
+            raise self.handle_exception(e)
+    
+    async def query_characters(self, query: CharacterQuery = Depends(get_character_query), db: AsyncSession = Depends(get_read_db)):
+        """Query characters from the in-memory snapshot endpoint"""
+        db_type = os.getenv("DB_TYPE", "sql")
+        if db_type == "cosmos":
+            raise HTTPException(status_code=400, detail="Character queries are not supported for CosmosDB.")
+
+        if query.cursor:
+            raise HTTPException(status_code=400, detail="Cursors are only supported by /character/getAll; use offset.")
+
+        logging.info(f"Querying characters: {query.model_dump(exclude_none=True)}")
+        try:
+            return await character_service.query_characters(db, query)
+        except Exception as e:
+            logging.error(f"Error querying characters: {e}")
+            raise self.handle_exception(e)
+    
     async def create_character(self, character: CharacterCreate, service = Depends(get_character_service), db: AsyncSession = Depends(get_db)):
         """Create character endpoint"""
         logging.info(f"Creating character: {character.name}")
@@ -175,7 +319,22 @@ class CharacterRouter(BaseRouter):
             logging.error(f"Error updating character with id {id}: {e}")
             raise self.handle_exception(e)
     
-    async def get_character_with_phrases(self, id: int, db: AsyncSession = Depends(get_db)):
+    async def patch_character(self, id: int, character: CharacterUpdate, db: AsyncSession = Depends(get_db)):
+        """Partially update character endpoint"""
+        db_type = os.getenv("DB_TYPE", "sql")
+        if db_type == "cosmos":
+            raise HTTPException(status_code=400, detail="Partial updates are not supported for CosmosDB.")
+
+        logging.info(f"Patching character with id: {id}")
+        try:
+            patched_char = await character_service.patch_character(db, id, character.model_dump(exclude_unset=True))
+            logging.info(f"Character with id {id} patched successfully")
+            return patched_char
+        except Exception as e:
+            logging.error(f"Error patching character with id {id}: {e}")
+            raise self.handle_exception(e)
+    
+    async def get_character_with_phrases(self, id: int, db: AsyncSession = Depends(get_read_db)):
         """Get character with phrases endpoint"""
         db_type = os.getenv("DB_TYPE", "sql")
         if db_type == "cosmos":
@@ -190,6 +349,38 @@ class CharacterRouter(BaseRouter):
             logging.error(f"Error getting character with phrases for id {id}: {e}")
             raise self.handle_exception(e)
 
+    
+    async def get_similar_by_phrases(self, id: int, limit: int = Query(10, ge=1, le=100), db: AsyncSession = Depends(get_read_db)):
+        """Get characters with similar phrases endpoint"""
+        db_type = os.getenv("DB_TYPE", "sql")
+        if db_type == "cosmos":
+            raise HTTPException(status_code=400, detail="Phrases are not supported for CosmosDB.")
+
+        logging.info(f"Getting characters similar by phrases to id: {id}")
+        try:
+            similar = await character_service.get_similar_by_phrases(db, id, limit)
+            logging.debug(f"{len(similar)} similar characters found for id {id}")
+            return similar
+        except Exception as e:
+            logging.error(f"Error getting characters similar to id {id}: {e}")
+            raise self.handle_exception(e)
+
+    
+    async def get_neighbors(self, id: int, k: int = Query(10, ge=1, le=100), db: AsyncSession = Depends(get_read_db)):
+        """Get nearest characters endpoint"""
+        db_type = os.getenv("DB_TYPE", "sql")
+        if db_type == "cosmos":
+            raise HTTPException(status_code=400, detail="Neighbours are not supported for CosmosDB.")
+
+        logging.info(f"Getting {k} nearest neighbours of character id: {id}")
+        try:
+            neighbors = await character_service.get_neighbors(db, id, k)
+            logging.debug(f"{len(neighbors)} neighbours found for id {id}")
+            return neighbors
+        except Exception as e:
+            logging.error(f"Error getting neighbours of character id {id}: {e}")
+            raise self.handle_exception(e)
+
 
 # Global character router instance
 character_router = CharacterRouter()
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from services.database import get_db
+from services.database import get_db, get_read_db
 from services.eye_color_service import eye_color_service
 from schemas.eye_color import EyeColorCreate, EyeColorResponse
 from .base_router import BaseRouter
@@ -66,7 +66,7 @@ class EyeColorRouter(BaseRouter):
             dependencies=[Depends(require_admin_user)]
         )
     
-    async def get_all_eye_colors(self, db: AsyncSession = Depends(get_db)):
+    async def get_all_eye_colors(self, db: AsyncSession = Depends(get_read_db)):
         """Get all eye colors endpoint"""
         logging.info("Getting all eye colors")
         try:
@@ -77,7 +77,7 @@ class EyeColorRouter(BaseRouter):
             logging.error(f"Error getting all eye colors: {e}")
             raise self.handle_exception(e)
     
-    async def get_eye_color_by_id(self, id: int, db: AsyncSession = Depends(get_db)):
+    async def get_eye_color_by_id(self, id: int, db: AsyncSession = Depends(get_read_db)):
         """Get eye color by ID endpoint"""
         logging.info(f"Getting eye color by id: {id}")
         try:
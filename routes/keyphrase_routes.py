@@ -1,8 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, Body
+from fastapi.responses import JSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from services.database import get_db
+from services.database import get_db, get_read_db
 from services.keyphrase_service import keyphrase_service
+from services.keyphrase_job_service import keyphrase_job_service
+from services.trending_service import trending_service
+from schemas.key_phrase import KeyPhraseSearchResult, TrendingPhrase
 from .base_router import BaseRouter
 from routes.user_routes import get_current_user, require_admin_user
 import logging
@@ -23,7 +27,39 @@ class KeyphraseRouter(BaseRouter):
             methods=["GET"],
             response_model=List[str],
             summary="Extract key phrases from text",
-            description="Extract key phrases from text using Azure Cognitive Services",
+            description="Extract key phrases from text using the configured extractor (Azure Cognitive Services or local)",
+            dependencies=[Depends(get_current_user)]
+        )
+        
+        # Extraction cache statistics
+        self.router.add_api_route(
+            "/cache/stats",
+            self.get_cache_stats,
+            methods=["GET"],
+            summary="Get key phrase cache statistics",
+            description="Get hit/miss counters of the key phrase extraction cache",
+            dependencies=[Depends(get_current_user)]
+        )
+        
+        # Full-text search over saved key phrases
+        self.router.add_api_route(
+            "/search",
+            self.search_key_phrases,
+            methods=["GET"],
+            response_model=List[KeyPhraseSearchResult],
+            summary="Search key phrases",
+            description="Full-text search over saved key phrases, ranked by relevance and paginated",
+            dependencies=[Depends(get_current_user)]
+        )
+        
+        # Most frequent key phrases across all characters
+        self.router.add_api_route(
+            "/trending",
+            self.get_trending_phrases,
+            methods=["GET"],
+            response_model=List[TrendingPhrase],
+            summary="Get trending key phrases",
+            description="Most frequent key phrases across all characters, overall or in the current hour/day",
             dependencies=[Depends(get_current_user)]
         )
         
@@ -34,10 +70,22 @@ class KeyphraseRouter(BaseRouter):
             methods=["POST"],
             response_model=List[str],
             summary="Extract and save key phrases for character",
-            description="Extract key phrases from text and save them for a character",
+            description="Extract key phrases from text and save them for a character. "
+                        "With async_mode=true the work is queued and 202 is returned with a job id.",
+            responses={202: {"description": "Extraction job accepted"}},
             dependencies=[Depends(require_admin_user)]
         )
         
+        # Get the status of an asynchronous extraction job
+        self.router.add_api_route(
+            "/jobs/{job_id}",
+            self.get_job_status,
+            methods=["GET"],
+            summary="Get key phrase job status",
+            description="Get the status of an asynchronous extract-and-save job",
+            dependencies=[Depends(get_current_user)]
+        )
+        
         # Get key phrases for a character
         self.router.add_api_route(
             "/{character_id}",
@@ -53,18 +101,65 @@ class KeyphraseRouter(BaseRouter):
         """Extract key phrases from text endpoint"""
         logging.info("Extracting key phrases from text")
         try:
-            phrases = await keyphrase_service.extract_key_phrases_azure(text)
+            phrases = await keyphrase_service.extract_key_phrases(text)
             logging.debug(f"Extracted {len(phrases)} phrases")
             return phrases
         except Exception as e:
             logging.error(f"Error extracting key phrases: {e}")
             raise self.handle_exception(e)
     
-    async def extract_and_save_phrases(self, character_id: int, text: str = Body(..., embed=True), db: AsyncSession = Depends(get_db)):
+    async def search_key_phrases(
+        self,
+        q: str = Query(..., min_length=1, description="Words to search for"),
+        limit: int = Query(20, ge=1, le=100),
+        offset: int = Query(0, ge=0),
+        db: AsyncSession = Depends(get_read_db)
+    ):
+        """Search key phrases endpoint"""
+        logging.info(f"Searching key phrases: {q}")
+        try:
+            return await keyphrase_service.search_key_phrases(db, q, limit, offset)
+        except Exception as e:
+            logging.error(f"Error searching key phrases for '{q}': {e}")
+            raise self.handle_exception(e)
+    
+    async def get_trending_phrases(
+        self,
+        limit: int = Query(10, ge=1, le=100),
+        window: str = Query("all", pattern="^(all|hour|day)$"),
+        db: AsyncSession = Depends(get_read_db)
+    ):
+        """Get trending key phrases endpoint"""
+        logging.info(f"Getting trending key phrases for window: {window}")
+        try:
+            return await trending_service.get_trending(db, limit, window)
+        except Exception as e:
+            logging.error(f"Error getting trending key phrases: {e}")
+            raise self.handle_exception(e)
+    
+    async def get_cache_stats(self):
+        """Get key phrase extraction cache statistics endpoint"""
+        logging.info("Getting key phrase cache statistics")
+        return keyphrase_service.get_cache_stats()
+    
+    async def extract_and_save_phrases(
+        self,
+        character_id: int,
+        text: str = Body(..., embed=True),
+        async_mode: bool = Query(False, description="Queue the extraction and return 202 with a job id"),
+        db: AsyncSession = Depends(get_db)
+    ):
         """Extract and save key phrases for character endpoint"""
         logging.info(f"Extracting and saving phrases for character_id: {character_id}")
         try:
-            phrases = await keyphrase_service.extract_key_phrases_azure(text)
+            if async_mode:
+                job = await keyphrase_job_service.submit(character_id, text)
+                return JSONResponse(
+                    status_code=202,
+                    content=job,
+                    headers={"Location": f"{self.router.prefix}/jobs/{job['id']}"}
+                )
+            phrases = await keyphrase_service.extract_key_phrases(text)
             await keyphrase_service.save_key_phrases_for_character(db, character_id, phrases)
             logging.info(f"Saved {len(phrases)} phrases for character_id: {character_id}")
             return phrases
@@ -72,7 +167,16 @@ class KeyphraseRouter(BaseRouter):
             logging.error(f"Error extracting and saving phrases for character_id {character_id}: {e}")
             raise self.handle_exception(e)
     
-    async def get_character_phrases(self, character_id: int, db: AsyncSession = Depends(get_db)):
+    async def get_job_status(self, job_id: str):
+        """Get key phrase job status endpoint"""
+        logging.info(f"Getting status of key phrase job: {job_id}")
+        try:
+            return await keyphrase_job_service.get_job(job_id)
+        except Exception as e:
+            logging.error(f"Error getting key phrase job {job_id}: {e}")
+            raise self.handle_exception(e)
+    
+    async def get_character_phrases(self, character_id: int, db: AsyncSession = Depends(get_read_db)):
         """Get key phrases for character endpoint"""
         logging.info(f"Getting phrases for character_id: {character_id}")
         try:
@@ -0,0 +1,64 @@
+from fastapi import Depends, HTTPException, Request, Response
+from .base_router import BaseRouter
+from routes.user_routes import get_current_user
+from services.prometheus_metrics import render_metrics, PROMETHEUS_METRICS_TOKEN
+import secrets
+import logging
+
+
+class MetricsRouter(BaseRouter):
+    """Router class for operational metrics endpoints"""
+    
+    def __init__(self):
+        super().__init__(prefix="/metrics", tags=["metrics"])
+    
+    def setup_routes(self):
+        """Setup all metrics routes"""
+        self.router.add_api_route(
+            "",
+            self.get_prometheus_metrics,
+            methods=["GET"],
+            summary="Get Prometheus metrics",
+            description="Request counts and latency per route, in-flight requests, Redis cache lookups, "
+                        "Azure key phrase latency and SQL statement counts, in the Prometheus text format"
+        )
+        self.router.add_api_route(
+            "/db-pool",
+            self.get_db_pool_stats,
+            methods=["GET"],
+            summary="Get database connection pool statistics",
+            description="Pool size, checked-out and overflow connections, checkout wait-time histogram "
+                        "and checkout timeouts of this worker",
+            dependencies=[Depends(get_current_user)]
+        )
+    
+    async def get_prometheus_metrics(self, request: Request):
+        """Get Prometheus metrics endpoint (exempt from rate limiting so scrapes are never rejected)"""
+        if PROMETHEUS_METRICS_TOKEN:
+            expected = f"Bearer {PROMETHEUS_METRICS_TOKEN}"
+            if not secrets.compare_digest(request.headers.get("Authorization", ""), expected):
+                raise HTTPException(status_code=401, detail="Invalid metrics token")
+        try:
+            content, content_type = render_metrics()
+            # The content type already names its charset, so it is set as a plain header
+            return Response(content=content, headers={"Content-Type": content_type})
+        except Exception as e:
+            logging.error(f"Error rendering Prometheus metrics: {e}")
+            raise self.handle_exception(e)
+    
+    async def get_db_pool_stats(self, request: Request):
+        """Get database connection pool statistics endpoint"""
+        logging.info("Getting database pool statistics")
+        try:
+            database_service = getattr(request.app.state, "database_service", None)
+            if database_service is None:
+                raise HTTPException(status_code=503, detail="Database is not initialized")
+            return database_service.pool_stats()
+        except Exception as e:
+            logging.error(f"Error getting database pool statistics: {e}")
+            raise self.handle_exception(e)
+
+
+# Global metrics router instance
+metrics_router = MetricsRouter()
+router = metrics_router.get_router()
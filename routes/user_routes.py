@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from schemas.user import UserCreateSchema, UserLoginSchema, UserResponseSchema, TokenSchema
 from services.user_service import user_service
-from services.database import get_db
+from services.database import get_db, get_read_db
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from .base_router import BaseRouter
 import logging
@@ -50,7 +50,7 @@ class UserRouter(BaseRouter):
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/users/login")
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_read_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="No se pudo validar las credenciales",
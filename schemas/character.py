@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, field_validator
-from typing import Optional, List, Any, Union
+from typing import Optional, List, Any, Tuple, Union
 from models.eye_color import EyeColor
 
 
@@ -44,5 +44,52 @@ class CharacterWithPhrasesResponse(CharacterResponse):
     key_phrases: List[str] = []
 
 
+class SimilarCharacterResponse(CharacterResponse):
+    similarity: float
+
+
+class NeighborCharacterResponse(CharacterResponse):
+    distance: float
+
+
+CHARACTER_SORT_FIELDS = ("id", "name", "height", "mass")
+
+
+class CharacterQuery(BaseModel):
+    height_gt: Optional[int] = Field(None, description="Only characters taller than this (cm)")
+    height_lt: Optional[int] = Field(None, description="Only characters shorter than this (cm)")
+    mass_gt: Optional[int] = Field(None, description="Only characters heavier than this (kg)")
+    mass_lt: Optional[int] = Field(None, description="Only characters lighter than this (kg)")
+    eye_color_id: Optional[int] = Field(None, gt=0, description="ID of the eye color")
+    eye_color: Optional[str] = Field(None, min_length=1, max_length=50, description="Eye color name")
+    hair_color: Optional[str] = Field(None, min_length=1, max_length=50, description="Hair color")
+    skin_color: Optional[str] = Field(None, min_length=1, max_length=50, description="Skin color")
+    sort: Optional[str] = Field(None, description="Comma-separated sort fields, '-' prefix for descending, e.g. 'height,-mass'")
+    limit: int = Field(50, ge=1, le=1000, description="Maximum number of characters returned")
+    offset: int = Field(0, ge=0, description="Number of characters to skip")
+    cursor: Optional[str] = Field(None, description="Cursor returned in the X-Next-Cursor header of the previous page")
+
+    @field_validator('sort')
+    @classmethod
+    def validate_sort(cls, v: Optional[str]) -> Optional[str]:
+        if v is None:
+            return v
+        for field in v.split(","):
+            if field.strip().lstrip("-") not in CHARACTER_SORT_FIELDS:
+                raise ValueError(f"Unknown sort field '{field.strip()}', expected one of {', '.join(CHARACTER_SORT_FIELDS)}")
+        return v
+
+    def filters(self) -> dict:
+        """The filter fields that were provided"""
+        return self.model_dump(exclude={"sort", "limit", "offset", "cursor"}, exclude_none=True)
+
+    def sort_fields(self) -> List[Tuple[str, bool]]:
+        """Sort as (field, descending) pairs"""
+        if not self.sort:
+            return []
+        fields = [field.strip() for field in self.sort.split(",")]
+        return [(field.lstrip("-"), field.startswith("-")) for field in fields]
+
+
 class CharacterDeleteResponse(BaseModel):
     message: str 
\ No newline at end of file
@@ -29,4 +29,17 @@ class KeyPhraseDeleteResponse(BaseModel):
 
 class CharacterKeyPhrasesOut(BaseModel):
     id_character: int
-    key_phrases: List[str]
\ No newline at end of file
+    key_phrases: List[str]
+
+
+class KeyPhraseSearchResult(BaseModel):
+    id: int
+    character_id: int
+    character_name: Optional[str] = None
+    phrase: str
+    score: float
+
+
+class TrendingPhrase(BaseModel):
+    phrase: str
+    count: int
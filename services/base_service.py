@@ -1,8 +1,14 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from typing import List, Dict, Any, Optional
+from sqlalchemy import select, insert, update, delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.sql.dml import Delete
+from typing import List, Dict, Any, Optional, Tuple
 from fastapi import HTTPException
 import logging
+from .sharding import get_shards, shard_session, fetch_all, broadcast
+
+# Attempts at creating a sharded record when another worker took the allocated id first
+SHARD_ID_ATTEMPTS = 3
 
 
 class BaseService:
@@ -11,13 +17,26 @@ class BaseService:
     def __init__(self, model_class):
         self.model_class = model_class
         self.logger = logging.getLogger(self.__class__.__name__)
+        # On a sharded database: the column rows are sharded by ("id" or the owning character's id),
+        # or whether the table is replicated to every shard
+        self.shard_key = getattr(model_class, "__shard_key__", None)
+        self.replicated = getattr(model_class, "__replicated_to_shards__", False)
+    
+    def _shard_session(self, db: AsyncSession, record_id: int):
+        """Session holding a record: its shard for tables sharded by id, otherwise db"""
+        return shard_session(db, record_id if self.shard_key == "id" else None)
     
-    async def get_all(self, db: AsyncSession) -> List[Any]:
-        """Get all records from the database"""
+    async def get_all(self, db: AsyncSession) -> List[Dict[str, Any]]:
+        """Get all records from the database as dicts of their columns, in id order"""
         self.logger.info(f"Getting all {self.model_class.__name__} records")
         try:
-            result = await db.execute(select(self.model_class))
-            records = result.scalars().all()
+            statement = select(self.model_class.__table__).order_by(self.model_class.id)
+            if self.shard_key and get_shards(db) is not None:
+                # Read every shard concurrently and merge in id order
+                rows = await fetch_all(db, statement, order_by=["id"])
+            else:
+                rows = (await db.execute(statement)).all()
+            records = [dict(row._mapping) for row in rows]
             self.logger.debug(f"Found {len(records)} records")
             return records
         except Exception as e:
@@ -28,13 +47,17 @@ class BaseService:
         """Get a record by its ID"""
         self.logger.info(f"Getting {self.model_class.__name__} with id: {record_id}")
         try:
-            result = await db.execute(select(self.model_class).where(self.model_class.id == record_id))
-            record = result.scalars().first()
+            async with self._shard_session(db, record_id) as shard_db:
+                result = await shard_db.execute(
+                    select(self.model_class).options(*self.load_options()).where(self.model_class.id == record_id)
+                )
+                record = result.scalars().first()
+                record_dict = record.to_dict() if record else None
             if not record:
                 self.logger.warning(f"{self.model_class.__name__} with id {record_id} not found")
                 raise HTTPException(status_code=404, detail=f"{self.model_class.__name__} not found")
             self.logger.debug(f"Found {self.model_class.__name__} with id: {record_id}")
-            return record.to_dict()
+            return record_dict
         except HTTPException:
             raise
         except Exception as e:
@@ -44,11 +67,16 @@ class BaseService:
     async def create(self, db: AsyncSession, data: dict) -> Any:
         """Create a new record"""
         self.logger.info(f"Creating new {self.model_class.__name__}")
+        shards = get_shards(db)
+        if shards is not None and self.shard_key == "id":
+            return await self._create_on_shard(db, data)
         try:
             record = self.model_class.from_dict(data)
             db.add(record)
             await db.commit()
             await db.refresh(record)
+            if self.replicated:
+                await broadcast(db, insert(self.model_class).values(**self._row_values(record)))
             self.logger.info(f"Successfully created {self.model_class.__name__} with id {record.id}")
             return record
         except Exception as e:
@@ -56,24 +84,130 @@ class BaseService:
             await db.rollback()
             raise HTTPException(status_code=400, detail=f"Error creating record: {str(e)}")
     
+    async def _create_on_shard(self, db: AsyncSession, data: dict) -> Any:
+        """Create a record of a table sharded by id: allocate a global id, then insert on its shard"""
+        shards = get_shards(db)
+        for attempt in range(SHARD_ID_ATTEMPTS):
+            record = self.model_class.from_dict(data)
+            record.id = await shards.allocate_id(self.model_class)
+            async with shard_session(db, record.id) as shard_db:
+                try:
+                    shard_db.add(record)
+                    await shard_db.commit()
+                    result = await shard_db.execute(
+                        select(self.model_class).options(*self.load_options())
+                        .where(self.model_class.id == record.id)
+                        .execution_options(populate_existing=True)
+                    )
+                    record = result.scalars().first()
+                    self.logger.info(f"Successfully created {self.model_class.__name__} with id {record.id} "
+                                     f"on shard {shards.shard_map.shard_for(record.id)}")
+                    return record
+                except IntegrityError as e:
+                    await shard_db.rollback()
+                    if attempt + 1 == SHARD_ID_ATTEMPTS:
+                        self.logger.error(f"Error creating {self.model_class.__name__}: {e}")
+                        raise HTTPException(status_code=400, detail=f"Error creating record: {str(e)}")
+                    self.logger.warning(f"{self.model_class.__name__} id {record.id} already taken, allocating another")
+                    shards.forget_ids(self.model_class)
+                except Exception as e:
+                    self.logger.error(f"Error creating {self.model_class.__name__}: {e}")
+                    await shard_db.rollback()
+                    raise HTTPException(status_code=400, detail=f"Error creating record: {str(e)}")
+    
+    def load_options(self) -> list:
+        """Loader options for single records read by get_by_id - to be overridden by subclasses"""
+        return []
+    
+    def returned_columns(self) -> list:
+        """Columns of the record returned by updates and deletes, named like to_dict() - to be overridden by subclasses"""
+        return list(self.model_class.__table__.columns)
+    
+    def _column_values(self, data: dict) -> dict:
+        columns = self.model_class.__table__.columns
+        return {key: value for key, value in data.items() if key in columns and key != "id"}
+    
+    def _row_values(self, record) -> dict:
+        return {column.key: getattr(record, column.key) for column in self.model_class.__table__.columns}
+    
+    async def _write_returning(self, db: AsyncSession, statement, record_id: int) -> Optional[Dict[str, Any]]:
+        """Run a single-record UPDATE/DELETE and return the affected record as a dict, or None if no row matched.
+        
+        Uses one UPDATE/DELETE ... RETURNING statement when the database supports it; otherwise
+        (MySQL) the record is read separately.
+        """
+        dialect = db.get_bind().dialect
+        is_delete = isinstance(statement, Delete)
+        if dialect.delete_returning if is_delete else dialect.update_returning:
+            result = await db.execute(statement.returning(*self.returned_columns()))
+            row = result.mappings().first()
+            return dict(row) if row is not None else None
+        
+        if is_delete:
+            record = await self._read_returned(db, record_id)
+            if record is not None:
+                await db.execute(statement)
+            return record
+        result = await db.execute(statement)
+        if result.rowcount == 0:
+            return None
+        return await self._read_returned(db, record_id)
+    
+    async def _read_returned(self, db: AsyncSession, record_id: int) -> Optional[Dict[str, Any]]:
+        """The returned_columns() of a record, or None if it does not exist"""
+        result = await db.execute(select(*self.returned_columns()).where(self.model_class.id == record_id))
+        row = result.mappings().first()
+        return dict(row) if row is not None else None
+    
     async def update(self, db: AsyncSession, record_id: int, data: dict) -> Dict[str, Any]:
         """Update an existing record"""
+        updated, _, _ = await self._update(db, record_id, data, only_changed=False)
+        return updated
+    
+    async def update_changed(self, db: AsyncSession, record_id: int, data: dict) -> Tuple[Dict[str, Any], bool, Dict[str, Any]]:
+        """Write only the values that differ from the stored ones.
+        
+        The stored record is read first, so nothing is written when no value changed. Returns the
+        record, whether it changed and the record as it was before the write.
+        """
+        return await self._update(db, record_id, data, only_changed=True)
+    
+    async def _update(self, db: AsyncSession, record_id: int, data: dict,
+                      only_changed: bool) -> Tuple[Dict[str, Any], bool, Optional[Dict[str, Any]]]:
+        async with self._shard_session(db, record_id) as shard_db:
+            updated, changed, stored = await self._update_in(shard_db, record_id, data, only_changed)
+        if changed and self.replicated:
+            await broadcast(db, update(self.model_class).where(self.model_class.id == record_id)
+                            .values(**self._column_values(data)))
+        return updated, changed, stored
+    
+    async def _update_in(self, db: AsyncSession, record_id: int, data: dict,
+                         only_changed: bool) -> Tuple[Dict[str, Any], bool, Optional[Dict[str, Any]]]:
         self.logger.info(f"Updating {self.model_class.__name__} with id: {record_id}")
+        values = self._column_values(data)
+        stored = None
         try:
-            result = await db.execute(select(self.model_class).where(self.model_class.id == record_id))
-            record = result.scalars().first()
-            if not record:
+            if only_changed:
+                stored = await self._read_returned(db, record_id)
+                if stored is None:
+                    self.logger.warning(f"{self.model_class.__name__} with id {record_id} not found for update")
+                    raise HTTPException(status_code=404, detail=f"{self.model_class.__name__} not found")
+                values = {key: value for key, value in values.items() if stored[key] != value}
+                if not values:
+                    self.logger.info(f"{self.model_class.__name__} with id {record_id} unchanged, skipping write")
+                    return stored, False, stored
+            elif not values:
+                return await self.get_by_id(db, record_id), False, None
+            
+            statement = update(self.model_class).where(self.model_class.id == record_id).values(**values)
+            record_dict = await self._write_returning(db, statement, record_id)
+            if record_dict is None:
                 self.logger.warning(f"{self.model_class.__name__} with id {record_id} not found for update")
                 raise HTTPException(status_code=404, detail=f"{self.model_class.__name__} not found")
             
-            for key, value in data.items():
-                if hasattr(record, key):
-                    setattr(record, key, value)
-            
             await db.commit()
-            await db.refresh(record)
             self.logger.info(f"Successfully updated {self.model_class.__name__} with id {record_id}")
-            return record.to_dict()
+            return record_dict, True, stored
         except HTTPException:
             raise
         except Exception as e:
@@ -83,18 +217,29 @@ class BaseService:
     
     async def delete(self, db: AsyncSession, record_id: int) -> bool:
         """Delete a record by its ID"""
+        await self.delete_returning(db, record_id)
+        return True
+    
+    async def delete_returning(self, db: AsyncSession, record_id: int) -> Dict[str, Any]:
+        """Delete a record by its ID and return it as it was before deletion"""
+        async with self._shard_session(db, record_id) as shard_db:
+            deleted = await self._delete_in(shard_db, record_id)
+        if self.replicated:
+            await broadcast(db, delete(self.model_class).where(self.model_class.id == record_id))
+        return deleted
+    
+    async def _delete_in(self, db: AsyncSession, record_id: int) -> Dict[str, Any]:
         self.logger.info(f"Deleting {self.model_class.__name__} with id: {record_id}")
         try:
-            result = await db.execute(select(self.model_class).where(self.model_class.id == record_id))
-            record = result.scalars().first()
-            if not record:
+            statement = delete(self.model_class).where(self.model_class.id == record_id)
+            record_dict = await self._write_returning(db, statement, record_id)
+            if record_dict is None:
                 self.logger.warning(f"{self.model_class.__name__} with id {record_id} not found for deletion")
                 raise HTTPException(status_code=404, detail=f"{self.model_class.__name__} not found")
             
-            db.delete(record)
             await db.commit()
             self.logger.info(f"Successfully deleted {self.model_class.__name__} with id {record_id}")
-            return True
+            return record_dict
         except HTTPException:
             raise
         except Exception as e:
@@ -0,0 +1,157 @@
+import time
+import numpy as np
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+NUMERIC_FEATURES = ("height", "mass")
+CATEGORICAL_FEATURES = ("hair_color", "skin_color", "eye_color_id")
+
+
+class CharacterNeighborIndex:
+    """Nearest-neighbour index over the numeric and categorical attributes of characters.
+
+    Height and mass are standardized (z-scores, missing values at the mean) and the
+    colors are one-hot encoded with each one-hot block scaled by 1/sqrt(2), so a
+    differing color adds 1 to the squared distance just like one standard deviation.
+    Colors are stored as integer codes; comparing codes gives exactly the one-hot
+    distance without materializing the one-hot matrix. Features are stored column-major
+    in NumPy arrays updated in place on writes; the standardized columns are cached
+    until the next write, and a query is one vectorized pass plus argpartition.
+    """
+
+    def __init__(self, initial_capacity: int = 1024):
+        self._initial_capacity = initial_capacity
+        self._reset(initial_capacity)
+        self.loaded_at = None
+
+    def _reset(self, capacity: int):
+        self.slots: Dict[int, int] = {}
+        self._free_slots: List[int] = []
+        self._size = 0
+        self._ids = np.zeros(capacity, dtype=np.int64)
+        self._active = np.zeros(capacity, dtype=bool)
+        self._numeric = np.full((len(NUMERIC_FEATURES), capacity), np.nan)
+        self._codes = np.full((len(CATEGORICAL_FEATURES), capacity), -1, dtype=np.int32)
+        self._scaled: Optional[np.ndarray] = None
+        self._category_codes: List[Dict[Any, int]] = [{} for _ in CATEGORICAL_FEATURES]
+        # Running count, sum and sum of squares of each numeric feature
+        self._count = np.zeros(len(NUMERIC_FEATURES))
+        self._sum = np.zeros(len(NUMERIC_FEATURES))
+        self._sum_squares = np.zeros(len(NUMERIC_FEATURES))
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def build(self, characters: Iterable[Dict[str, Any]]):
+        """Replace the index contents with character dicts"""
+        characters = list(characters)
+        self._reset(max(self._initial_capacity, len(characters)))
+        count = len(characters)
+        self._ids[:count] = [character["id"] for character in characters]
+        self._active[:count] = True
+        for column, feature in enumerate(NUMERIC_FEATURES):
+            self._numeric[column, :count] = [self._number(character.get(feature)) for character in characters]
+        for column, feature in enumerate(CATEGORICAL_FEATURES):
+            self._codes[column, :count] = [self._code(column, character.get(feature)) for character in characters]
+        self.slots = {character["id"]: slot for slot, character in enumerate(characters)}
+        self._size = count
+        self._scaled = None
+
+        known = ~np.isnan(self._numeric[:, :count])
+        values = np.where(known, self._numeric[:, :count], 0.0)
+        self._count = known.sum(axis=1).astype(float)
+        self._sum = values.sum(axis=1)
+        self._sum_squares = (values ** 2).sum(axis=1)
+        self.loaded_at = time.monotonic()
+
+    def upsert(self, character: Dict[str, Any]):
+        """Insert or replace a character's attributes"""
+        slot = self.slots.get(character["id"])
+        if slot is None:
+            slot = self._allocate_slot()
+            self.slots[character["id"]] = slot
+        else:
+            self._update_moments(self._numeric[:, slot], -1)
+        self._ids[slot] = character["id"]
+        self._active[slot] = True
+        self._numeric[:, slot] = [self._number(character.get(feature)) for feature in NUMERIC_FEATURES]
+        self._codes[:, slot] = [self._code(column, character.get(feature))
+                                for column, feature in enumerate(CATEGORICAL_FEATURES)]
+        self._update_moments(self._numeric[:, slot], 1)
+
+    def remove(self, character_id: int):
+        """Remove a character from the index"""
+        slot = self.slots.pop(character_id, None)
+        if slot is None:
+            return
+        self._update_moments(self._numeric[:, slot], -1)
+        self._active[slot] = False
+        self._free_slots.append(slot)
+
+    def nearest(self, character_id: int, k: int = 10) -> List[Tuple[int, float]]:
+        """The k characters closest to a character, nearest first, with their distances"""
+        slot = self.slots.get(character_id)
+        if slot is None:
+            return []
+
+        scaled = self._standardized()
+        distances = np.zeros(self._size, dtype=np.float32)
+        for column in scaled:
+            distances += np.square(column - column[slot])
+        for column in self._codes[:, :self._size]:
+            distances += column != column[slot]
+        distances[~self._active[:self._size]] = np.inf
+        distances[slot] = np.inf
+
+        k = min(k, len(self.slots) - 1)
+        if k <= 0:
+            return []
+        nearest = np.argpartition(distances, k - 1)[:k]
+        nearest = nearest[np.argsort(distances[nearest], kind="stable")]
+        return [(int(self._ids[index]), float(np.sqrt(distances[index]))) for index in nearest]
+
+    def _standardized(self) -> np.ndarray:
+        """Z-scores of the numeric features from the running sums, cached until the next write"""
+        if self._scaled is None:
+            count = np.maximum(self._count, 1)
+            mean = self._sum / count
+            std = np.sqrt(np.maximum(self._sum_squares / count - mean ** 2, 0))
+            std = np.where(std > 0, std, 1.0)
+            numeric = self._numeric[:, :self._size]
+            self._scaled = np.nan_to_num((numeric - mean[:, None]) / std[:, None]).astype(np.float32)
+        return self._scaled
+
+    def _update_moments(self, values: np.ndarray, sign: int):
+        self._scaled = None
+        known = ~np.isnan(values)
+        self._count += sign * known
+        self._sum += sign * np.where(known, values, 0.0)
+        self._sum_squares += sign * np.where(known, values, 0.0) ** 2
+
+    def _allocate_slot(self) -> int:
+        if self._free_slots:
+            return self._free_slots.pop()
+        if self._size == len(self._ids):
+            capacity = 2 * len(self._ids)
+            self._ids = np.resize(self._ids, capacity)
+            self._active = np.concatenate([self._active, np.zeros(capacity - len(self._active), dtype=bool)])
+            extra = capacity - self._numeric.shape[1]
+            self._numeric = np.hstack([self._numeric, np.full((len(NUMERIC_FEATURES), extra), np.nan)])
+            self._codes = np.hstack([self._codes, np.full((len(CATEGORICAL_FEATURES), extra), -1, dtype=np.int32)])
+        self._size += 1
+        return self._size - 1
+
+    def _code(self, column: int, value: Any) -> int:
+        if value is None:
+            return -1
+        if isinstance(value, str):
+            value = value.strip().lower()
+        codes = self._category_codes[column]
+        return codes.setdefault(value, len(codes))
+
+    @staticmethod
+    def _number(value: Optional[Any]) -> float:
+        return float(value) if value is not None else np.nan
@@ -1,13 +1,94 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, delete, func, or_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import selectinload
 from models.character import Character
 from models.eye_color import EyeColor
+from models.key_phrase import KeyPhrase
+from schemas.character import CharacterQuery
 from fastapi import HTTPException
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from .base_service import BaseService
 import logging
+import os
+import time
+import json
+import base64
+import hashlib
+from dotenv import load_dotenv
 from .redis_service import redis_service
+from .trigram_index import TrigramIndex
+from .phrase_write_buffer import phrase_write_buffer
+from .keyphrase_service import keyphrase_service, CHARACTER_PHRASES_CACHE_KEY
+from .phrase_similarity import phrase_similarity_index
+from .trending_service import trending_service
+from .character_neighbors import CharacterNeighborIndex
+from .character_stats import CharacterStats
+from .character_snapshot import CharacterSnapshot
+from .sharding import get_shards, shard_session, fetch_all, database_dialect, sorts_nulls_last
+
+load_dotenv()
+
+# In-process indexes only see this worker's writes; rebuild them periodically
+# so changes made by other workers show up in results
+CHARACTER_INDEX_REFRESH_SECONDS = int(os.getenv("CHARACTER_INDEX_REFRESH_SECONDS", 300))
+# Columnar in-memory copy of the characters table serving /character/query
+CHARACTER_SNAPSHOT_ENABLED = os.getenv("CHARACTER_SNAPSHOT_ENABLED", "false").lower() == "true"
+
+# Bumped on every character write so cached list queries are invalidated without enumerating their keys
+LIST_GENERATION_KEY = "items:generation"
+EQUALITY_FILTERS = ("eye_color_id", "hair_color", "skin_color")
+RANGE_FILTERS = {"height_gt": "height", "height_lt": "height", "mass_gt": "mass", "mass_lt": "mass"}
+# Columns returned by the API; reads select them directly instead of loading ORM objects
+CHARACTER_COLUMNS = (
+    Character.id, Character.name, Character.height, Character.mass,
+    Character.hair_color, Character.skin_color, Character.eye_color_id,
+)
+
+
+def select_characters():
+    """SELECT of the API columns of characters, joined to the eye color name"""
+    return (
+        select(*CHARACTER_COLUMNS, EyeColor.color.label("eye_color"))
+        .outerjoin(EyeColor, Character.eye_color_id == EyeColor.id)
+    )
+
+
+def indexed_column_orders() -> List[List[str]]:
+    """Column order of each index on characters, with the primary key as implicit last column"""
+    orders = [["id"]]
+    for index in sorted(Character.__table__.indexes, key=lambda index: index.name):
+        columns = [column.name for column in index.columns]
+        columns = columns if columns[-1] == "id" else columns + ["id"]
+        if columns not in orders:
+            orders.append(columns)
+    return orders
+
+def keyset_branches(order_columns: list, last_seen: List[Any], descending: bool, nulls_first: bool) -> List[list]:
+    """WHERE conditions of the rows after a keyset position, split into ranges in scan order.
+
+    Comparing (height, id) > (:height, :id) as one tuple skips every row whose height is NULL
+    and matches nothing when the cursor's own height is NULL. Instead, each range fixes a prefix
+    of the sort columns to the cursor's values (IS NULL for a NULL) and moves past the cursor
+    on the next column, with NULLs as their own range where the database sorts them: before
+    all values when nulls_first, after them otherwise. Each range is a plain index range, so
+    reading them in turn keeps the index order without sorting.
+    """
+    branches = []
+    for position in range(len(order_columns) - 1, -1, -1):
+        prefix = [
+            column.is_(None) if value is None else column == value
+            for column, value in zip(order_columns[:position], last_seen[:position])
+        ]
+        column, value = order_columns[position], last_seen[position]
+        if value is None:
+            if nulls_first:
+                branches.append(prefix + [column.is_not(None)])
+            continue
+        branches.append(prefix + [column < value if descending else column > value])
+        if not nulls_first:
+            branches.append(prefix + [column.is_(None)])
+    return branches
 
 
 class CharacterService(BaseService):
@@ -15,11 +96,40 @@ class CharacterService(BaseService):
     
     def __init__(self):
         super().__init__(Character)
+        self.name_index = TrigramIndex()
+        self.neighbor_index = CharacterNeighborIndex()
+        self.stats = CharacterStats()
+        self.snapshot = CharacterSnapshot()
+    
+    def load_options(self) -> list:
+        """Load the eye color with the character so to_dict() needs no lazy load"""
+        return [selectinload(Character.eye_color)]
+    
+    def returned_columns(self) -> list:
+        """The API columns, with the eye color name from a correlated subquery so writes stay one statement"""
+        eye_color = select(EyeColor.color).where(EyeColor.id == Character.eye_color_id).scalar_subquery()
+        return [*CHARACTER_COLUMNS, eye_color.label("eye_color")]
     
-    def validate_data(self, data: dict) -> bool:
-        """Validate character data before creating or updating"""
+    async def _delete_in(self, db: AsyncSession, record_id: int) -> Dict[str, Any]:
+        """Delete the character's key phrases in the same transaction; they are returned under "key_phrases" """
+        statement = delete(KeyPhrase).where(KeyPhrase.character_id == record_id)
+        if db.get_bind().dialect.delete_returning:
+            result = await db.execute(statement.returning(KeyPhrase.phrase))
+            phrases = result.scalars().all()
+        else:
+            result = await db.execute(select(KeyPhrase.phrase).where(KeyPhrase.character_id == record_id))
+            phrases = result.scalars().all()
+            await db.execute(statement)
+        deleted_character = await super()._delete_in(db, record_id)
+        deleted_character["key_phrases"] = phrases
+        return deleted_character
+    
+    def validate_data(self, data: dict, partial: bool = False) -> bool:
+        """Validate character data before creating or updating (only the given fields when partial)"""
         logging.debug(f"Validating data for character: {data.get('name')}")
         required_fields = ["name", "height", "mass", "hair_color", "skin_color", "eye_color_id"]
+        if partial:
+            required_fields = [field for field in required_fields if field in data]
         
         for field in required_fields:
             if field not in data or data[field] is None:
@@ -27,11 +137,11 @@ class CharacterService(BaseService):
                 raise HTTPException(status_code=400, detail=f"Field '{field}' is required")
         
         # Validate numeric fields
-        if not isinstance(data.get("height"), int) or data["height"] <= 0:
+        if "height" in required_fields and (not isinstance(data.get("height"), int) or data["height"] <= 0):
             logging.error(f"Validation failed: Invalid height for character {data.get('name')}")
             raise HTTPException(status_code=400, detail="Height must be a positive integer")
         
-        if not isinstance(data.get("mass"), int) or data["mass"] <= 0:
+        if "mass" in required_fields and (not isinstance(data.get("mass"), int) or data["mass"] <= 0):
             logging.error(f"Validation failed: Invalid mass for character {data.get('name')}")
             raise HTTPException(status_code=400, detail="Mass must be a positive integer")
         
@@ -45,12 +155,132 @@ class CharacterService(BaseService):
         if cached_characters is not None:
             return cached_characters
 
-        result = await db.execute(select(Character).options(selectinload(Character.eye_color)))
-        characters = result.scalars().all()
-        characters_dict = [char.to_dict() for char in characters]
+        rows = await fetch_all(db, select_characters().order_by(Character.id), order_by=["id"])
+        characters_dict = [dict(row._mapping) for row in rows]
         await redis_service.set(cache_key, characters_dict)
         return characters_dict
     
+    async def list_characters(self, db: AsyncSession, query: CharacterQuery) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Filter, sort and paginate characters with index-backed SELECTs.
+        
+        Without a cursor this is a single statement; with one, the keyset ranges after the
+        cursor (see keyset_branches) are read in turn until the page is full. Returns the
+        page and the cursor of the next page (None on the last page).
+        """
+        filters = query.filters()
+        conditions = []
+        equality = set()
+        ranges = set()
+        for name, value in filters.items():
+            if name in EQUALITY_FILTERS:
+                equality.add(name)
+                conditions.append(getattr(Character, name) == value)
+            elif name == "eye_color":
+                equality.add("eye_color_id")
+                eye_color_id = select(EyeColor.id).where(EyeColor.color == value).scalar_subquery()
+                conditions.append(Character.eye_color_id == eye_color_id)
+            elif name in RANGE_FILTERS:
+                column = RANGE_FILTERS[name]
+                ranges.add(column)
+                attribute = getattr(Character, column)
+                conditions.append(attribute > value if name.endswith("_gt") else attribute < value)
+        sort_columns, descending = self._plan_list_sort(equality, ranges, query.sort_fields())
+        
+        generation = await redis_service.get(LIST_GENERATION_KEY) or 0
+        query_key = json.dumps(query.model_dump(exclude_none=True), sort_keys=True)
+        cache_key = f"items:query:{generation}:{hashlib.sha256(query_key.encode()).hexdigest()}"
+        cached_page = await redis_service.get(cache_key)
+        if cached_page is not None:
+            return cached_page["characters"], cached_page["next_cursor"]
+        
+        order_columns = [getattr(Character, column) for column in sort_columns] + [Character.id]
+        statement = (
+            select_characters()
+            .where(*conditions)
+            .order_by(*[column.desc() if descending else column.asc() for column in order_columns])
+        )
+        # Rows up to the end of the page plus one, to know whether there is a next page
+        wanted = query.offset + query.limit + 1
+        if query.cursor:
+            last_seen = self._decode_cursor(query.cursor, len(order_columns))
+            nulls_first = sorts_nulls_last(db) == descending
+            statements = [statement.where(*branch) for branch in
+                          keyset_branches(order_columns, last_seen, descending, nulls_first)]
+            skip = query.offset
+        elif get_shards(db) is None:
+            statements = [statement.offset(query.offset)]
+            wanted, skip = query.limit + 1, 0
+        else:
+            # Each shard returns enough rows for the page; the offset applies to the merged rows
+            statements = [statement]
+            skip = query.offset
+        
+        logging.info(f"Listing characters with filters {filters} sorted by {sort_columns}")
+        try:
+            rows = []
+            for statement in statements:
+                rows += await fetch_all(db, statement.limit(wanted - len(rows)),
+                                        order_by=sort_columns + ["id"], descending=descending)
+                if len(rows) >= wanted:
+                    break
+            characters = [dict(row._mapping) for row in rows[skip:wanted]]
+        except Exception as e:
+            logging.error(f"Error listing characters: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Error listing characters: {str(e)}")
+        
+        next_cursor = None
+        if len(characters) > query.limit:
+            characters = characters[:query.limit]
+            last = characters[-1]
+            next_cursor = self._encode_cursor([last[column] for column in sort_columns] + [last["id"]])
+        await redis_service.set(cache_key, {"characters": characters, "next_cursor": next_cursor})
+        return characters, next_cursor
+
+    def _plan_list_sort(self, equality: set, ranges: set, sort: List[Tuple[str, bool]]) -> Tuple[List[str], bool]:
+        """Check a filter/sort combination against the indexes; return the sort columns and direction.
+        
+        A combination is accepted when some index starts with the equality columns (in any
+        order), followed by the range column if there is one, followed by the sort columns.
+        Range queries are ordered by the range column unless another sort column is given.
+        """
+        if len(ranges) > 1:
+            raise HTTPException(status_code=400, detail="Only one of height or mass can be filtered by range")
+        if len({descending for _, descending in sort}) > 1:
+            raise HTTPException(status_code=400, detail="All sort fields must use the same direction")
+        descending = bool(sort) and sort[0][1]
+        sort_columns = []
+        for column, _ in sort:
+            if column == "id":
+                # id is unique, later sort fields would never apply
+                break
+            sort_columns.append(column)
+        if not sort_columns and ranges:
+            sort_columns = list(ranges)
+        
+        wanted = list(ranges) + [column for column in sort_columns if column not in ranges]
+        for columns in indexed_column_orders():
+            if set(columns[:len(equality)]) == equality and columns[len(equality):][:len(wanted)] == wanted:
+                return sort_columns, descending
+        supported = "; ".join("(" + ", ".join(columns) + ")" for columns in indexed_column_orders())
+        raise HTTPException(
+            status_code=400,
+            detail=f"This filter/sort combination is not backed by an index. Indexed column orders: {supported}"
+        )
+
+    @staticmethod
+    def _encode_cursor(values: List[Any]) -> str:
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    @staticmethod
+    def _decode_cursor(cursor: str, length: int) -> List[Any]:
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except ValueError:
+            values = None
+        if not isinstance(values, list) or len(values) != length:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        return values
+    
     async def get_character_by_name(self, db: AsyncSession, name: str) -> List[Dict[str, Any]]:
         """Get characters by name"""
         cache_key = f"items:name:{name}"
@@ -60,18 +290,190 @@ class CharacterService(BaseService):
 
         logging.info(f"Querying for characters with name: {name}")
         try:
-            result = await db.execute(
-                select(Character).options(selectinload(Character.eye_color)).where(Character.name == name)
-            )
-            characters = result.scalars().all()
-            logging.info(f"Found {len(characters)} characters with name: {name}")
-            characters_dict = [char.to_dict() for char in characters]
+            rows = await fetch_all(db, select_characters().where(Character.name == name).order_by(Character.id),
+                                   order_by=["id"])
+            characters_dict = [dict(row._mapping) for row in rows]
+            logging.info(f"Found {len(characters_dict)} characters with name: {name}")
             await redis_service.set(cache_key, characters_dict)
             return characters_dict
         except Exception as e:
             logging.error(f"Error retrieving characters by name '{name}': {str(e)}")
             raise HTTPException(status_code=500, detail=f"Error retrieving characters: {str(e)}")
     
+    async def search_characters(self, db: AsyncSession, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Case-insensitive prefix and fuzzy name search, best matches first"""
+        logging.info(f"Searching characters for: {query}")
+        try:
+            # The trigram ranking cannot be merged across shards, they use the in-process index
+            if database_dialect(db).name == "postgresql" and get_shards(db) is None:
+                return await self._search_characters_trigram(db, query, limit)
+
+            await self._ensure_name_index(db)
+            return await self._load_ranked(db, self.name_index.search(query, limit))
+        except Exception as e:
+            logging.error(f"Error searching characters for '{query}': {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Error searching characters: {str(e)}")
+
+    async def _search_characters_trigram(self, db: AsyncSession, query: str, limit: int) -> List[Dict[str, Any]]:
+        """Search using the pg_trgm index on lower(name)"""
+        lowered_name = func.lower(Character.name)
+        lowered_query = query.lower()
+        prefix = lowered_query.replace("/", "//").replace("%", "/%").replace("_", "/_") + "%"
+        is_prefix = lowered_name.like(prefix, escape="/")
+        result = await db.execute(
+            select_characters()
+            .where(or_(is_prefix, lowered_name.op("%")(lowered_query)))
+            .order_by(is_prefix.desc(), func.similarity(lowered_name, lowered_query).desc(), Character.id)
+            .limit(limit)
+        )
+        return [dict(row) for row in result.mappings()]
+
+    async def _ensure_name_index(self, db: AsyncSession):
+        """Build the in-process name index on first use and refresh it when stale"""
+        index = self.name_index
+        if self._is_fresh(index):
+            return
+        index.build(await fetch_all(db, select(Character.id, Character.name)))
+        logging.info(f"Character name index built with {len(index.names)} names")
+
+    async def get_similar_by_phrases(self, db: AsyncSession, character_id: int, limit: int = 10) -> List[Dict[str, Any]]:
+        """Characters whose key phrases are most similar (TF-IDF cosine) to a character's"""
+        logging.info(f"Getting characters similar by phrases to id: {character_id}")
+        async with shard_session(db, character_id) as shard_db:
+            result = await shard_db.execute(select(Character.id).where(Character.id == character_id))
+            exists = result.scalars().first() is not None
+        if not exists:
+            logging.warning(f"Character with id {character_id} not found for phrase similarity")
+            raise HTTPException(status_code=404, detail="Character not found")
+        try:
+            if not self._is_fresh(phrase_similarity_index):
+                phrase_similarity_index.build(await fetch_all(db, select(KeyPhrase.character_id, KeyPhrase.phrase)))
+                logging.info(f"Phrase similarity index built for {phrase_similarity_index.character_count} characters")
+            matches = phrase_similarity_index.most_similar(character_id, limit)
+            return await self._load_ranked(db, matches, "similarity")
+        except Exception as e:
+            logging.error(f"Error getting characters similar to id {character_id}: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Error getting similar characters: {str(e)}")
+
+    async def get_neighbors(self, db: AsyncSession, character_id: int, k: int = 10) -> List[Dict[str, Any]]:
+        """The k characters with the closest height, mass and colors"""
+        logging.info(f"Getting {k} nearest neighbours of character id: {character_id}")
+        try:
+            if not self._is_fresh(self.neighbor_index):
+                rows = await fetch_all(db, select(
+                    Character.id, Character.height, Character.mass,
+                    Character.hair_color, Character.skin_color, Character.eye_color_id
+                ))
+                self.neighbor_index.build(dict(row._mapping) for row in rows)
+                logging.info(f"Character neighbour index built with {len(self.neighbor_index)} characters")
+        except Exception as e:
+            logging.error(f"Error building character neighbour index: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Error getting neighbours: {str(e)}")
+
+        if character_id not in self.neighbor_index.slots:
+            logging.warning(f"Character with id {character_id} not found for neighbours")
+            raise HTTPException(status_code=404, detail="Character not found")
+        return await self._load_ranked(db, self.neighbor_index.nearest(character_id, k), "distance")
+
+    async def get_stats(self, db: AsyncSession) -> Dict[str, Any]:
+        """Counts per color and height/mass distributions, from incrementally maintained aggregates"""
+        logging.info("Getting character statistics")
+        try:
+            if not self._is_fresh(self.stats):
+                rows = await fetch_all(db, select(
+                    Character.id, Character.height, Character.mass,
+                    Character.hair_color, Character.skin_color, Character.eye_color_id
+                ))
+                self.stats.build(dict(row._mapping) for row in rows)
+                logging.info(f"Character statistics computed for {len(self.stats.rows)} characters")
+            result = await db.execute(select(EyeColor.id, EyeColor.color))
+            return self.stats.to_dict(dict(result.all()))
+        except Exception as e:
+            logging.error(f"Error getting character statistics: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Error getting statistics: {str(e)}")
+
+    async def warm_up(self, session_factory):
+        """Load the in-process indexes that are meant to be ready before the first request"""
+        if not CHARACTER_SNAPSHOT_ENABLED:
+            return
+        try:
+            async with session_factory() as db:
+                await self.load_snapshot(db)
+        except Exception as e:
+            logging.error(f"Error loading character snapshot: {e}")
+
+    async def load_snapshot(self, db: AsyncSession):
+        """Load the columnar snapshot of the characters table"""
+        rows = await fetch_all(db, select(
+            Character.id, Character.name, Character.height, Character.mass,
+            Character.hair_color, Character.skin_color, Character.eye_color_id
+        ))
+        characters = [dict(row._mapping) for row in rows]
+        result = await db.execute(select(EyeColor.id, EyeColor.color))
+        self.snapshot.build(characters, dict(result.all()))
+        logging.info(f"Character snapshot loaded with {len(self.snapshot)} characters")
+
+    async def query_characters(self, db: AsyncSession, query: CharacterQuery) -> List[Dict[str, Any]]:
+        """Filter, sort and paginate characters from the in-memory snapshot"""
+        if not CHARACTER_SNAPSHOT_ENABLED:
+            logging.warning("Character query requested but the snapshot is disabled")
+            raise HTTPException(status_code=503, detail="Character snapshot is not enabled")
+        try:
+            if not self._is_fresh(self.snapshot):
+                await self.load_snapshot(db)
+            characters = self.snapshot.query(query.filters(), query.sort_fields(), query.limit, query.offset)
+            if any(character["eye_color_id"] is not None and character["eye_color"] is None for character in characters):
+                # An eye color was created after the snapshot was loaded
+                result = await db.execute(select(EyeColor.id, EyeColor.color))
+                self.snapshot.eye_colors = dict(result.all())
+                characters = self.snapshot.query(query.filters(), query.sort_fields(), query.limit, query.offset)
+            logging.debug(f"Character query matched {len(characters)} characters")
+            return characters
+        except Exception as e:
+            logging.error(f"Error querying characters: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Error querying characters: {str(e)}")
+
+    async def _load_ranked(self, db: AsyncSession, matches: List[Tuple[int, float]],
+                           score_field: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Load characters for (id, score) pairs, keeping their order and optionally including the score"""
+        if not matches:
+            return []
+        rows = await fetch_all(
+            db, select_characters().where(Character.id.in_([character_id for character_id, _ in matches]))
+        )
+        characters = {row.id: row._mapping for row in rows}
+        ranked = []
+        for character_id, score in matches:
+            if character_id in characters:
+                character_dict = dict(characters[character_id])
+                if score_field:
+                    character_dict[score_field] = score
+                ranked.append(character_dict)
+        return ranked
+
+    def _is_fresh(self, index) -> bool:
+        """Whether an in-process index is loaded and younger than the refresh interval"""
+        return index.is_loaded and time.monotonic() - index.loaded_at < CHARACTER_INDEX_REFRESH_SECONDS
+
+    def _on_character_written(self, character: Dict[str, Any]):
+        """Keep in-process indexes up to date after a character is created or updated"""
+        if self.name_index.is_loaded and "name" in character:
+            self.name_index.add(character["id"], character["name"])
+        if self.neighbor_index.is_loaded:
+            self.neighbor_index.upsert(character)
+        if self.stats.is_loaded:
+            self.stats.upsert(character)
+        if self.snapshot.is_loaded:
+            self.snapshot.upsert(character)
+
+    def _on_character_deleted(self, character_id: int):
+        """Drop a deleted character from in-process indexes"""
+        self.name_index.remove(character_id)
+        phrase_similarity_index.remove(character_id)
+        self.neighbor_index.remove(character_id)
+        self.stats.remove(character_id)
+        self.snapshot.remove(character_id)
+
     async def create_character(self, db: AsyncSession, character_data: dict) -> Character:
         """Create a new character with validation"""
         # Validate data
@@ -88,20 +490,45 @@ class CharacterService(BaseService):
         logging.info(f"Creating character: {character_data['name']}")
         new_character = await self.create(db, character_data)
         await redis_service.delete("items:all")
+        await redis_service.incr(LIST_GENERATION_KEY)
+        self._on_character_written({**character_data, "id": new_character.id})
         return new_character
     
+    async def _invalidate_character_caches(self, character_id: int, *names: Optional[str]):
+        """Drop cached lists and documents that may contain a written character"""
+        await redis_service.delete(CHARACTER_PHRASES_CACHE_KEY.format(character_id=character_id))
+        await redis_service.delete("items:all")
+        await redis_service.incr(LIST_GENERATION_KEY)
+        for name in set(names):
+            if name:
+                await redis_service.delete(f"items:name:{name}")
+
+    async def invalidate_eye_color_caches(self, db: AsyncSession, eye_color_id: int):
+        """Drop cached lists and documents of the characters with an eye color, which embed its name"""
+        characters = await fetch_all(db, select(Character.id, Character.name).where(Character.eye_color_id == eye_color_id))
+        logging.info(f"Invalidating cached documents of {len(characters)} characters with eye color id {eye_color_id}")
+        for character in characters:
+            await redis_service.delete(CHARACTER_PHRASES_CACHE_KEY.format(character_id=character.id))
+            if character.name:
+                await redis_service.delete(f"items:name:{character.name}")
+        await redis_service.delete("items:all")
+        await redis_service.incr(LIST_GENERATION_KEY)
+
+    async def _check_eye_color(self, db: AsyncSession, eye_color_id: int):
+        logging.debug(f"Checking for eye color with id: {eye_color_id}")
+        result = await db.execute(select(EyeColor.id).where(EyeColor.id == eye_color_id))
+        if result.scalars().first() is None:
+            logging.error(f"Eye color with id {eye_color_id} not found")
+            raise HTTPException(status_code=400, detail="Eye color not found")
+
     async def delete_character(self, db: AsyncSession, character_id: int) -> bool:
         """Delete a character by ID"""
-        character_to_delete = await self.get_by_id(db, character_id)
-        if not character_to_delete:
-            raise HTTPException(status_code=404, detail="Character not found")
-
         logging.info(f"Deleting character with id: {character_id}")
-        deleted = await self.delete(db, character_id)
-        if deleted:
-            await redis_service.delete("items:all")
-            await redis_service.delete(f"items:name:{character_to_delete.name}")
-        return deleted
+        deleted_character = await self.delete_returning(db, character_id)
+        self._on_character_deleted(character_id)
+        await trending_service.forget(deleted_character["key_phrases"])
+        await self._invalidate_character_caches(character_id, deleted_character["name"])
+        return True
     
     async def update_character(self, db: AsyncSession, character_id: int, character_data: dict) -> Dict[str, Any]:
         """Update a character with validation"""
@@ -111,55 +538,102 @@ class CharacterService(BaseService):
             
             # Check if eye color exists if provided
             if "eye_color_id" in character_data:
-                logging.debug(f"Checking for eye color with id: {character_data['eye_color_id']}")
-                result = await db.execute(select(EyeColor).where(EyeColor.id == character_data["eye_color_id"]))
-                eye_color = result.scalars().first()
-                if not eye_color:
-                    logging.error(f"Eye color with id {character_data['eye_color_id']} not found")
-                    raise HTTPException(status_code=400, detail="Eye color not found")
+                await self._check_eye_color(db, character_data["eye_color_id"])
         
         logging.info(f"Updating character with id: {character_id}")
-        updated_character = await self.update(db, character_id, character_data)
-        if updated_character:
-            await redis_service.delete("items:all")
-            if "name" in updated_character:
-                 await redis_service.delete(f"items:name:{updated_character['name']}")
+        # The stored row is read first so the cache of the old name is dropped on a rename
+        updated_character, changed, previous = await self.update_changed(db, character_id, character_data)
+        if changed:
+            self._on_character_written(updated_character)
+            await self._invalidate_character_caches(character_id, previous["name"], updated_character["name"])
         return updated_character
     
+    async def patch_character(self, db: AsyncSession, character_id: int, character_data: dict) -> Dict[str, Any]:
+        """Partially update a character, writing only the fields whose values changed"""
+        self.validate_data(character_data, partial=True)
+        if "eye_color_id" in character_data:
+            await self._check_eye_color(db, character_data["eye_color_id"])
+        
+        logging.info(f"Patching character with id: {character_id} (fields: {', '.join(character_data) or 'none'})")
+        character, changed, previous = await self.update_changed(db, character_id, character_data)
+        if changed:
+            self._on_character_written(character)
+            await self._invalidate_character_caches(character_id, previous["name"], character["name"])
+        else:
+            logging.info(f"Character with id {character_id} unchanged, caches kept")
+        return character
+    
     async def get_character_with_phrases(self, db: AsyncSession, character_id: int) -> Dict[str, Any]:
         """Get character with their key phrases"""
+        cache_key = CHARACTER_PHRASES_CACHE_KEY.format(character_id=character_id)
+        cached_character = await redis_service.get(cache_key)
+        if cached_character is not None:
+            return cached_character
+
         logging.info(f"Getting character with phrases for id: {character_id}")
-        result = await db.execute(
-            select(Character).options(selectinload(Character.eye_color)).where(Character.id == character_id)
-        )
-        character = result.scalars().first()
-        if not character:
+        # Character, eye color and phrases in one statement: one row per phrase, or one row without phrases
+        async with shard_session(db, character_id) as shard_db:
+            result = await shard_db.execute(
+                select_characters().add_columns(KeyPhrase.phrase)
+                .outerjoin(KeyPhrase, KeyPhrase.character_id == Character.id)
+                .where(Character.id == character_id)
+                .order_by(KeyPhrase.id)
+            )
+            rows = result.mappings().all()
+        if not rows:
             logging.warning(f"Character with id {character_id} not found for getting phrases")
             raise HTTPException(status_code=404, detail="Character not found")
         
-        character_dict = character.to_dict()
-        character_dict["key_phrases"] = character.get_key_phrases()
+        character_dict = {column: value for column, value in rows[0].items() if column != "phrase"}
+        character_dict["key_phrases"] = [row["phrase"] for row in rows if row["phrase"] is not None]
         logging.debug(f"Retrieved {len(character_dict['key_phrases'])} phrases for character id {character_id}")
+        await redis_service.set(cache_key, character_dict)
         return character_dict
     
-    async def add_character_phrase(self, db: AsyncSession, character_id: int, phrase: str) -> Dict[str, Any]:
-        """Add a key phrase to a character"""
+    async def add_character_phrase(self, db: AsyncSession, character_id: int, phrase: str,
+                                   wait_for_flush: bool = False) -> Dict[str, Any]:
+        """Add a key phrase to a character.
+        
+        When the phrase write buffer is enabled the insert is batched with other requests;
+        pass wait_for_flush=True to return only once the phrase is committed.
+        """
         logging.info(f"Adding phrase to character id: {character_id}")
-        result = await db.execute(
-            select(Character).options(selectinload(Character.eye_color)).where(Character.id == character_id)
-        )
-        character = result.scalars().first()
-        if not character:
-            logging.warning(f"Character with id {character_id} not found for adding phrase")
-            raise HTTPException(status_code=404, detail="Character not found")
+        async with shard_session(db, character_id) as shard_db:
+            result = await shard_db.execute(select(Character.id).where(Character.id == character_id))
+            if result.scalars().first() is None:
+                logging.warning(f"Character with id {character_id} not found for adding phrase")
+                raise HTTPException(status_code=404, detail="Character not found")
+            if not phrase_write_buffer.is_active:
+                return await self._insert_phrase(shard_db, character_id, phrase)
+            # End the read transaction so the connection goes back to the pool before waiting: the
+            # flush opens its own writer session, and the tuned SQLite writer pool has one connection
+            await shard_db.rollback()
         
-        from models.key_phrase import KeyPhrase
+        saved_phrase = await phrase_write_buffer.add(character_id, phrase, wait=wait_for_flush)
+        if not wait_for_flush:
+            logging.info(f"Phrase '{phrase}' buffered for character id {character_id}")
+            return {"id": None, "character_id": character_id, "phrase": phrase}
+        if saved_phrase is None:
+            logging.warning(f"Phrase '{phrase}' already exists for character id {character_id}")
+            raise HTTPException(status_code=409, detail="Phrase already exists for this character")
+        logging.info(f"Phrase '{phrase}' added to character id {character_id}")
+        return saved_phrase
+    
+    async def _insert_phrase(self, db: AsyncSession, character_id: int, phrase: str) -> Dict[str, Any]:
+        """Insert and commit one phrase on the session holding its character"""
         key_phrase = KeyPhrase(character_id=character_id, phrase=phrase)
         db.add(key_phrase)
-        await db.commit()
+        try:
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            logging.warning(f"Phrase '{phrase}' already exists for character id {character_id}")
+            raise HTTPException(status_code=409, detail="Phrase already exists for this character")
         await db.refresh(key_phrase)
         logging.info(f"Phrase '{phrase}' added to character id {character_id}")
-        return key_phrase.to_dict()
+        saved_phrase = key_phrase.to_dict()
+        await keyphrase_service.record_saved_phrases(character_id, [saved_phrase])
+        return saved_phrase
 
 # Global character service instance
 character_service = CharacterService() 
\ No newline at end of file
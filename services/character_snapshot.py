@@ -0,0 +1,184 @@
+import time
+import numpy as np
+from typing import Any, Dict, Iterable, List, Optional
+
+STRING_COLUMNS = ("name", "hair_color", "skin_color")
+NUMERIC_COLUMNS = ("height", "mass")
+
+
+class DictionaryColumn:
+    """Dictionary-encoded string column: each distinct value is stored once and rows hold integer codes"""
+
+    def __init__(self):
+        self.values: List[Optional[str]] = []
+        self.codes: Dict[Optional[str], int] = {}
+        self._sort_ranks: Optional[np.ndarray] = None
+
+    def encode(self, value: Optional[str]) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+            self._sort_ranks = None
+        return code
+
+    def lookup(self, value: Optional[str]) -> int:
+        """Code of a value, or -1 if no row has it"""
+        return self.codes.get(value, -1)
+
+    def sort_ranks(self) -> np.ndarray:
+        """Rank of each code in sorted value order, so codes can be sorted numerically"""
+        if self._sort_ranks is None:
+            order = sorted(range(len(self.values)), key=lambda code: (self.values[code] is None, self.values[code] or ""))
+            ranks = np.empty(len(self.values), dtype=np.int64)
+            ranks[order] = np.arange(len(self.values))
+            self._sort_ranks = ranks
+        return self._sort_ranks
+
+
+class CharacterSnapshot:
+    """In-process columnar copy of the characters table for filter/sort/limit queries.
+
+    Numeric columns are NumPy arrays (NaN for missing values) and string columns are
+    dictionary encoded. Filters become vectorized boolean masks and sorting a single
+    lexsort, so listing queries never touch the database. Rows are patched in place
+    on writes; deleted rows are masked out and their slots reused.
+    """
+
+    def __init__(self, initial_capacity: int = 1024):
+        self._initial_capacity = initial_capacity
+        self._reset(initial_capacity)
+        self.loaded_at = None
+
+    def _reset(self, capacity: int):
+        self.slots: Dict[int, int] = {}
+        self._free_slots: List[int] = []
+        self._size = 0
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.active = np.zeros(capacity, dtype=bool)
+        self.numeric = {column: np.full(capacity, np.nan) for column in NUMERIC_COLUMNS}
+        self.eye_color_ids = np.full(capacity, -1, dtype=np.int64)
+        self.strings = {column: DictionaryColumn() for column in STRING_COLUMNS}
+        self.string_codes = {column: np.zeros(capacity, dtype=np.int64) for column in STRING_COLUMNS}
+        self.eye_colors: Dict[int, str] = {}
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def build(self, characters: Iterable[Dict[str, Any]], eye_colors: Dict[int, str]):
+        """Replace the snapshot with character dicts and the eye color id -> name mapping"""
+        characters = list(characters)
+        count = len(characters)
+        self._reset(max(self._initial_capacity, count))
+        self.eye_colors = dict(eye_colors)
+        self.ids[:count] = [character["id"] for character in characters]
+        self.active[:count] = True
+        for column in NUMERIC_COLUMNS:
+            self.numeric[column][:count] = [np.nan if character.get(column) is None else character[column]
+                                            for character in characters]
+        self.eye_color_ids[:count] = [-1 if character.get("eye_color_id") is None else character["eye_color_id"]
+                                      for character in characters]
+        for column in STRING_COLUMNS:
+            encode = self.strings[column].encode
+            self.string_codes[column][:count] = [encode(character.get(column)) for character in characters]
+        self.slots = {character["id"]: slot for slot, character in enumerate(characters)}
+        self._size = count
+        self.loaded_at = time.monotonic()
+
+    def upsert(self, character: Dict[str, Any]):
+        """Insert or patch one row"""
+        slot = self.slots.get(character["id"])
+        if slot is None:
+            slot = self._allocate_slot()
+            self.slots[character["id"]] = slot
+        self.ids[slot] = character["id"]
+        self.active[slot] = True
+        for column in NUMERIC_COLUMNS:
+            self.numeric[column][slot] = np.nan if character.get(column) is None else character[column]
+        self.eye_color_ids[slot] = -1 if character.get("eye_color_id") is None else character["eye_color_id"]
+        if character.get("eye_color") is not None:
+            self.eye_colors[character["eye_color_id"]] = character["eye_color"]
+        for column in STRING_COLUMNS:
+            self.string_codes[column][slot] = self.strings[column].encode(character.get(column))
+
+    def remove(self, character_id: int):
+        """Mask out a deleted row"""
+        slot = self.slots.pop(character_id, None)
+        if slot is not None:
+            self.active[slot] = False
+            self._free_slots.append(slot)
+
+    def _allocate_slot(self) -> int:
+        if self._free_slots:
+            return self._free_slots.pop()
+        if self._size == len(self.ids):
+            capacity = 2 * len(self.ids)
+            self.ids = self._grow(self.ids, capacity, 0)
+            self.active = self._grow(self.active, capacity, False)
+            self.eye_color_ids = self._grow(self.eye_color_ids, capacity, -1)
+            self.numeric = {column: self._grow(values, capacity, np.nan) for column, values in self.numeric.items()}
+            self.string_codes = {column: self._grow(codes, capacity, 0) for column, codes in self.string_codes.items()}
+        self._size += 1
+        return self._size - 1
+
+    @staticmethod
+    def _grow(array: np.ndarray, capacity: int, fill: Any) -> np.ndarray:
+        grown = np.full(capacity, fill, dtype=array.dtype)
+        grown[:len(array)] = array
+        return grown
+
+    def query(self, filters: Dict[str, Any], sort: List[tuple], limit: int, offset: int = 0) -> List[Dict[str, Any]]:
+        """Rows matching all filters, ordered by (column, descending) pairs then id, paginated"""
+        size = self._size
+        mask = self.active[:size].copy()
+        for column in NUMERIC_COLUMNS:
+            values = self.numeric[column][:size]
+            if filters.get(f"{column}_gt") is not None:
+                mask &= values > filters[f"{column}_gt"]
+            if filters.get(f"{column}_lt") is not None:
+                mask &= values < filters[f"{column}_lt"]
+        if filters.get("eye_color_id") is not None:
+            mask &= self.eye_color_ids[:size] == filters["eye_color_id"]
+        if filters.get("eye_color") is not None:
+            eye_color_ids = [eye_color_id for eye_color_id, color in self.eye_colors.items() if color == filters["eye_color"]]
+            mask &= np.isin(self.eye_color_ids[:size], eye_color_ids)
+        for column in ("hair_color", "skin_color"):
+            if filters.get(column) is not None:
+                mask &= self.string_codes[column][:size] == self.strings[column].lookup(filters[column])
+
+        rows = np.flatnonzero(mask)
+        # np.lexsort sorts by its last key first, so keys go in reverse priority
+        keys = [self.ids[rows]]
+        for column, descending in reversed(sort):
+            keys.append(self._sort_key(column, rows, descending))
+        rows = rows[np.lexsort(keys)][offset:offset + limit]
+        return [self._row(slot) for slot in rows]
+
+    def _sort_key(self, column: str, rows: np.ndarray, descending: bool) -> np.ndarray:
+        if column == "id":
+            key = self.ids[rows].astype(float)
+        elif column in NUMERIC_COLUMNS:
+            key = self.numeric[column][rows]
+        else:
+            strings, codes = self.strings[column], self.string_codes[column][rows]
+            key = np.where(codes == strings.lookup(None), np.nan, strings.sort_ranks()[codes].astype(float))
+        key = -key if descending else key
+        # Missing values sort last in both directions
+        return np.where(np.isnan(key), np.inf, key)
+
+    def _row(self, slot: int) -> Dict[str, Any]:
+        eye_color_id = int(self.eye_color_ids[slot])
+        row = {"id": int(self.ids[slot])}
+        for column in ("name", "height", "mass", "hair_color", "skin_color"):
+            if column in NUMERIC_COLUMNS:
+                value = self.numeric[column][slot]
+                row[column] = None if np.isnan(value) else int(value)
+            else:
+                row[column] = self.strings[column].values[self.string_codes[column][slot]]
+        row["eye_color_id"] = eye_color_id if eye_color_id >= 0 else None
+        row["eye_color"] = self.eye_colors.get(eye_color_id)
+        return row
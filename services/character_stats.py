@@ -0,0 +1,129 @@
+import time
+import numpy as np
+from collections import Counter
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+CATEGORY_FEATURES = ("eye_color_id", "hair_color", "skin_color")
+
+# Fixed histogram bins so counts can be updated one character at a time; values past
+# the last edge go to an overflow bin
+DISTRIBUTION_BINS = {
+    "height": np.arange(0, 310, 10),
+    "mass": np.arange(0, 1510, 10),
+}
+PERCENTILES = (25, 50, 75, 90, 99)
+
+
+class CharacterStats:
+    """Aggregates over characters (category counts, height/mass distributions) kept up to date on writes.
+
+    The aggregates are computed once with NumPy and then adjusted by each create, update
+    and delete, so reading them costs the same regardless of how many characters exist.
+    """
+
+    def __init__(self):
+        self._reset()
+        self.loaded_at = None
+
+    def _reset(self):
+        self.rows: Dict[int, Tuple[Any, ...]] = {}
+        self.categories: Dict[str, Counter] = {feature: Counter() for feature in CATEGORY_FEATURES}
+        self.histograms = {feature: np.zeros(len(edges), dtype=np.int64) for feature, edges in DISTRIBUTION_BINS.items()}
+        self.sums = {feature: 0.0 for feature in DISTRIBUTION_BINS}
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    def build(self, characters: Iterable[Dict[str, Any]]):
+        """Replace the aggregates with ones computed from character dicts"""
+        self._reset()
+        characters = list(characters)
+        self.rows = {character["id"]: self._row(character) for character in characters}
+        for feature in CATEGORY_FEATURES:
+            values = [character.get(feature) for character in characters if character.get(feature) is not None]
+            if values:
+                labels, counts = np.unique(np.array(values), return_counts=True)
+                self.categories[feature] = Counter(dict(zip(labels.tolist(), counts.tolist())))
+        for feature, edges in DISTRIBUTION_BINS.items():
+            values = np.array([character[feature] for character in characters if character.get(feature) is not None],
+                              dtype=float)
+            self.histograms[feature] = np.bincount(self._bins(feature, values), minlength=len(edges))
+            self.sums[feature] = float(values.sum())
+        self.loaded_at = time.monotonic()
+
+    def upsert(self, character: Dict[str, Any]):
+        """Count a created character, or move an updated one between buckets"""
+        self.remove(character["id"])
+        row = self._row(character)
+        self.rows[character["id"]] = row
+        self._apply(row, 1)
+
+    def remove(self, character_id: int):
+        """Stop counting a character"""
+        row = self.rows.pop(character_id, None)
+        if row is not None:
+            self._apply(row, -1)
+
+    def _row(self, character: Dict[str, Any]) -> Tuple[Any, ...]:
+        return tuple(character.get(feature) for feature in CATEGORY_FEATURES + tuple(DISTRIBUTION_BINS))
+
+    def _apply(self, row: Tuple[Any, ...], sign: int):
+        for feature, value in zip(CATEGORY_FEATURES, row):
+            if value is not None:
+                self.categories[feature][value] += sign
+                if self.categories[feature][value] <= 0:
+                    del self.categories[feature][value]
+        for feature, value in zip(DISTRIBUTION_BINS, row[len(CATEGORY_FEATURES):]):
+            if value is not None:
+                self.histograms[feature][self._bins(feature, np.array([value], dtype=float))[0]] += sign
+                self.sums[feature] += sign * value
+
+    @staticmethod
+    def _bins(feature: str, values: np.ndarray) -> np.ndarray:
+        """Histogram bin of each value; bin i covers [edges[i], edges[i + 1])"""
+        edges = DISTRIBUTION_BINS[feature]
+        return np.clip(np.searchsorted(edges, values, side="right") - 1, 0, len(edges) - 1)
+
+    def distribution(self, feature: str) -> Dict[str, Any]:
+        """Count, mean, histogram and approximate percentiles of a numeric feature"""
+        edges = DISTRIBUTION_BINS[feature]
+        counts = self.histograms[feature]
+        total = int(counts.sum())
+        return {
+            "count": total,
+            "mean": self.sums[feature] / total if total else None,
+            "histogram": [
+                {"min": int(low), "max": int(high) if high is not None else None, "count": int(count)}
+                for low, high, count in zip(edges, list(edges[1:]) + [None], counts) if count
+            ],
+            "percentiles": {f"p{percentile}": self._percentile(feature, percentile) for percentile in PERCENTILES},
+        }
+
+    def _percentile(self, feature: str, percentile: float) -> Optional[float]:
+        """Percentile interpolated linearly inside its histogram bin"""
+        edges = DISTRIBUTION_BINS[feature]
+        counts = self.histograms[feature]
+        total = counts.sum()
+        if not total:
+            return None
+        cumulative = np.cumsum(counts)
+        target = percentile / 100 * total
+        index = int(np.searchsorted(cumulative, target))
+        below = cumulative[index - 1] if index else 0
+        width = edges[index + 1] - edges[index] if index + 1 < len(edges) else edges[-1] - edges[-2]
+        return float(edges[index] + (target - below) / counts[index] * width)
+
+    def to_dict(self, eye_color_names: Dict[int, str]) -> Dict[str, Any]:
+        """Aggregates in the shape returned by the API"""
+        return {
+            "total": len(self.rows),
+            "eye_colors": [
+                {"eye_color_id": eye_color_id, "eye_color": eye_color_names.get(eye_color_id), "count": count}
+                for eye_color_id, count in self.categories["eye_color_id"].most_common()
+            ],
+            "hair_colors": dict(self.categories["hair_color"].most_common()),
+            "skin_colors": dict(self.categories["skin_color"].most_common()),
+            "height": self.distribution("height"),
+            "mass": self.distribution("mass"),
+        }
@@ -1,64 +1,396 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy import event
 import os
+import time
+import itertools
 from dotenv import load_dotenv
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Callable, List, Optional
 import logging
 from fastapi import Request, FastAPI
+from .pool_metrics import InstrumentedAsyncPool, pool_status
+from .sharding import ShardMap, ShardSet
+from .schema_migrations import run_migrations
+from .prometheus_metrics import count_query
 
 load_dotenv()
 
+# Connection pool (ignored for SQLite, which opens a connection per session)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", -1))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "false").lower() == "true"
+# Prepared statements cached per asyncpg connection (0 disables, e.g. behind PgBouncer in transaction mode)
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", 100))
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() == "true"
+
+# Tuned SQLite for file databases: WAL journal and pragmas applied on every connection, one
+# writer connection (SQLite allows a single writer) and a pool of read-only reader connections
+SQLITE_TUNED = os.getenv("SQLITE_TUNED", "true").lower() == "true"
+SQLITE_READER_POOL_SIZE = int(os.getenv("SQLITE_READER_POOL_SIZE", 8))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+# Negative values are KiB, positive values pages
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", -64000))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+
+# Read replicas: comma-separated URLs, chosen per session by "round_robin" or "least_latency"
+DATABASE_REPLICA_URLS = os.getenv("DATABASE_REPLICA_URLS", "")
+DATABASE_REPLICA_STRATEGY = os.getenv("DATABASE_REPLICA_STRATEGY", "round_robin")
+# After a client writes, its reads go to the primary for this long so it sees its own writes
+DATABASE_READ_YOUR_WRITES_SECONDS = float(os.getenv("DATABASE_READ_YOUR_WRITES_SECONDS", 5))
+CONSISTENCY_TOKEN_HEADER = "X-Consistency-Token"
+# Weight of the newest sample in the moving average of replica statement latency
+REPLICA_LATENCY_SMOOTHING = 0.2
+
+# Sharding: characters and their key phrases spread over these databases (comma-separated URLs)
+# by character id, "hash" or "range"; range bounds are the first id of every shard after the first
+DATABASE_SHARD_URLS = os.getenv("DATABASE_SHARD_URLS", "")
+DATABASE_SHARD_STRATEGY = os.getenv("DATABASE_SHARD_STRATEGY", "hash")
+DATABASE_SHARD_RANGE_BOUNDS = os.getenv("DATABASE_SHARD_RANGE_BOUNDS", "")
+
+
+def is_tuned_sqlite(database_url: str) -> bool:
+    """Whether a URL is a SQLite file database that gets the tuned profile"""
+    return SQLITE_TUNED and database_url.startswith("sqlite") and ":memory:" not in database_url \
+        and not database_url.rstrip("/").endswith(":")
+
+
+def engine_options(database_url: str, read_only: bool = False) -> dict:
+    """create_async_engine keyword arguments for a database URL, from the DB_* and SQLITE_* settings"""
+    options = {"echo": DB_ECHO}
+    if database_url.startswith("sqlite"):
+        if is_tuned_sqlite(database_url):
+            options.update({
+                "poolclass": InstrumentedAsyncPool,
+                "pool_size": SQLITE_READER_POOL_SIZE if read_only else 1,
+                "max_overflow": 0,
+                "pool_timeout": DB_POOL_TIMEOUT,
+            })
+        return options
+    options.update({
+        "poolclass": InstrumentedAsyncPool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    })
+    if database_url.startswith("postgresql+asyncpg"):
+        options["connect_args"] = {"prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE}
+    return options
+
+
+def sqlite_pragmas(read_only: bool = False) -> List[str]:
+    """PRAGMA statements run on every new connection of a tuned SQLite engine"""
+    pragmas = [
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}",
+        f"PRAGMA cache_size={SQLITE_CACHE_SIZE}",
+        f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only=ON")
+    return pragmas
+
+
+def create_database_engine(database_url: str, read_only: bool = False, pool_name: str = "primary"):
+    """Create the async engine for a URL, counting its statements and applying the SQLite pragmas on connect when tuned.
+
+    pool_name labels the engine's pool metrics in Prometheus.
+    """
+    engine = create_async_engine(database_url, **engine_options(database_url, read_only))
+    metrics = getattr(engine.pool, "metrics", None)
+    if metrics is not None:
+        metrics.pool_name = pool_name
+    event.listen(engine.sync_engine, "before_cursor_execute", count_query)
+    if is_tuned_sqlite(database_url):
+        pragmas = sqlite_pragmas(read_only)
+        
+        @event.listens_for(engine.sync_engine, "connect")
+        def apply_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for pragma in pragmas:
+                cursor.execute(pragma)
+            cursor.close()
+    return engine
+
+
+def normalize_database_url(database_url: str) -> str:
+    """Add the async driver to a database URL if it is not present"""
+    if "sqlite" in database_url and "sqlite+" not in database_url:
+        return database_url.replace("sqlite://", "sqlite+aiosqlite://")
+    elif "postgresql" in database_url and "postgresql+" not in database_url:
+        return database_url.replace("postgresql://", "postgresql+asyncpg://")
+    elif "mysql" in database_url:
+        if "mysql+pymysql" in database_url:
+            return database_url.replace("mysql+pymysql", "mysql+asyncmy")
+        elif "mysql://" in database_url:
+            return database_url.replace("mysql://", "mysql+asyncmy://")
+    return database_url
+
+
+def issue_consistency_token() -> str:
+    """Token that pins the client's reads to the primary until the read-your-writes window ends"""
+    return str(int((time.time() + DATABASE_READ_YOUR_WRITES_SECONDS) * 1000))
+
+
+def is_pinned_to_primary(consistency_token: Optional[str]) -> bool:
+    """Whether a consistency token sent by a client is still inside its window"""
+    if not consistency_token:
+        return False
+    try:
+        return time.time() * 1000 < int(consistency_token)
+    except ValueError:
+        return False
+
+
+@event.listens_for(Session, "after_commit")
+def _flag_committed_write(session: Session):
+    # get_db stores the request state here so the consistency token middleware sees the write
+    request_state = session.info.get("request_state")
+    if request_state is not None:
+        request_state.committed_write = True
+
+
+class LazySession:
+    """Stands in for an AsyncSession and creates it on first use.
+
+    Requests that return from a cache never build a session. info can be filled in before
+    first use and is carried over to the real session.
+    """
+    
+    def __init__(self, create_session: Callable[[], AsyncSession], info: Optional[dict] = None):
+        self._create_session = create_session
+        self._session: Optional[AsyncSession] = None
+        self._checked_out = False
+        self.info = dict(info or {})
+    
+    @property
+    def is_used(self) -> bool:
+        """Whether the session checked out a connection; building it (e.g. for get_bind()) does not count"""
+        return self._checked_out
+    
+    def _get_session(self) -> AsyncSession:
+        if self._session is None:
+            self._session = self._create_session()
+            self._session.info.update(self.info)
+            self.info = self._session.info
+            event.listen(self._session.sync_session, "after_begin", self._on_begin)
+        return self._session
+    
+    def _on_begin(self, session: Session, transaction, connection):
+        """The session began a transaction on a connection checked out from the pool"""
+        self._checked_out = True
+    
+    def __getattr__(self, name: str):
+        return getattr(self._get_session(), name)
+    
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+
+class SessionUsage:
+    """Counts request sessions and how many were closed without running any SQL"""
+    
+    def __init__(self):
+        self.requests = 0
+        self.unused = 0
+    
+    def observe(self, session: LazySession):
+        self.requests += 1
+        if not session.is_used:
+            self.unused += 1
+    
+    def to_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "requests_without_queries": self.unused,
+            "unused_ratio": self.unused / self.requests if self.requests else 0.0,
+        }
+
+
+class ReplicaSet:
+    """Read replica engines and the policy that picks one for each read session"""
+    
+    def __init__(self, replica_urls: List[str], strategy: str = DATABASE_REPLICA_STRATEGY,
+                 session_info: Optional[dict] = None):
+        if strategy not in ("round_robin", "least_latency"):
+            raise ValueError(f"Unknown replica strategy '{strategy}'")
+        self.strategy = strategy
+        self.engines = [
+            create_database_engine(url, read_only=True, pool_name=f"replica{index}")
+            for index, url in enumerate(replica_urls)
+        ]
+        self.session_factories = [
+            sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False, autocommit=False,
+                         info=session_info or {})
+            for engine in self.engines
+        ]
+        # Moving average of statement latency per replica, None until measured
+        self.latencies: List[Optional[float]] = [None] * len(self.engines)
+        self._next = itertools.cycle(range(len(self.engines)))
+        for index, engine in enumerate(self.engines):
+            self._track_latency(engine, index)
+    
+    def __len__(self) -> int:
+        return len(self.engines)
+    
+    def _track_latency(self, engine, index: int):
+        def before_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info["query_started_at"] = time.perf_counter()
+        
+        def after_execute(conn, cursor, statement, parameters, context, executemany):
+            started_at = conn.info.pop("query_started_at", None)
+            if started_at is not None:
+                self.observe_latency(index, time.perf_counter() - started_at)
+        
+        event.listen(engine.sync_engine, "before_cursor_execute", before_execute)
+        event.listen(engine.sync_engine, "after_cursor_execute", after_execute)
+    
+    def observe_latency(self, index: int, seconds: float):
+        latency = self.latencies[index]
+        self.latencies[index] = seconds if latency is None else (
+            REPLICA_LATENCY_SMOOTHING * seconds + (1 - REPLICA_LATENCY_SMOOTHING) * latency
+        )
+    
+    def choose(self) -> int:
+        """Index of the replica to use for the next read session"""
+        if self.strategy == "least_latency":
+            # Unmeasured replicas go first so every replica gets a latency sample
+            return min(range(len(self.engines)), key=lambda index: self.latencies[index] or 0.0)
+        return next(self._next)
+    
+    async def dispose(self):
+        for engine in self.engines:
+            await engine.dispose()
+
+
 class DatabaseService:
     """Database service class for managing database connections and operations"""
     
-    def __init__(self):
-        self.database_url = os.getenv("DATABASE_URL")
+    def __init__(self, database_url: Optional[str] = None, replica_urls: Optional[List[str]] = None,
+                 replica_strategy: str = DATABASE_REPLICA_STRATEGY, shard_urls: Optional[List[str]] = None,
+                 shard_map: Optional[ShardMap] = None):
+        self.database_url = database_url or os.getenv("DATABASE_URL")
         if not self.database_url:
             # Use SQLite as default if no DATABASE_URL is provided
             self.database_url = "sqlite+aiosqlite:///./star_wars.db"
             logging.warning("DATABASE_URL not set, using default SQLite database")
-        
-        # Add async driver if not present
-        if "sqlite" in self.database_url and "sqlite+" not in self.database_url:
-            self.database_url = self.database_url.replace("sqlite://", "sqlite+aiosqlite://")
-        elif "postgresql" in self.database_url and "postgresql+" not in self.database_url:
-            self.database_url = self.database_url.replace("postgresql://", "postgresql+asyncpg://")
-        elif "mysql" in self.database_url:
-            if "mysql+pymysql" in self.database_url:
-                self.database_url = self.database_url.replace("mysql+pymysql", "mysql+asyncmy")
-            elif "mysql://" in self.database_url:
-                self.database_url = self.database_url.replace("mysql://", "mysql+asyncmy://")
+        self.database_url = normalize_database_url(self.database_url)
 
         logging.info(f"Connecting to database: {self.database_url}")
-        self.engine = create_async_engine(self.database_url, echo=True)
+        self.engine = create_database_engine(self.database_url)
+        
+        if shard_urls is None:
+            shard_urls = [url.strip() for url in DATABASE_SHARD_URLS.split(",") if url.strip()]
+        self.shards = None
+        if shard_urls:
+            if shard_map is None:
+                bounds = [int(bound) for bound in DATABASE_SHARD_RANGE_BOUNDS.split(",") if bound.strip()]
+                shard_map = ShardMap(len(shard_urls), DATABASE_SHARD_STRATEGY, bounds)
+            engines = [
+                create_database_engine(normalize_database_url(url), pool_name=f"shard{index}")
+                for index, url in enumerate(shard_urls)
+            ]
+            self.shards = ShardSet(engines, shard_map)
+            logging.info(f"Sharding characters over {len(self.shards)} databases ({shard_map.strategy})")
+        # Sessions carry the shards so services can route character reads and writes to them
+        self.session_info = {"shards": self.shards} if self.shards is not None else {}
+        
         self.SessionLocal = sessionmaker(
             bind=self.engine,
             class_=AsyncSession,
             expire_on_commit=False,
             autocommit=False,
+            info=self.session_info,
         )
+        self.session_usage = SessionUsage()
+        
+        if replica_urls is None:
+            replica_urls = [url.strip() for url in DATABASE_REPLICA_URLS.split(",") if url.strip()]
+        # Reader connections on the primary's own file see every commit, so reads never need pinning
+        self.replicas_see_writes = not replica_urls and is_tuned_sqlite(self.database_url)
+        if self.replicas_see_writes:
+            # WAL readers never block the writer, so reads get their own larger pool on the same file
+            replica_urls = [self.database_url]
+        self.replicas = ReplicaSet([normalize_database_url(url) for url in replica_urls], replica_strategy,
+                                   self.session_info)
+        if len(self.replicas):
+            logging.info(f"Routing reads to {len(self.replicas)} replicas ({self.replicas.strategy})")
+    
+    def pool_stats(self) -> dict:
+        """Connection pool occupancy and checkout wait metrics"""
+        stats = pool_status(self.engine.pool)
+        stats["sessions"] = self.session_usage.to_dict()
+        if len(self.replicas):
+            stats["replicas"] = [
+                {**pool_status(engine.pool), "latency_ms": latency * 1000 if latency is not None else None}
+                for engine, latency in zip(self.replicas.engines, self.replicas.latencies)
+            ]
+        if self.shards is not None:
+            stats["shards"] = [pool_status(engine.pool) for engine in self.shards.engines]
+        return stats
     
     async def get_db(self) -> AsyncGenerator[AsyncSession, None]:
-        """Get database session with automatic cleanup"""
-        logging.debug("Opening new database session")
-        async with self.SessionLocal() as session:
-            try:
-                yield session
-            finally:
-                logging.debug("Closing database session")
-                await session.close()
+        """Get database session, created on first use, with automatic cleanup"""
+        session = LazySession(self.SessionLocal, self.session_info)
+        try:
+            yield session
+        finally:
+            await self._close_session(session)
+    
+    async def get_read_db(self, consistency_token: Optional[str] = None) -> AsyncGenerator[AsyncSession, None]:
+        """Get a session for reads: a replica, or the primary when there are none or the client just wrote"""
+        if not len(self.replicas) or (not self.replicas_see_writes and is_pinned_to_primary(consistency_token)):
+            create_session = self.SessionLocal
+        else:
+            def create_session() -> AsyncSession:
+                # The replica is picked on first use so the choice reflects the latest latencies
+                replica = self.replicas.choose()
+                logging.debug(f"Opening read session on replica {replica}")
+                return self.replicas.session_factories[replica]()
+        
+        # Not delegated to get_db(): closing this generator early would leave that one's session open
+        session = LazySession(create_session, self.session_info)
+        try:
+            yield session
+        finally:
+            await self._close_session(session)
+    
+    async def _close_session(self, session: LazySession):
+        # AsyncSession already checks out a connection only for its first statement; the lazy
+        # wrapper also skips building the session for requests that never run one
+        self.session_usage.observe(session)
+        if session.is_used:
+            logging.debug("Closing database session")
+        await session.close()
+    
+    async def dispose(self):
+        """Close the connections of the primary, replica and shard engines"""
+        await self.engine.dispose()
+        await self.replicas.dispose()
+        if self.shards is not None:
+            await self.shards.dispose()
 
     async def init_db(self):
-        """Initialize database tables"""
+        """Initialize database tables (on the primary and every shard) and upgrade existing ones"""
         from models.base import Base
         logging.info("Initializing database tables")
-        async with self.engine.begin() as conn:
-            try:
-                await conn.run_sync(Base.metadata.create_all)
-                logging.info("Database tables initialized successfully")
-            except Exception as e:
-                logging.critical(f"Failed to initialize database tables: {e}")
-                raise
+        engines = [self.engine] + (self.shards.engines if self.shards is not None else [])
+        for engine in engines:
+            async with engine.begin() as conn:
+                try:
+                    await conn.run_sync(Base.metadata.create_all)
+                    if await conn.run_sync(run_migrations):
+                        logging.info(f"Migrated existing tables on {engine.url.render_as_string(hide_password=True)}")
+                except Exception as e:
+                    logging.critical(f"Failed to initialize database tables: {e}")
+                    raise
+        logging.info("Database tables initialized successfully")
     
     async def drop_db(self):
         """Drop all database tables"""
@@ -77,6 +409,13 @@ async def get_db(request: "Request") -> AsyncGenerator[AsyncSession, None]:
     """Dependency injection function for FastAPI"""
     database_service: "DatabaseService" = request.app.state.database_service
     async for session in database_service.get_db():
+        session.info["request_state"] = request.state
+        yield session
+
+async def get_read_db(request: "Request") -> AsyncGenerator[AsyncSession, None]:
+    """Dependency injection function for read-only endpoints, served by a replica when configured"""
+    database_service: "DatabaseService" = request.app.state.database_service
+    async for session in database_service.get_read_db(request.headers.get(CONSISTENCY_TOKEN_HEADER)):
         yield session
 
 # Convenience function for initialization
@@ -4,6 +4,7 @@ from models.eye_color import EyeColor
 from fastapi import HTTPException
 from typing import List, Dict, Any
 from .base_service import BaseService
+from .character_service import character_service
 import logging
 
 
@@ -34,12 +35,17 @@ class EyeColorService(BaseService):
     async def get_all_eye_colors(self, db: AsyncSession) -> List[Dict[str, Any]]:
         """Get all eye colors"""
         logging.info("Getting all eye colors")
-        return await self.get_all(db)
+        try:
+            result = await db.execute(select(EyeColor.id, EyeColor.color))
+            return [dict(row) for row in result.mappings()]
+        except Exception as e:
+            logging.error(f"Error retrieving eye colors: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Error retrieving eye colors: {str(e)}")
     
     async def get_eye_color_by_id(self, db: AsyncSession, eye_color_id: int) -> Dict[str, Any]:
         """Get eye color by ID"""
         logging.info(f"Getting eye color by id: {eye_color_id}")
-        return await self.get_by_id(db, eye_color_id)
+        return await self._get_one(db, EyeColor.id == eye_color_id, f"id {eye_color_id}")
     
     async def create_eye_color(self, db: AsyncSession, eye_color_data: dict) -> Dict[str, Any]:
         """Create a new eye color with validation"""
@@ -51,27 +57,35 @@ class EyeColorService(BaseService):
         """Update an eye color with validation"""
         self.validate_data(eye_color_data)
         logging.info(f"Updating eye color with id: {eye_color_id}")
-        return await self.update(db, eye_color_id, eye_color_data)
+        updated_eye_color = await self.update(db, eye_color_id, eye_color_data)
+        await character_service.invalidate_eye_color_caches(db, eye_color_id)
+        return updated_eye_color
     
     async def delete_eye_color(self, db: AsyncSession, eye_color_id: int) -> bool:
         """Delete an eye color by ID"""
         logging.info(f"Deleting eye color with id: {eye_color_id}")
-        return await self.delete(db, eye_color_id)
+        deleted = await self.delete(db, eye_color_id)
+        await character_service.invalidate_eye_color_caches(db, eye_color_id)
+        return deleted
     
     async def get_eye_color_by_color(self, db: AsyncSession, color: str) -> Dict[str, Any]:
         """Get eye color by color name"""
         logging.info(f"Getting eye color by color: {color}")
+        return await self._get_one(db, EyeColor.color == color, f"color '{color}'")
+    
+    async def _get_one(self, db: AsyncSession, condition, lookup: str) -> Dict[str, Any]:
+        """The eye color matching a condition, as a plain dict; lookup describes it in log messages"""
         try:
-            result = await db.execute(select(EyeColor).where(EyeColor.color == color))
-            eye_color = result.scalars().first()
-            if not eye_color:
-                logging.warning(f"Eye color not found with color: {color}")
+            result = await db.execute(select(EyeColor.id, EyeColor.color).where(condition))
+            eye_color = result.mappings().first()
+            if eye_color is None:
+                logging.warning(f"Eye color not found with {lookup}")
                 raise HTTPException(status_code=404, detail="Eye color not found")
-            return eye_color.to_dict()
+            return dict(eye_color)
         except HTTPException:
             raise
         except Exception as e:
-            logging.error(f"Error retrieving eye color by color '{color}': {str(e)}")
+            logging.error(f"Error retrieving eye color with {lookup}: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Error retrieving eye color: {str(e)}")
 
 # Global eye color service instance
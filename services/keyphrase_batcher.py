@@ -0,0 +1,120 @@
+import asyncio
+import os
+import time
+import logging
+from dotenv import load_dotenv
+from typing import Any, Awaitable, Callable, List, Optional, Set, Tuple
+
+load_dotenv()
+
+# Azure allows up to 10 documents per key phrase extraction call
+AZURE_BATCH_MAX_DOCUMENTS = int(os.getenv("AZURE_BATCH_MAX_DOCUMENTS", 10))
+AZURE_BATCH_WINDOW_MS = float(os.getenv("AZURE_BATCH_WINDOW_MS", 5))
+# Standard (S) tier allows 1000 calls per minute, free (F0) tier allows 20
+AZURE_RATE_LIMIT_PER_MINUTE = float(os.getenv("AZURE_RATE_LIMIT_PER_MINUTE", 1000))
+AZURE_RATE_LIMIT_BURST = int(os.getenv("AZURE_RATE_LIMIT_BURST", 10))
+
+
+class TokenBucket:
+    """Token bucket rate limiter for outgoing Azure calls"""
+
+    def __init__(self, rate_per_second: float, capacity: int):
+        self.rate_per_second = rate_per_second
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self._lock = None
+
+    def _refill(self):
+        """Add the tokens earned since the last refill"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate_per_second)
+        self.updated_at = now
+
+    async def acquire(self, tokens: float = 1):
+        """Wait until enough tokens are available and take them"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate_per_second
+                logging.debug(f"Azure rate limit reached, waiting {wait:.3f}s")
+                await asyncio.sleep(wait)
+
+
+class KeyphraseBatcher:
+    """Collects concurrent key phrase extraction requests and sends them as batched Azure calls"""
+
+    def __init__(
+        self,
+        client_factory: Callable[[], Awaitable[Any]],
+        window_ms: float = AZURE_BATCH_WINDOW_MS,
+        max_documents: int = AZURE_BATCH_MAX_DOCUMENTS,
+        rate_limiter: Optional[TokenBucket] = None,
+        model_version: Optional[str] = None,
+    ):
+        self.client_factory = client_factory
+        self.window = window_ms / 1000
+        self.max_documents = max_documents
+        self.rate_limiter = rate_limiter or TokenBucket(AZURE_RATE_LIMIT_PER_MINUTE / 60, AZURE_RATE_LIMIT_BURST)
+        self.model_version = model_version
+        self._pending: List[Tuple[dict, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def extract(self, text: str, language: str = "es") -> List[str]:
+        """Queue a document for the next batch and wait for its key phrases"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append(({"language": language, "text": text}, future))
+
+        if len(self._pending) >= self.max_documents:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        """Send every pending document, max_documents per Azure call"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        while self._pending:
+            batch = self._pending[:self.max_documents]
+            self._pending = self._pending[self.max_documents:]
+            task = asyncio.ensure_future(self._send(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: List[Tuple[dict, asyncio.Future]]):
+        """Call Azure once for the batch and fan the results back to each waiter"""
+        documents = [{"id": str(index), **document} for index, (document, _) in enumerate(batch)]
+        logging.info(f"Sending batch of {len(documents)} documents to Azure")
+        try:
+            azure_client = await self.client_factory()
+            await self.rate_limiter.acquire()
+            response = await azure_client.extract_key_phrases(documents, model_version=self.model_version)
+        except Exception as e:
+            logging.error(f"Azure batch call failed: {str(e)}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        results = {result.id: result for result in response}
+        for index, (_, future) in enumerate(batch):
+            if future.done():
+                continue
+            result = results.get(str(index))
+            if result is None:
+                future.set_exception(RuntimeError("Azure returned no result for document"))
+            elif result.is_error:
+                logging.error(f"Azure error: {result.error.code} - {result.error.message}")
+                future.set_exception(RuntimeError(f"Azure error: {result.error.code} - {result.error.message}"))
+            else:
+                future.set_result(list(result.key_phrases))
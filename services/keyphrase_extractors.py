@@ -0,0 +1,180 @@
+import os
+import re
+import json
+import math
+import logging
+import numpy as np
+from dotenv import load_dotenv
+from azure.core.credentials import AzureKeyCredential
+from azure.ai.textanalytics.aio import TextAnalyticsClient
+from fastapi import HTTPException
+from typing import Dict, Iterable, List, Optional
+from utils.stopwords import get_stopwords
+from .keyphrase_batcher import KeyphraseBatcher
+
+load_dotenv()
+
+AZURE_LANGUAGE_ENDPOINT = os.getenv("AZURE_LANGUAGE_ENDPOINT")
+AZURE_LANGUAGE_KEY = os.getenv("AZURE_LANGUAGE_KEY")
+AZURE_KEYPHRASE_MODEL_VERSION = os.getenv("AZURE_KEYPHRASE_MODEL_VERSION", "latest")
+KEYPHRASE_LOCAL_VOCABULARY = os.getenv("KEYPHRASE_LOCAL_VOCABULARY")
+KEYPHRASE_LOCAL_MAX_PHRASES = int(os.getenv("KEYPHRASE_LOCAL_MAX_PHRASES", 10))
+KEYPHRASE_LOCAL_MAX_WORDS = int(os.getenv("KEYPHRASE_LOCAL_MAX_WORDS", 4))
+
+FRAGMENT_SEPARATORS = re.compile(r"[.,;:!?¡¿()\[\]{}\"“”«»\n\r\t]+")
+WORD_PATTERN = re.compile(r"\w+(?:[-']\w+)*")
+
+
+class KeyphraseExtractor:
+    """Base class for key phrase extraction backends - to be overridden by subclasses"""
+
+    name = "base"
+    model_version = "none"
+
+    def is_available(self) -> bool:
+        """Whether the backend can currently be used"""
+        return True
+
+    async def extract(self, text: str, language: str = "es") -> List[str]:
+        """Extract key phrases from text"""
+        raise NotImplementedError
+
+
+class AzureKeyphraseExtractor(KeyphraseExtractor):
+    """Key phrase extraction backed by Azure Cognitive Services"""
+
+    name = "azure"
+    model_version = AZURE_KEYPHRASE_MODEL_VERSION
+
+    def __init__(self):
+        self._client = None
+        self._batcher = KeyphraseBatcher(self.get_client, model_version=self.model_version)
+
+    def is_available(self) -> bool:
+        return bool(AZURE_LANGUAGE_ENDPOINT and AZURE_LANGUAGE_KEY)
+
+    async def get_client(self):
+        """Lazy initialization of Azure client"""
+        if self._client is None:
+            if self.is_available():
+                logging.info("Initializing Azure Text Analytics client")
+                self._client = TextAnalyticsClient(
+                    endpoint=AZURE_LANGUAGE_ENDPOINT,
+                    credential=AzureKeyCredential(AZURE_LANGUAGE_KEY)
+                )
+            else:
+                logging.error("Azure Cognitive Services not configured. Check environment variables.")
+                raise HTTPException(status_code=500, detail="Azure Cognitive Services not configured")
+        return self._client
+
+    async def extract(self, text: str, language: str = "es") -> List[str]:
+        # Concurrent requests are batched into a single Azure call
+        return await self._batcher.extract(text, language)
+
+
+class LocalKeyphraseExtractor(KeyphraseExtractor):
+    """In-process key phrase extraction using RAKE scores weighted by TF-IDF.
+
+    Candidate phrases are runs of non-stopwords between punctuation. Each word is scored
+    as degree/frequency (RAKE) times its inverse document frequency from a precomputed
+    vocabulary, and phrases are ranked by the sum of their word scores.
+    """
+
+    name = "local"
+    model_version = "rake-tfidf-1"
+
+    def __init__(self, vocabulary_path: Optional[str] = KEYPHRASE_LOCAL_VOCABULARY,
+                 max_phrases: int = KEYPHRASE_LOCAL_MAX_PHRASES, max_words: int = KEYPHRASE_LOCAL_MAX_WORDS):
+        self.max_phrases = max_phrases
+        self.max_words = max_words
+        self.idf: Dict[str, float] = {}
+        self.default_idf = 1.0
+        if vocabulary_path:
+            self.load_vocabulary(vocabulary_path)
+
+    def load_vocabulary(self, path: str):
+        """Load document frequencies saved with save_vocabulary"""
+        logging.info(f"Loading key phrase vocabulary from {path}")
+        with open(path, encoding="utf-8") as vocabulary_file:
+            vocabulary = json.load(vocabulary_file)
+        self._set_document_frequencies(vocabulary["documents"], vocabulary["document_frequencies"])
+
+    def save_vocabulary(self, path: str, documents: Iterable[str], language: str = "es"):
+        """Compute document frequencies over a corpus and save them for load_vocabulary"""
+        document_count = 0
+        document_frequencies: Dict[str, int] = {}
+        stopwords = get_stopwords(language)
+        for document in documents:
+            document_count += 1
+            for word in set(WORD_PATTERN.findall(document.lower())):
+                if word not in stopwords:
+                    document_frequencies[word] = document_frequencies.get(word, 0) + 1
+        with open(path, "w", encoding="utf-8") as vocabulary_file:
+            json.dump({"documents": document_count, "document_frequencies": document_frequencies}, vocabulary_file)
+        self._set_document_frequencies(document_count, document_frequencies)
+
+    def _set_document_frequencies(self, document_count: int, document_frequencies: Dict[str, int]):
+        # Smoothed IDF; words missing from the vocabulary are treated as the rarest ones
+        self.idf = {word: math.log((1 + document_count) / (1 + frequency)) + 1
+                    for word, frequency in document_frequencies.items()}
+        self.default_idf = math.log(1 + document_count) + 1
+        logging.info(f"Key phrase vocabulary loaded with {len(self.idf)} words")
+
+    def _candidate_phrases(self, text: str, stopwords: frozenset) -> List[List[str]]:
+        """Split text into runs of non-stopwords, breaking on punctuation"""
+        candidates = []
+        for fragment in FRAGMENT_SEPARATORS.split(text):
+            current: List[str] = []
+            for word in WORD_PATTERN.findall(fragment):
+                if word.lower() in stopwords or word.isdigit():
+                    if current:
+                        candidates.append(current)
+                    current = []
+                    continue
+                current.append(word)
+                if len(current) == self.max_words:
+                    candidates.append(current)
+                    current = []
+            if current:
+                candidates.append(current)
+        return candidates
+
+    def extract_sync(self, text: str, language: str = "es") -> List[str]:
+        """Extract key phrases without leaving the current thread"""
+        candidates = self._candidate_phrases(text, get_stopwords(language))
+        if not candidates:
+            return []
+
+        word_ids: Dict[str, int] = {}
+        phrase_ids: Dict[str, int] = {}
+        surfaces: List[str] = []
+        # Every word occurrence counts towards word frequency and degree
+        occurrence_words: List[int] = []
+        occurrence_lengths: List[int] = []
+        # Each distinct phrase is scored once, from its words
+        phrase_words: List[int] = []
+        phrase_members: List[int] = []
+        for candidate in candidates:
+            ids = [word_ids.setdefault(word.lower(), len(word_ids)) for word in candidate]
+            occurrence_words.extend(ids)
+            occurrence_lengths.extend([len(candidate)] * len(candidate))
+            key = " ".join(candidate).lower()
+            if key not in phrase_ids:
+                phrase_ids[key] = len(surfaces)
+                surfaces.append(" ".join(candidate))
+                phrase_words.extend(ids)
+                phrase_members.extend([phrase_ids[key]] * len(ids))
+
+        words = np.array(occurrence_words)
+        frequency = np.bincount(words, minlength=len(word_ids))
+        degree = np.bincount(words, weights=np.array(occurrence_lengths, dtype=float), minlength=len(word_ids))
+        idf = np.array([self.idf.get(word, self.default_idf) for word in word_ids])
+        word_scores = degree / frequency * idf
+
+        phrase_scores = np.bincount(np.array(phrase_members), weights=word_scores[np.array(phrase_words)],
+                                    minlength=len(surfaces))
+        ranking = np.argsort(-phrase_scores, kind="stable")[:self.max_phrases]
+        return [surfaces[index] for index in ranking]
+
+    async def extract(self, text: str, language: str = "es") -> List[str]:
+        return self.extract_sync(text, language)
@@ -0,0 +1,180 @@
+import asyncio
+import os
+import time
+import uuid
+import logging
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from typing import Any, Dict, List, Optional
+from .keyphrase_service import keyphrase_service
+from .redis_service import redis_service
+
+load_dotenv()
+
+# "redis" shares the queue and job statuses between processes and nodes; "memory" keeps them
+# in-process, so a job is only visible to the worker process that accepted it (single process only).
+# The redis backend falls back to memory when Redis is not reachable at startup.
+KEYPHRASE_JOBS_BACKEND = os.getenv("KEYPHRASE_JOBS_BACKEND", "redis")
+KEYPHRASE_JOB_WORKERS = int(os.getenv("KEYPHRASE_JOB_WORKERS", 4))
+KEYPHRASE_JOB_QUEUE_SIZE = int(os.getenv("KEYPHRASE_JOB_QUEUE_SIZE", 1000))
+KEYPHRASE_JOB_MAX_ATTEMPTS = int(os.getenv("KEYPHRASE_JOB_MAX_ATTEMPTS", 3))
+KEYPHRASE_JOB_BACKOFF_SECONDS = float(os.getenv("KEYPHRASE_JOB_BACKOFF_SECONDS", 1))
+KEYPHRASE_JOB_EXPIRATION_SECONDS = int(os.getenv("KEYPHRASE_JOB_EXPIRATION_SECONDS", 24 * 3600))
+
+JOB_QUEUE_KEY = "keyphrases:jobs:queue"
+
+
+class KeyphraseJobService:
+    """Service class for running key phrase extraction jobs on a pool of background workers"""
+
+    def __init__(self):
+        self.backend = KEYPHRASE_JOBS_BACKEND
+        self._session_factory = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._workers: List[asyncio.Task] = []
+
+    async def start(self, session_factory):
+        """Start the worker pool"""
+        if self.backend == "redis" and not redis_service.redis_client:
+            logging.warning("Redis not available, key phrase jobs will use the in-process queue: "
+                            "with several worker processes, GET /keyphrases/jobs/{id} only finds jobs "
+                            "submitted to the same process")
+            self.backend = "memory"
+        self._session_factory = session_factory
+        self._queue = asyncio.Queue(maxsize=KEYPHRASE_JOB_QUEUE_SIZE)
+        self._workers = [asyncio.create_task(self._worker(number)) for number in range(KEYPHRASE_JOB_WORKERS)]
+        logging.info(f"Started {KEYPHRASE_JOB_WORKERS} key phrase job workers using the {self.backend} backend")
+
+    async def stop(self):
+        """Stop the worker pool"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        logging.info("Key phrase job workers stopped")
+
+    async def submit(self, character_id: int, text: str) -> Dict[str, Any]:
+        """Queue an extract-and-save job for a character"""
+        if not self._workers:
+            logging.error("Key phrase job submitted but no workers are running")
+            raise HTTPException(status_code=503, detail="Key phrase job workers are not running")
+
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": "queued",
+            "character_id": character_id,
+            "text": text,
+            "attempts": 0,
+            "phrases": None,
+            "error": None,
+            "created_at": time.time(),
+            "updated_at": time.time()
+        }
+        if self.backend == "redis":
+            await self._save_job(job)
+            if not await redis_service.push(JOB_QUEUE_KEY, job["id"]):
+                raise HTTPException(status_code=503, detail="Could not queue key phrase job")
+        else:
+            if self._queue.full():
+                logging.warning("Key phrase job queue is full")
+                raise HTTPException(status_code=503, detail="Key phrase job queue is full")
+            self._prune_jobs()
+            await self._save_job(job)
+            self._queue.put_nowait(job["id"])
+        logging.info(f"Queued key phrase job {job['id']} for character_id: {character_id}")
+        return self._public_job(job)
+
+    async def get_job(self, job_id: str) -> Dict[str, Any]:
+        """Get the status of a job"""
+        job = await self._load_job(job_id)
+        if job is None:
+            logging.warning(f"Key phrase job {job_id} not found")
+            raise HTTPException(status_code=404, detail="Job not found")
+        return self._public_job(job)
+
+    def _public_job(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Job fields returned to clients (the submitted text is omitted)"""
+        return {key: value for key, value in job.items() if key != "text"}
+
+    async def _save_job(self, job: Dict[str, Any]):
+        job["updated_at"] = time.time()
+        if self.backend == "redis":
+            await redis_service.set(f"keyphrases:jobs:{job['id']}", job, expiration=KEYPHRASE_JOB_EXPIRATION_SECONDS)
+        else:
+            self._jobs[job["id"]] = job
+
+    async def _load_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        if self.backend == "redis":
+            return await redis_service.get(f"keyphrases:jobs:{job_id}")
+        return self._jobs.get(job_id)
+
+    def _prune_jobs(self):
+        """Forget finished in-process jobs older than the expiration window"""
+        expired_before = time.time() - KEYPHRASE_JOB_EXPIRATION_SECONDS
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job["status"] in ("completed", "failed") and job["updated_at"] < expired_before]:
+            del self._jobs[job_id]
+
+    async def _next_job_id(self) -> Optional[str]:
+        if self.backend == "redis":
+            job_id = await redis_service.pop(JOB_QUEUE_KEY, timeout=1)
+            if job_id is None:
+                await asyncio.sleep(0.1)
+            return job_id
+        return await self._queue.get()
+
+    async def _worker(self, number: int):
+        """Take jobs from the queue until cancelled"""
+        logging.debug(f"Key phrase job worker {number} started")
+        while True:
+            job_id = await self._next_job_id()
+            if job_id is None:
+                continue
+            job = await self._load_job(job_id)
+            if job is None:
+                logging.warning(f"Key phrase job {job_id} expired before it could run")
+                continue
+            try:
+                await self._run(job)
+            except Exception as e:
+                logging.error(f"Unexpected error running key phrase job {job_id}: {e}")
+
+    async def _run(self, job: Dict[str, Any]):
+        """Extract and save phrases for a job, retrying failures with exponential backoff"""
+        for attempt in range(1, KEYPHRASE_JOB_MAX_ATTEMPTS + 1):
+            job["status"] = "running"
+            job["attempts"] = attempt
+            await self._save_job(job)
+            try:
+                phrases = await keyphrase_service.extract_key_phrases(job["text"])
+                async with self._session_factory() as db:
+                    await keyphrase_service.save_key_phrases_for_character(db, job["character_id"], phrases)
+                job["status"] = "completed"
+                job["phrases"] = phrases
+                job["error"] = None
+                await self._save_job(job)
+                logging.info(f"Key phrase job {job['id']} completed with {len(phrases)} phrases")
+                return
+            except HTTPException as e:
+                job["error"] = e.detail
+                if e.status_code < 500:
+                    # Client errors (e.g. unknown character) will not succeed on retry
+                    break
+            except Exception as e:
+                job["error"] = str(e)
+
+            if attempt < KEYPHRASE_JOB_MAX_ATTEMPTS:
+                delay = KEYPHRASE_JOB_BACKOFF_SECONDS * 2 ** (attempt - 1)
+                logging.warning(f"Key phrase job {job['id']} failed (attempt {attempt}), retrying in {delay}s: {job['error']}")
+                job["status"] = "retrying"
+                await self._save_job(job)
+                await asyncio.sleep(delay)
+
+        job["status"] = "failed"
+        await self._save_job(job)
+        logging.error(f"Key phrase job {job['id']} failed after {job['attempts']} attempts: {job['error']}")
+
+
+# Global keyphrase job service instance
+keyphrase_job_service = KeyphraseJobService()
@@ -1,20 +1,93 @@
 import os
+import re
+import asyncio
+import time
+import hashlib
+import unicodedata
 from dotenv import load_dotenv
-from azure.core.credentials import AzureKeyCredential
-from azure.ai.textanalytics.aio import TextAnalyticsClient
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from models.key_phrase import KeyPhrase
+from sqlalchemy import select, insert, func, table, column, literal_column, tuple_
+from sqlalchemy.dialects.mysql import match as mysql_match
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from models.key_phrase import KeyPhrase, normalize_phrase
 from models.character import Character
 from fastapi import HTTPException
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 from .base_service import BaseService
+from .keyphrase_extractors import AzureKeyphraseExtractor, LocalKeyphraseExtractor
+from .redis_service import redis_service
+from .trending_service import trending_service
+from .phrase_similarity import phrase_similarity_index
+from .sharding import get_shards, shard_session, fetch_all, database_dialect
+from .prometheus_metrics import AZURE_KEYPHRASE_DURATION
 import logging
 
 load_dotenv()
 
-AZURE_LANGUAGE_ENDPOINT = os.getenv("AZURE_LANGUAGE_ENDPOINT")
-AZURE_LANGUAGE_KEY = os.getenv("AZURE_LANGUAGE_KEY")
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?…])\s+")
+SEARCH_TERM = re.compile(r"\w+")
+
+# Cached /character/{id}/phrases document, dropped whenever the character or its phrases change
+CHARACTER_PHRASES_CACHE_KEY = "items:phrases:{character_id}"
+
+# SQLite FTS5 table created alongside key_phrases (see models/key_phrase.py)
+key_phrases_fts = table("key_phrases_fts", column("rowid"), column("rank"))
+
+# "azure", "local" or "auto" (Azure, falling back to the local extractor when it is missing or slow)
+KEYPHRASE_EXTRACTOR = os.getenv("KEYPHRASE_EXTRACTOR", "azure")
+KEYPHRASE_AZURE_TIMEOUT_MS = float(os.getenv("KEYPHRASE_AZURE_TIMEOUT_MS", 2000))
+# Azure rejects documents over 5120 characters, longer texts are split into chunks
+KEYPHRASE_MAX_DOCUMENT_CHARS = int(os.getenv("KEYPHRASE_MAX_DOCUMENT_CHARS", 5120))
+KEYPHRASE_CHUNK_CONCURRENCY = int(os.getenv("KEYPHRASE_CHUNK_CONCURRENCY", 5))
+# Extraction results only change with the model version, so they can live for a long time
+KEYPHRASE_CACHE_EXPIRATION_SECONDS = int(os.getenv("KEYPHRASE_CACHE_EXPIRATION_SECONDS", 30 * 24 * 3600))
+
+
+def split_into_chunks(text: str, max_chars: int) -> List[str]:
+    """Split text on sentence boundaries into chunks of at most max_chars characters"""
+    if len(text) <= max_chars:
+        return [text]
+    
+    chunks = []
+    current = ""
+    for sentence in SENTENCE_BOUNDARY.split(text):
+        # Sentences over the limit are cut on the last space that fits
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars + 1)
+            cut = cut if cut > 0 else max_chars
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def merge_chunk_phrases(chunk_phrases: List[List[str]]) -> List[str]:
+    """Merge phrases extracted from chunks, ranking phrases found in more chunks first"""
+    ranking: Dict[str, Tuple[int, int, int]] = {}
+    surfaces: Dict[str, str] = {}
+    order = 0
+    for phrases in chunk_phrases:
+        for position, phrase in enumerate(phrases):
+            key = normalize_phrase(phrase)
+            if key in ranking:
+                chunk_count, best_position, first_seen = ranking[key]
+                ranking[key] = (chunk_count + 1, min(best_position, position), first_seen)
+            else:
+                ranking[key] = (1, position, order)
+                surfaces[key] = phrase
+                order += 1
+    ordered = sorted(ranking, key=lambda key: (-ranking[key][0], ranking[key][1], ranking[key][2]))
+    return [surfaces[key] for key in ordered]
 
 
 class KeyphraseService(BaseService):
@@ -22,82 +95,226 @@ class KeyphraseService(BaseService):
     
     def __init__(self):
         super().__init__(KeyPhrase)
-        self._azure_client = None
+        self.azure_extractor = AzureKeyphraseExtractor()
+        self.local_extractor = LocalKeyphraseExtractor()
+        self.cache_hits = 0
+        self.cache_misses = 0
+    
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        """Normalize text so equivalent inputs share the same cache entry"""
+        return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+    
+    def get_extraction_cache_key(self, text: str, language: str, extractor=None) -> str:
+        """Build a content-addressed cache key for an extraction request.
+        
+        The key covers the extractor, its model version, the language and the normalized,
+        case-folded text, so texts differing only in whitespace or case share an entry.
+        """
+        extractor = extractor or self.azure_extractor
+        content = "\x1f".join([extractor.name, extractor.model_version, language, self.normalize_text(text).casefold()])
+        return f"keyphrases:extract:{hashlib.sha256(content.encode('utf-8')).hexdigest()}"
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Get hit/miss counters for the extraction cache"""
+        total = self.cache_hits + self.cache_misses
+        return {
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "hit_rate": self.cache_hits / total if total else 0.0
+        }
     
     async def get_azure_client(self):
         """Lazy initialization of Azure client"""
-        if self._azure_client is None:
-            if AZURE_LANGUAGE_ENDPOINT and AZURE_LANGUAGE_KEY:
-                logging.info("Initializing Azure Text Analytics client")
-                self._azure_client = TextAnalyticsClient(
-                    endpoint=AZURE_LANGUAGE_ENDPOINT,
-                    credential=AzureKeyCredential(AZURE_LANGUAGE_KEY)
-                )
-            else:
-                logging.error("Azure Cognitive Services not configured. Check environment variables.")
-                raise HTTPException(status_code=500, detail="Azure Cognitive Services not configured")
-        return self._azure_client
+        return await self.azure_extractor.get_client()
+    
+    async def extract_key_phrases(self, text: str, language: str = "es") -> List[str]:
+        """Extract key phrases from text with the configured extraction backend"""
+        if KEYPHRASE_EXTRACTOR == "local" or (KEYPHRASE_EXTRACTOR == "auto" and not self.azure_extractor.is_available()):
+            logging.info("Extracting key phrases with the local extractor")
+            return await self.local_extractor.extract(self.normalize_text(text), language)
+        
+        if KEYPHRASE_EXTRACTOR == "auto":
+            try:
+                return await asyncio.wait_for(self.extract_key_phrases_azure(text, language), KEYPHRASE_AZURE_TIMEOUT_MS / 1000)
+            except (asyncio.TimeoutError, HTTPException) as e:
+                logging.warning(f"Azure key phrase extraction unavailable, using the local extractor: {e!r}")
+                return await self.local_extractor.extract(self.normalize_text(text), language)
+        
+        return await self.extract_key_phrases_azure(text, language)
     
     async def extract_key_phrases_azure(self, text: str, language: str = "es") -> List[str]:
         """Extract key phrases from text using Azure Cognitive Services"""
+        text = self.normalize_text(text)
+        cache_key = self.get_extraction_cache_key(text, language)
+        cached_phrases = await redis_service.get(cache_key)
+        if cached_phrases is not None:
+            self.cache_hits += 1
+            return cached_phrases
+        self.cache_misses += 1
+
         azure_client = await self.get_azure_client()
         if not azure_client:
             raise HTTPException(status_code=500, detail="Azure Cognitive Services not configured")
 
         try:
             logging.info("Extracting key phrases using Azure Cognitive Services")
-            response = await azure_client.extract_key_phrases([
-                {"id": "1", "language": language, "text": text}
-            ])
-            result = response[0]
-            if result.is_error:
-                logging.error(f"Azure error: {result.error.code} - {result.error.message}")
-                raise RuntimeError(
-                    f"Azure error: {result.error.code} - {result.error.message}"
-                )
-            logging.info(f"Extracted {len(result.key_phrases)} key phrases")
-            return result.key_phrases
+            chunks = split_into_chunks(text, KEYPHRASE_MAX_DOCUMENT_CHARS)
+            if len(chunks) == 1:
+                key_phrases = await self._call_azure(text, language)
+            else:
+                key_phrases = await self._extract_chunks(chunks, language)
+            logging.info(f"Extracted {len(key_phrases)} key phrases")
         except Exception as e:
             logging.error(f"Error calling Azure for key phrase extraction: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Error calling Azure: {str(e)}")
+
+        await redis_service.set(cache_key, key_phrases, expiration=KEYPHRASE_CACHE_EXPIRATION_SECONDS)
+        return key_phrases
+    
+    async def _call_azure(self, text: str, language: str) -> List[str]:
+        """One Azure extraction request, timed for the azure_keyphrase_request_duration_seconds histogram"""
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            key_phrases = await self.azure_extractor.extract(text, language)
+            outcome = "success"
+            return key_phrases
+        except asyncio.CancelledError:
+            # The "auto" extractor gave up waiting and fell back to the local one
+            outcome = "cancelled"
+            raise
+        finally:
+            AZURE_KEYPHRASE_DURATION.labels(outcome).observe(time.perf_counter() - start)
+    
+    async def _extract_chunks(self, chunks: List[str], language: str) -> List[str]:
+        """Extract key phrases from chunks of a long text concurrently and merge them"""
+        logging.info(f"Text split into {len(chunks)} chunks for key phrase extraction")
+        semaphore = asyncio.Semaphore(KEYPHRASE_CHUNK_CONCURRENCY)
+        
+        async def extract_chunk(chunk: str) -> List[str]:
+            async with semaphore:
+                return await self._call_azure(chunk, language)
+        
+        chunk_phrases = await asyncio.gather(*[extract_chunk(chunk) for chunk in chunks])
+        return merge_chunk_phrases(chunk_phrases)
     
     async def get_keyphrases_by_character(self, db: AsyncSession, character_id: int) -> List[Dict[str, Any]]:
         """Get all key phrases for a specific character"""
         try:
             # Check if character exists
             logging.info(f"Getting keyphrases for character_id: {character_id}")
-            result = await db.execute(select(Character).where(Character.id == character_id))
-            character = result.scalars().first()
-            if not character:
-                logging.warning(f"Character not found with id: {character_id}")
-                raise HTTPException(status_code=400, detail="Character not found")
-            
-            result = await db.execute(select(KeyPhrase).where(KeyPhrase.character_id == character_id))
-            keyphrases = result.scalars().all()
+            async with shard_session(db, character_id) as shard_db:
+                result = await shard_db.execute(select(Character.id).where(Character.id == character_id))
+                if result.scalars().first() is None:
+                    logging.warning(f"Character not found with id: {character_id}")
+                    raise HTTPException(status_code=400, detail="Character not found")
+                
+                result = await shard_db.execute(
+                    select(KeyPhrase.id, KeyPhrase.character_id, KeyPhrase.phrase).where(KeyPhrase.character_id == character_id)
+                )
+                keyphrases = [dict(row) for row in result.mappings()]
             logging.info(f"Found {len(keyphrases)} keyphrases for character_id: {character_id}")
-            return [keyphrase.to_dict() for keyphrase in keyphrases]
+            return keyphrases
         except HTTPException:
             raise
         except Exception as e:
             logging.error(f"Error retrieving key phrases for character_id {character_id}: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Error retrieving key phrases: {str(e)}")
     
+    async def insert_phrases(self, db: AsyncSession, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Insert key phrase rows in a single statement, skipping phrases a character already has.
+        
+        Returns only the rows really inserted: from RETURNING when the database supports it, otherwise
+        (MySQL) by comparing the phrases stored before and after the insert. The caller is responsible for committing, except on a sharded database where the rows are
+        inserted and committed on the shards of their characters here.
+        """
+        if not rows:
+            return []
+        
+        shards = get_shards(db)
+        if shards is not None:
+            shard_rows: Dict[int, List[Dict[str, Any]]] = {}
+            for row in rows:
+                shard_rows.setdefault(shards.shard_map.shard_for(row["character_id"]), []).append(row)
+            
+            async def insert_on_shard(shard: int, rows_on_shard: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+                async with shards.session_factories[shard]() as shard_db:
+                    saved_rows = await self.insert_phrases(shard_db, rows_on_shard)
+                    await shard_db.commit()
+                    return saved_rows
+            
+            saved = await asyncio.gather(*[insert_on_shard(shard, shard_rows[shard]) for shard in shard_rows])
+            return [row for saved_rows in saved for row in saved_rows]
+        
+        dialect = db.get_bind().dialect
+        if dialect.name == "sqlite":
+            statement = sqlite_insert(KeyPhrase).values(rows).on_conflict_do_nothing()
+        elif dialect.name == "postgresql":
+            statement = postgresql_insert(KeyPhrase).values(rows).on_conflict_do_nothing()
+        elif dialect.name == "mysql":
+            statement = insert(KeyPhrase).values(rows).prefix_with("IGNORE")
+        else:
+            statement = insert(KeyPhrase).values(rows)
+        
+        if not dialect.insert_returning:
+            # INSERT IGNORE does not say which rows it dropped; within the transaction, phrases
+            # matching the batch that were not stored before the insert are the inserted ones
+            keys = [(row["character_id"], row.get("normalized_phrase") or normalize_phrase(row["phrase"])) for row in rows]
+            existing = {(row.character_id, row.normalized_phrase) for row in await self._select_phrases(db, keys)}
+            await db.execute(statement)
+            return [{"id": row.id, "character_id": row.character_id, "phrase": row.phrase}
+                    for row in await self._select_phrases(db, keys)
+                    if (row.character_id, row.normalized_phrase) not in existing]
+        
+        result = await db.execute(statement.returning(KeyPhrase.id, KeyPhrase.character_id, KeyPhrase.phrase))
+        return [dict(row) for row in result.mappings().all()]
+    
+    async def _select_phrases(self, db: AsyncSession, keys: List[Tuple[int, str]]):
+        """Stored phrases matching (character_id, normalized_phrase) pairs, in insertion order"""
+        result = await db.execute(
+            select(KeyPhrase.id, KeyPhrase.character_id, KeyPhrase.phrase, KeyPhrase.normalized_phrase)
+            .where(tuple_(KeyPhrase.character_id, KeyPhrase.normalized_phrase).in_(keys))
+            .order_by(KeyPhrase.id)
+        )
+        return result.all()
+    
+    async def record_saved_phrases(self, character_id: int, saved_phrases: List[Dict[str, Any]]):
+        """Update derived data (cached document, trending counters, similarity index) after phrases are committed for a character"""
+        if not saved_phrases:
+            return
+        await redis_service.delete(CHARACTER_PHRASES_CACHE_KEY.format(character_id=character_id))
+        if phrase_similarity_index.is_loaded:
+            phrase_similarity_index.add(character_id, [row["phrase"] for row in saved_phrases])
+        await trending_service.record(row["phrase"] for row in saved_phrases)
+    
     async def save_key_phrases_for_character(self, db: AsyncSession, character_id: int, phrases: List[str]) -> List[Dict[str, Any]]:
         """Save multiple key phrases for a character"""
         try:
             # Check if character exists
             logging.info(f"Saving {len(phrases)} key phrases for character_id: {character_id}")
-            result = await db.execute(select(Character).where(Character.id == character_id))
-            character = result.scalars().first()
-            if not character:
-                logging.warning(f"Character not found with id: {character_id} when saving phrases")
-                raise HTTPException(status_code=400, detail="Character not found")
-            
-            saved_phrases = []
-            for phrase in phrases:
-                keyphrase_data = {"character_id": character_id, "phrase": phrase}
-                saved_phrase = await self.create(db, keyphrase_data)
-                saved_phrases.append(saved_phrase)
+            async with shard_session(db, character_id) as shard_db:
+                result = await shard_db.execute(select(Character.id).where(Character.id == character_id))
+                character = result.scalars().first()
+                if not character:
+                    logging.warning(f"Character not found with id: {character_id} when saving phrases")
+                    raise HTTPException(status_code=400, detail="Character not found")
+                
+                rows = []
+                seen = set()
+                for phrase in phrases:
+                    normalized = normalize_phrase(phrase)
+                    if normalized and normalized not in seen:
+                        seen.add(normalized)
+                        rows.append({"character_id": character_id, "phrase": phrase, "normalized_phrase": normalized})
+                
+                try:
+                    saved_phrases = await self.insert_phrases(shard_db, rows)
+                    await shard_db.commit()
+                except Exception:
+                    await shard_db.rollback()
+                    raise
+            await self.record_saved_phrases(character_id, saved_phrases)
             
             logging.info(f"Successfully saved {len(saved_phrases)} key phrases for character_id: {character_id}")
             return saved_phrases
@@ -107,5 +324,53 @@ class KeyphraseService(BaseService):
             logging.error(f"Error saving key phrases for character_id {character_id}: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Error saving key phrases: {str(e)}")
 
+    async def search_key_phrases(self, db: AsyncSession, query: str, limit: int = 20, offset: int = 0) -> List[Dict[str, Any]]:
+        """Full-text search over saved key phrases, best matches first"""
+        terms = SEARCH_TERM.findall(query)
+        if not terms:
+            return []
+        
+        logging.info(f"Searching key phrases for: {query}")
+        columns = [KeyPhrase.id, KeyPhrase.character_id, Character.name.label("character_name"), KeyPhrase.phrase]
+        dialect_name = database_dialect(db).name
+        if dialect_name == "sqlite":
+            # Quote every term and prefix-match the last one, so user input is never parsed as FTS syntax
+            match_query = " ".join(f'"{term}"' for term in terms) + "*"
+            score = (-key_phrases_fts.c.rank).label("score")
+            statement = (
+                select(*columns, score)
+                .select_from(key_phrases_fts)
+                .join(KeyPhrase, KeyPhrase.id == key_phrases_fts.c.rowid)
+                .where(literal_column("key_phrases_fts").op("MATCH")(match_query))
+                .order_by(key_phrases_fts.c.rank, KeyPhrase.id)
+            )
+        elif dialect_name == "postgresql":
+            document = func.to_tsvector(literal_column("'simple'"), KeyPhrase.phrase)
+            ts_query = func.plainto_tsquery(literal_column("'simple'"), " ".join(terms))
+            score = func.ts_rank(document, ts_query).label("score")
+            statement = select(*columns, score).where(document.op("@@")(ts_query)).order_by(score.desc(), KeyPhrase.id)
+        elif dialect_name == "mysql":
+            match = mysql_match(KeyPhrase.phrase, against=" ".join(terms))
+            score = match.label("score")
+            statement = select(*columns, score).where(match).order_by(score.desc(), KeyPhrase.id)
+        else:
+            score = literal_column("1").label("score")
+            statement = select(*columns, score).where(KeyPhrase.phrase.ilike(f"%{' '.join(terms)}%")).order_by(KeyPhrase.id)
+        
+        statement = statement.join(Character, Character.id == KeyPhrase.character_id)
+        sharded = get_shards(db) is not None
+        # Each shard returns enough matches for the page; the offset applies to the merged matches
+        statement = statement.limit(offset + limit) if sharded else statement.limit(limit).offset(offset)
+        try:
+            rows = await fetch_all(db, statement)
+            if sharded:
+                rows = sorted(rows, key=lambda row: (-row.score, row.id))[offset:offset + limit]
+            matches = [dict(row._mapping) for row in rows]
+            logging.info(f"Found {len(matches)} key phrases matching: {query}")
+            return matches
+        except Exception as e:
+            logging.error(f"Error searching key phrases for '{query}': {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Error searching key phrases: {str(e)}")
+
 # Global keyphrase service instance
 keyphrase_service = KeyphraseService()
@@ -0,0 +1,177 @@
+import time
+import numpy as np
+from typing import Dict, Iterable, List, Set, Tuple
+from models.key_phrase import normalize_phrase
+
+
+class PhraseSimilarityIndex:
+    """TF-IDF vectors of each character's key phrases, held as a sparse COO matrix.
+
+    Rows are characters and columns are distinct normalized phrases; a character has
+    each phrase at most once, so every stored entry is a binary term weighted by IDF.
+    Entries live in NumPy arrays that grow by doubling, so adding phrases is amortized
+    O(1) and a query is one sparse matrix-vector product over the stored entries.
+    Removing a character only masks its entries; once masked entries exceed
+    compaction_ratio of the stored ones the arrays are rebuilt without them.
+    """
+
+    def __init__(self, initial_capacity: int = 1024, compaction_ratio: float = 0.25):
+        self.row_ids: Dict[int, int] = {}
+        self.character_ids: List[int] = []
+        self.term_ids: Dict[str, int] = {}
+        self.character_terms: Dict[int, Set[int]] = {}
+        self.character_count = 0
+        self._initial_capacity = initial_capacity
+        self.compaction_ratio = compaction_ratio
+        self._reset()
+        self.loaded_at = None
+
+    def _reset(self):
+        self._rows = np.empty(self._initial_capacity, dtype=np.int64)
+        self._cols = np.empty(self._initial_capacity, dtype=np.int64)
+        self._active = np.empty(self._initial_capacity, dtype=bool)
+        self._size = 0
+        self._inactive = 0
+        self._document_frequency = np.zeros(self._initial_capacity, dtype=np.float64)
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    def build(self, rows: Iterable[Tuple[int, str]]):
+        """Replace the index contents with (character_id, phrase) rows"""
+        self.row_ids = {}
+        self.character_ids = []
+        self.term_ids = {}
+        self.character_terms = {}
+        entry_rows: List[int] = []
+        entry_cols: List[int] = []
+        for character_id, phrase in rows:
+            normalized = normalize_phrase(phrase)
+            if not normalized:
+                continue
+            row = self.row_ids.setdefault(character_id, len(self.row_ids))
+            if row == len(self.character_ids):
+                self.character_ids.append(character_id)
+            term = self.term_ids.setdefault(normalized, len(self.term_ids))
+            terms = self.character_terms.setdefault(character_id, set())
+            if term not in terms:
+                terms.add(term)
+                entry_rows.append(row)
+                entry_cols.append(term)
+
+        self._reset()
+        self._reserve(len(entry_rows), len(self.term_ids))
+        self._size = len(entry_rows)
+        self._rows[:self._size] = entry_rows
+        self._cols[:self._size] = entry_cols
+        self._active[:self._size] = True
+        self._document_frequency[:len(self.term_ids)] = np.bincount(np.array(entry_cols, dtype=np.int64),
+                                                                    minlength=len(self.term_ids))
+        self.character_count = len(self.character_terms)
+        self.loaded_at = time.monotonic()
+
+    def add(self, character_id: int, phrases: Iterable[str]):
+        """Add phrases to a character's vector, ignoring ones it already has"""
+        row = self.row_ids.get(character_id)
+        if row is None:
+            row = self.row_ids[character_id] = len(self.character_ids)
+            self.character_ids.append(character_id)
+        terms = self.character_terms.setdefault(character_id, set())
+
+        new_terms = []
+        for phrase in phrases:
+            normalized = normalize_phrase(phrase)
+            if not normalized:
+                continue
+            term = self.term_ids.setdefault(normalized, len(self.term_ids))
+            if term not in terms:
+                terms.add(term)
+                new_terms.append(term)
+        if not new_terms:
+            return
+        if len(terms) == len(new_terms):
+            self.character_count += 1
+
+        self._reserve(self._size + len(new_terms), len(self.term_ids))
+        end = self._size + len(new_terms)
+        self._rows[self._size:end] = row
+        self._cols[self._size:end] = new_terms
+        self._active[self._size:end] = True
+        self._size = end
+        np.add.at(self._document_frequency, new_terms, 1)
+
+    def remove(self, character_id: int):
+        """Drop every phrase of a character"""
+        terms = self.character_terms.pop(character_id, None)
+        if not terms:
+            return
+        self.character_count -= 1
+        row = self.row_ids[character_id]
+        entries = self._active[:self._size] & (self._rows[:self._size] == row)
+        self._active[:self._size][entries] = False
+        self._inactive += int(entries.sum())
+        np.subtract.at(self._document_frequency, list(terms), 1)
+        if self._inactive > self.compaction_ratio * self._size:
+            self._compact()
+
+    def _compact(self):
+        """Rebuild the arrays from the remaining characters, dropping masked entries and unused rows and terms"""
+        phrases = {term: phrase for phrase, term in self.term_ids.items()}
+        loaded_at = self.loaded_at
+        # Materialized first: build() starts by clearing the mappings read here
+        rows = [
+            (character_id, phrases[term])
+            for character_id in self.character_ids
+            for term in sorted(self.character_terms.get(character_id, ()))
+        ]
+        self.build(rows)
+        # Compaction does not refresh the index, so it does not postpone the periodic rebuild
+        self.loaded_at = loaded_at
+
+    def _reserve(self, entries: int, terms: int):
+        """Grow the entry and term arrays geometrically"""
+        if entries > len(self._rows):
+            capacity = max(entries, 2 * len(self._rows))
+            for name in ("_rows", "_cols", "_active"):
+                array = getattr(self, name)
+                grown = np.empty(capacity, dtype=array.dtype)
+                grown[:self._size] = array[:self._size]
+                setattr(self, name, grown)
+        if terms > len(self._document_frequency):
+            grown = np.zeros(max(terms, 2 * len(self._document_frequency)), dtype=np.float64)
+            grown[:len(self._document_frequency)] = self._document_frequency
+            self._document_frequency = grown
+
+    def most_similar(self, character_id: int, limit: int = 10) -> List[Tuple[int, float]]:
+        """Characters with the highest cosine similarity to a character, best first"""
+        query_terms = self.character_terms.get(character_id)
+        if not query_terms:
+            return []
+
+        term_count = len(self.term_ids)
+        idf = np.log((1 + self.character_count) / (1 + self._document_frequency[:term_count])) + 1
+        rows = self._rows[:self._size]
+        weights = np.where(self._active[:self._size], idf[self._cols[:self._size]], 0.0)
+
+        query = np.zeros(term_count)
+        query_columns = np.fromiter(query_terms, dtype=np.int64)
+        query[query_columns] = idf[query_columns]
+
+        row_count = len(self.character_ids)
+        dot_products = np.bincount(rows, weights=weights * query[self._cols[:self._size]], minlength=row_count)
+        norms = np.sqrt(np.bincount(rows, weights=weights ** 2, minlength=row_count))
+        query_norm = np.sqrt(np.dot(query, query))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scores = np.where(norms > 0, dot_products / (norms * query_norm), 0.0)
+        scores[self.row_ids[character_id]] = 0.0
+
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(self.character_ids[row], float(scores[row])) for row in candidates]
+
+
+# Global phrase similarity index instance
+phrase_similarity_index = PhraseSimilarityIndex()
@@ -0,0 +1,120 @@
+import asyncio
+import os
+import logging
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from typing import Any, Dict, List, Optional, Tuple
+from models.key_phrase import normalize_phrase
+from .keyphrase_service import keyphrase_service
+
+load_dotenv()
+
+PHRASE_WRITE_BUFFER_ENABLED = os.getenv("PHRASE_WRITE_BUFFER_ENABLED", "false").lower() == "true"
+PHRASE_WRITE_BUFFER_FLUSH_MS = int(os.getenv("PHRASE_WRITE_BUFFER_FLUSH_MS", 50))
+PHRASE_WRITE_BUFFER_MAX_ROWS = int(os.getenv("PHRASE_WRITE_BUFFER_MAX_ROWS", 500))
+
+
+class PhraseWriteBuffer:
+    """Write-behind buffer that coalesces single phrase inserts into bulk inserts.
+
+    Rows are flushed every flush_ms milliseconds or as soon as max_rows are pending,
+    whichever comes first, and on shutdown. Callers that need durability call
+    add() with wait=True, which returns once the row's batch is committed.
+    """
+
+    def __init__(self, enabled: bool = PHRASE_WRITE_BUFFER_ENABLED, flush_ms: int = PHRASE_WRITE_BUFFER_FLUSH_MS,
+                 max_rows: int = PHRASE_WRITE_BUFFER_MAX_ROWS):
+        self.enabled = enabled
+        self.flush_seconds = flush_ms / 1000
+        self.max_rows = max_rows
+        self._session_factory = None
+        self._pending: List[Tuple[Dict[str, Any], Optional[asyncio.Future]]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushes: set = set()
+
+    @property
+    def is_active(self) -> bool:
+        return self.enabled and self._session_factory is not None
+
+    def start(self, session_factory):
+        """Start accepting rows (no-op unless the buffer is enabled)"""
+        if not self.enabled:
+            return
+        self._session_factory = session_factory
+        logging.info(f"Phrase write buffer started (flush every {self.flush_seconds * 1000:.0f}ms or {self.max_rows} rows)")
+
+    async def stop(self):
+        """Flush everything still pending and stop accepting rows"""
+        if not self.is_active:
+            return
+        await self.flush()
+        self._session_factory = None
+        logging.info("Phrase write buffer stopped")
+
+    async def add(self, character_id: int, phrase: str, wait: bool = False) -> Optional[Dict[str, Any]]:
+        """Buffer a phrase insert. With wait=True, return the saved row once it is committed.
+
+        The saved row is None when the character already had the phrase. The flush writes
+        through a session of its own, so a caller that waits must not hold a writer
+        connection meanwhile: with a one-connection pool the flush could never start.
+        """
+        row = {"character_id": character_id, "phrase": phrase, "normalized_phrase": normalize_phrase(phrase)}
+        future = asyncio.get_running_loop().create_future() if wait else None
+        self._pending.append((row, future))
+
+        if len(self._pending) >= self.max_rows:
+            self._schedule_flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.flush_seconds, self._schedule_flush)
+
+        if future is None:
+            return None
+        return await future
+
+    async def flush(self):
+        """Write all pending rows now and wait for in-flight flushes"""
+        self._schedule_flush()
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+
+    def _schedule_flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        task = asyncio.get_running_loop().create_task(self._write(batch))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _write(self, batch: List[Tuple[Dict[str, Any], Optional[asyncio.Future]]]):
+        """Insert one batch in a single statement and transaction, then resolve its waiters"""
+        rows = [row for row, _ in batch]
+        try:
+            async with self._session_factory() as db:
+                saved_rows = await keyphrase_service.insert_phrases(db, rows)
+                await db.commit()
+        except Exception as e:
+            # Write-behind: rows whose callers did not wait are lost, so make that visible in the logs
+            logging.error(f"Error flushing {len(rows)} buffered key phrases: {str(e)}")
+            for _, future in batch:
+                if future is not None and not future.done():
+                    future.set_exception(HTTPException(status_code=500, detail=f"Error saving phrase: {str(e)}"))
+            return
+
+        logging.info(f"Flushed {len(saved_rows)} of {len(rows)} buffered key phrases")
+        saved_by_key = {(row["character_id"], normalize_phrase(row["phrase"])): row for row in saved_rows}
+        for row, future in batch:
+            if future is not None and not future.done():
+                future.set_result(saved_by_key.pop((row["character_id"], row["normalized_phrase"]), None))
+
+        saved_by_character: Dict[int, List[Dict[str, Any]]] = {}
+        for row in saved_rows:
+            saved_by_character.setdefault(row["character_id"], []).append(row)
+        for character_id, character_rows in saved_by_character.items():
+            await keyphrase_service.record_saved_phrases(character_id, character_rows)
+
+
+# Global phrase write buffer instance
+phrase_write_buffer = PhraseWriteBuffer()
@@ -0,0 +1,89 @@
+import time
+import bisect
+from typing import Any, Dict
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from .prometheus_metrics import DB_POOL_CHECKOUT_WAIT, DB_POOL_CHECKOUT_TIMEOUTS
+
+# Upper bounds (ms) of the checkout wait histogram buckets; the last bucket is unbounded
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class PoolMetrics:
+    """Checkout wait-time histogram and timeout count of a connection pool.
+
+    Observations are also exported to Prometheus, labelled with the pool name.
+    """
+
+    def __init__(self, pool_name: str = "primary"):
+        self.pool_name = pool_name
+        self.bucket_counts = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        self.checkouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.timeouts = 0
+
+    def observe_wait(self, seconds: float):
+        self.checkouts += 1
+        self.wait_seconds_total += seconds
+        self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+        self.bucket_counts[bisect.bisect_left(WAIT_BUCKETS_MS, seconds * 1000)] += 1
+        DB_POOL_CHECKOUT_WAIT.labels(self.pool_name).observe(seconds)
+
+    def observe_timeout(self):
+        self.timeouts += 1
+        DB_POOL_CHECKOUT_TIMEOUTS.labels(self.pool_name).inc()
+
+    def to_dict(self) -> Dict[str, Any]:
+        buckets = [{"le_ms": bound, "count": count} for bound, count in zip(WAIT_BUCKETS_MS, self.bucket_counts)]
+        buckets.append({"le_ms": None, "count": self.bucket_counts[-1]})
+        return {
+            "checkouts": self.checkouts,
+            "checkout_timeouts": self.timeouts,
+            "wait_ms_avg": self.wait_seconds_total / self.checkouts * 1000 if self.checkouts else 0.0,
+            "wait_ms_max": self.wait_seconds_max * 1000,
+            "wait_ms_histogram": buckets,
+        }
+
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that times every checkout and counts checkout timeouts"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.observe_timeout()
+            raise
+        finally:
+            self.metrics.observe_wait(time.perf_counter() - start)
+
+    def recreate(self):
+        # Keep the counters when the engine replaces the pool (e.g. on dispose)
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+def pool_status(pool) -> Dict[str, Any]:
+    """Live occupancy of a pool plus its checkout metrics when it is instrumented"""
+    status: Dict[str, Any] = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "timeout_seconds": pool.timeout(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            # overflow() starts at -size and only becomes positive once the pool is full
+            "overflow": max(pool.overflow(), 0),
+        })
+    metrics = getattr(pool, "metrics", None)
+    if metrics is not None:
+        status.update(metrics.to_dict())
+    return status
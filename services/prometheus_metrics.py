@@ -0,0 +1,93 @@
+import os
+from typing import Tuple
+from starlette.requests import Request
+from starlette.routing import Match
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess,
+    disable_created_metrics,
+)
+
+# prometheus_client switches to multiprocess mode when this is set before it is imported: every
+# uvicorn/gunicorn worker writes its samples to files in the directory and a scrape of any worker
+# aggregates all of them. The directory must be empty when the server starts.
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+# When set, GET /metrics requires "Authorization: Bearer <token>"
+PROMETHEUS_METRICS_TOKEN = os.getenv("PROMETHEUS_METRICS_TOKEN")
+
+# The *_created timestamp series double the output without being useful for dashboards
+disable_created_metrics()
+
+# Requests that match no route share one label value so unknown paths cannot grow the series count
+UNMATCHED_ROUTE = "unmatched"
+QUERY_OPERATIONS = ("SELECT", "INSERT", "UPDATE", "DELETE")
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route template, method and status code",
+    ["route", "method", "status"],
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template and method",
+    ["route", "method"],
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "HTTP requests being served", multiprocess_mode="livesum",
+)
+REDIS_CACHE_LOOKUPS = Counter(
+    "redis_cache_lookups_total", "Redis cache reads by result (hit, miss or error)", ["result"],
+)
+REDIS_ERRORS = Counter(
+    "redis_errors_total", "Redis commands that failed, by RedisService operation", ["operation"],
+)
+AZURE_KEYPHRASE_DURATION = Histogram(
+    "azure_keyphrase_request_duration_seconds", "Latency of Azure key phrase extraction calls by outcome",
+    ["outcome"], buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10),
+)
+DB_QUERIES = Counter(
+    "db_queries_total", "SQL statements sent to the databases by operation", ["operation"],
+)
+# Same bounds as the /metrics/db-pool histogram (pool_metrics.WAIT_BUCKETS_MS), in seconds
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled database connection, by pool",
+    ["pool"], buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+DB_POOL_CHECKOUT_TIMEOUTS = Counter(
+    "db_pool_checkout_timeouts_total", "Connection checkouts that gave up after the pool timeout, by pool", ["pool"],
+)
+# Export the cache results at zero before the first lookup so hit-rate queries have all series
+for result in ("hit", "miss", "error"):
+    REDIS_CACHE_LOOKUPS.labels(result)
+
+
+def route_label(request: Request) -> str:
+    """Route template of a request (e.g. /character/{character_id}), or UNMATCHED_ROUTE"""
+    route = request.scope.get("route")
+    if route is None:
+        # Answered before routing (e.g. by the rate limiter): find the route it was meant for
+        for candidate in request.app.router.routes:
+            match, _ = candidate.matches(request.scope)
+            if match == Match.FULL:
+                route = candidate
+                break
+    return getattr(route, "path", UNMATCHED_ROUTE)
+
+
+def count_query(conn, cursor, statement, parameters, context, executemany):
+    """before_cursor_execute listener counting statements by their leading keyword"""
+    operation = statement.lstrip()[:6].upper()
+    DB_QUERIES.labels(operation if operation in QUERY_OPERATIONS else "OTHER").inc()
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Metrics in the Prometheus text format and its content type, aggregated over workers in multiprocess mode"""
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_worker_dead():
+    """Drop this worker's live gauge samples (in-flight requests) on shutdown in multiprocess mode"""
+    if PROMETHEUS_MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
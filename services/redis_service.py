@@ -2,6 +2,7 @@ import redis.asyncio as redis
 import os
 import json
 from utils.logger import logger
+from .prometheus_metrics import REDIS_CACHE_LOOKUPS, REDIS_ERRORS
 
 class RedisService:
     def __init__(self):
@@ -26,23 +27,28 @@ class RedisService:
             cached_data = await self.redis_client.get(key)
             if cached_data:
                 logger.info(f"Cache hit for key: {key}")
+                REDIS_CACHE_LOOKUPS.labels("hit").inc()
                 return json.loads(cached_data)
             logger.info(f"Cache miss for key: {key}")
+            REDIS_CACHE_LOOKUPS.labels("miss").inc()
             return None
         except redis.RedisError as e:
             logger.error(f"Redis error on get for key {key}: {e}")
+            REDIS_CACHE_LOOKUPS.labels("error").inc()
+            REDIS_ERRORS.labels("get").inc()
             return None
 
-    async def set(self, key, value):
+    async def set(self, key, value, expiration=None):
         if not self.redis_client:
             return
         try:
             # Using a default function to handle non-serializable objects like datetime
             serialized_value = json.dumps(value, default=str)
-            await self.redis_client.setex(key, self.cache_expiration, serialized_value)
+            await self.redis_client.setex(key, expiration or self.cache_expiration, serialized_value)
             logger.info(f"Cache set for key: {key}")
         except redis.RedisError as e:
             logger.error(f"Redis error on set for key {key}: {e}")
+            REDIS_ERRORS.labels("set").inc()
             
     async def delete(self, key):
         if not self.redis_client:
@@ -52,6 +58,93 @@ class RedisService:
             logger.info(f"Cache deleted for key: {key}")
         except redis.RedisError as e:
             logger.error(f"Redis error on delete for key {key}: {e}")
+            REDIS_ERRORS.labels("delete").inc()
+
+    async def incr(self, key):
+        """Atomically increment an integer counter, returning the new value"""
+        if not self.redis_client:
+            return None
+        try:
+            return await self.redis_client.incr(key)
+        except redis.RedisError as e:
+            logger.error(f"Redis error on incr for key {key}: {e}")
+            REDIS_ERRORS.labels("incr").inc()
+            return None
+
+    async def push(self, key, value):
+        """Push a value onto the head of a Redis list"""
+        if not self.redis_client:
+            return False
+        try:
+            await self.redis_client.lpush(key, json.dumps(value, default=str))
+            return True
+        except redis.RedisError as e:
+            logger.error(f"Redis error on push for key {key}: {e}")
+            REDIS_ERRORS.labels("push").inc()
+            return False
+
+    async def pop(self, key, timeout=1):
+        """Pop a value from the tail of a Redis list, blocking up to timeout seconds"""
+        if not self.redis_client:
+            return None
+        try:
+            item = await self.redis_client.brpop(key, timeout=timeout)
+            return json.loads(item[1]) if item else None
+        except redis.RedisError as e:
+            logger.error(f"Redis error on pop for key {key}: {e}")
+            REDIS_ERRORS.labels("pop").inc()
+            return None
+
+    async def increment_scores(self, increments, expirations=None, prune=False):
+        """Increment members of several sorted sets in one round trip.
+
+        increments maps each key to a {member: amount} dict; expirations optionally maps keys to a TTL in seconds.
+        With prune, members left with a score of zero or less are removed.
+        """
+        if not self.redis_client:
+            return False
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for key, members in increments.items():
+                    for member, amount in members.items():
+                        pipe.zincrby(key, amount, member)
+                    if prune:
+                        pipe.zremrangebyscore(key, "-inf", 0)
+                    if expirations and key in expirations:
+                        pipe.expire(key, expirations[key])
+                await pipe.execute()
+            return True
+        except redis.RedisError as e:
+            logger.error(f"Redis error on increment_scores for keys {list(increments)}: {e}")
+            REDIS_ERRORS.labels("increment_scores").inc()
+            return False
+
+    async def replace_scores(self, key, scores):
+        """Atomically replace the contents of a sorted set"""
+        if not self.redis_client:
+            return False
+        try:
+            async with self.redis_client.pipeline(transaction=True) as pipe:
+                pipe.delete(key)
+                if scores:
+                    pipe.zadd(key, scores)
+                await pipe.execute()
+            return True
+        except redis.RedisError as e:
+            logger.error(f"Redis error on replace_scores for key {key}: {e}")
+            REDIS_ERRORS.labels("replace_scores").inc()
+            return False
+
+    async def top_scores(self, key, limit):
+        """Highest scoring members of a sorted set as (member, score) pairs"""
+        if not self.redis_client:
+            return None
+        try:
+            return await self.redis_client.zrevrange(key, 0, limit - 1, withscores=True)
+        except redis.RedisError as e:
+            logger.error(f"Redis error on top_scores for key {key}: {e}")
+            REDIS_ERRORS.labels("top_scores").inc()
+            return None
 
     async def close(self):
         if self.redis_client:
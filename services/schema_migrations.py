@@ -0,0 +1,215 @@
+import sys
+import asyncio
+import logging
+from typing import Dict, List, Set, Tuple
+from sqlalchemy import inspect, select, update, delete, bindparam, text
+from sqlalchemy.engine import Connection
+
+KEY_PHRASE_CONSTRAINT = "uq_key_phrases_character_phrase"
+KEY_PHRASE_CONSTRAINT_COLUMNS = ["character_id", "normalized_phrase"]
+# Rows updated or deleted per statement while backfilling
+MIGRATION_BATCH_SIZE = 500
+# Objects created by models.key_phrase.FULL_TEXT_INDEX_DDL on each dialect
+FULL_TEXT_INDEX_OBJECTS = {
+    "sqlite": ("key_phrases_fts", "key_phrases_fts_insert", "key_phrases_fts_delete", "key_phrases_fts_update"),
+    "postgresql": ("ix_key_phrases_phrase_tsv",),
+    "mysql": ("ix_key_phrases_phrase_fulltext",),
+}
+# Trigram index for prefix and fuzzy name search on Postgres (pg_trgm). Other
+# databases use the in-process index in services/trigram_index.py instead.
+NAME_TRIGRAM_INDEX_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_characters_name_trgm ON characters USING GIN (lower(name) gin_trgm_ops)",
+]
+
+
+def _has_key_phrase_constraint(inspector) -> bool:
+    # Depending on the dialect the constraint is reported as a unique constraint or a unique index
+    constraints = inspector.get_unique_constraints("key_phrases")
+    indexes = [index for index in inspector.get_indexes("key_phrases") if index.get("unique")]
+    return any(
+        item.get("name") == KEY_PHRASE_CONSTRAINT or item.get("column_names") == KEY_PHRASE_CONSTRAINT_COLUMNS
+        for item in constraints + indexes
+    )
+
+
+def _backfill_normalized_phrases(connection: Connection) -> Tuple[int, int]:
+    """Fill normalized_phrase from phrase and delete the rows that duplicate an older one.
+
+    Returns the number of rows updated and deleted.
+    """
+    from models.key_phrase import KeyPhrase, normalize_phrase
+
+    table = KeyPhrase.__table__
+    rows = connection.execute(
+        select(table.c.id, table.c.character_id, table.c.phrase, table.c.normalized_phrase).order_by(table.c.id)
+    ).all()
+    kept = set()
+    updates: List[Dict[str, object]] = []
+    duplicates: List[int] = []
+    for row_id, character_id, phrase, stored in rows:
+        normalized = normalize_phrase(phrase)
+        if (character_id, normalized) in kept:
+            duplicates.append(row_id)
+            continue
+        kept.add((character_id, normalized))
+        if stored != normalized:
+            updates.append({"row_id": row_id, "value": normalized})
+
+    for start in range(0, len(duplicates), MIGRATION_BATCH_SIZE):
+        connection.execute(delete(table).where(table.c.id.in_(duplicates[start:start + MIGRATION_BATCH_SIZE])))
+    statement = update(table).where(table.c.id == bindparam("row_id")).values(normalized_phrase=bindparam("value"))
+    for start in range(0, len(updates), MIGRATION_BATCH_SIZE):
+        connection.execute(statement, updates[start:start + MIGRATION_BATCH_SIZE])
+    return len(updates), len(duplicates)
+
+
+def upgrade_key_phrases(connection: Connection) -> bool:
+    """Bring a key_phrases table created before normalized_phrase existed up to date.
+
+    Adds the column, fills it from phrase, deletes duplicates (keeping the oldest row), makes
+    it NOT NULL and creates the (character_id, normalized_phrase) unique constraint that the
+    deduplicating insert relies on. Does nothing on an up-to-date table, so it runs on every
+    startup. Returns whether anything changed.
+    """
+    inspector = inspect(connection)
+    if not inspector.has_table("key_phrases"):
+        return False
+    dialect = connection.dialect.name
+    columns = {column["name"]: column for column in inspector.get_columns("key_phrases")}
+    has_column = "normalized_phrase" in columns
+    has_constraint = _has_key_phrase_constraint(inspector)
+    nullable = has_column and columns["normalized_phrase"]["nullable"] and dialect != "sqlite"
+    if has_column and has_constraint and not nullable:
+        return False
+
+    if not has_column:
+        logging.info("Adding key_phrases.normalized_phrase")
+        if dialect == "sqlite":
+            # SQLite can only add a NOT NULL column with a default
+            connection.execute(text(
+                "ALTER TABLE key_phrases ADD COLUMN normalized_phrase VARCHAR(255) NOT NULL DEFAULT ''"
+            ))
+        else:
+            connection.execute(text("ALTER TABLE key_phrases ADD COLUMN normalized_phrase VARCHAR(255)"))
+            nullable = True
+
+    if not has_constraint:
+        updated, deleted = _backfill_normalized_phrases(connection)
+        logging.info(f"Backfilled normalized_phrase on {updated} key phrases, deleted {deleted} duplicates")
+
+    if nullable:
+        if dialect == "mysql":
+            connection.execute(text("ALTER TABLE key_phrases MODIFY normalized_phrase VARCHAR(255) NOT NULL"))
+        else:
+            connection.execute(text("ALTER TABLE key_phrases ALTER COLUMN normalized_phrase SET NOT NULL"))
+
+    if not has_constraint:
+        logging.info(f"Creating key_phrases constraint {KEY_PHRASE_CONSTRAINT}")
+        columns_sql = ", ".join(KEY_PHRASE_CONSTRAINT_COLUMNS)
+        if dialect == "sqlite":
+            # SQLite cannot add constraints to an existing table; a unique index enforces the same
+            connection.execute(text(f"CREATE UNIQUE INDEX {KEY_PHRASE_CONSTRAINT} ON key_phrases ({columns_sql})"))
+        else:
+            connection.execute(text(
+                f"ALTER TABLE key_phrases ADD CONSTRAINT {KEY_PHRASE_CONSTRAINT} UNIQUE ({columns_sql})"
+            ))
+    return True
+
+
+def _schema_object_names(connection: Connection) -> Set[str]:
+    """Names of the indexes (and on SQLite also tables and triggers) in the current database"""
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        statement = "SELECT name FROM sqlite_master"
+    elif dialect == "postgresql":
+        statement = "SELECT indexname FROM pg_indexes WHERE schemaname = current_schema()"
+    elif dialect == "mysql":
+        statement = "SELECT DISTINCT index_name FROM information_schema.statistics WHERE table_schema = DATABASE()"
+    else:
+        return set()
+    return set(connection.execute(text(statement)).scalars())
+
+
+def _create_missing(connection: Connection, names, statements: List[str], description: str) -> bool:
+    """Run DDL statements unless every object they create already exists; returns whether they ran"""
+    if not statements or set(names) <= _schema_object_names(connection):
+        return False
+    logging.info(f"Creating {description}")
+    for statement in statements:
+        connection.execute(text(statement))
+    return True
+
+
+def create_full_text_index(connection: Connection) -> bool:
+    """Create the key phrase full-text index (FTS5 table and triggers on SQLite) on an existing table.
+
+    On SQLite the FTS5 table is rebuilt from key_phrases, so phrases saved before the index
+    existed are searchable.
+    """
+    from models.key_phrase import FULL_TEXT_INDEX_DDL
+
+    if not inspect(connection).has_table("key_phrases"):
+        return False
+    dialect = connection.dialect.name
+    return _create_missing(connection, FULL_TEXT_INDEX_OBJECTS.get(dialect, ()), FULL_TEXT_INDEX_DDL.get(dialect, []),
+                           "key phrase full-text index")
+
+
+def create_missing_indexes(connection: Connection) -> bool:
+    """Create the indexes declared on the models that existing tables do not have yet"""
+    from models.character import Character
+    from models.eye_color import EyeColor
+    from models.key_phrase import KeyPhrase
+
+    inspector = inspect(connection)
+    existing = _schema_object_names(connection)
+    created = False
+    for table in (EyeColor.__table__, Character.__table__, KeyPhrase.__table__):
+        if not inspector.has_table(table.name):
+            continue
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            if index.name not in existing:
+                logging.info(f"Creating index {index.name} on {table.name}")
+                index.create(connection)
+                created = True
+    return created
+
+
+def create_name_trigram_index(connection: Connection) -> bool:
+    """Create pg_trgm and the character name trigram index on Postgres"""
+    if connection.dialect.name != "postgresql" or not inspect(connection).has_table("characters"):
+        return False
+    return _create_missing(connection, ["ix_characters_name_trgm"], NAME_TRIGRAM_INDEX_DDL, "character name trigram index")
+
+
+def run_migrations(connection: Connection) -> bool:
+    """Schema changes create_all cannot make on existing tables; returns whether anything changed.
+
+    Every step checks what exists first, so this runs on every startup.
+    """
+    steps = (upgrade_key_phrases, create_full_text_index, create_missing_indexes, create_name_trigram_index)
+    changed = [step(connection) for step in steps]
+    return any(changed)
+
+
+async def _migrate_command():
+    from .database import DatabaseService
+    database_service = DatabaseService()
+    try:
+        engines = [database_service.engine] + (database_service.shards.engines if database_service.shards is not None else [])
+        for engine in engines:
+            async with engine.begin() as conn:
+                changed = await conn.run_sync(run_migrations)
+            print(f"{engine.url.render_as_string(hide_password=True)}: {'migrated' if changed else 'up to date'}")
+    finally:
+        await database_service.dispose()
+
+
+if __name__ == "__main__":
+    # Usage: python -m services.schema_migrations
+    # init_db also runs the migrations on startup; this runs them without starting the app
+    if sys.argv[1:]:
+        print("Usage: python -m services.schema_migrations")
+        sys.exit(2)
+    asyncio.run(_migrate_command())
@@ -0,0 +1,249 @@
+import sys
+import heapq
+import asyncio
+import bisect
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+from sqlalchemy import select, delete, insert, func
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+SHARD_STRATEGIES = ("hash", "range")
+# Characters (and their key phrases) moved per transaction by the rebalancer
+REBALANCE_BATCH_SIZE = 500
+
+
+def jump_hash(key: int, buckets: int) -> int:
+    """Jump consistent hash (Lamping & Veach): growing from n to n+1 buckets moves only 1/(n+1) of the keys"""
+    bucket, candidate = -1, 0
+    while candidate < buckets:
+        bucket = candidate
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        candidate = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+class ShardMap:
+    """Maps a character id to the shard holding the character and its key phrases.
+
+    "hash" spreads ids with a jump consistent hash; "range" gives each shard a contiguous
+    id range, range_bounds being the first id of every shard after the first.
+    """
+
+    def __init__(self, shard_count: int, strategy: str = "hash", range_bounds: Optional[List[int]] = None):
+        if shard_count < 1:
+            raise ValueError("At least one shard is required")
+        if strategy not in SHARD_STRATEGIES:
+            raise ValueError(f"Unknown shard strategy '{strategy}'")
+        range_bounds = list(range_bounds or [])
+        if strategy == "range" and (len(range_bounds) != shard_count - 1 or range_bounds != sorted(set(range_bounds))):
+            raise ValueError(f"Range sharding over {shard_count} shards needs {shard_count - 1} increasing bounds")
+        self.shard_count = shard_count
+        self.strategy = strategy
+        self.range_bounds = range_bounds
+
+    def shard_for(self, character_id: int) -> int:
+        if self.strategy == "range":
+            return bisect.bisect_right(self.range_bounds, character_id)
+        return jump_hash(character_id, self.shard_count)
+
+
+class ShardSet:
+    """Shard engines of a sharded database, their session factories and the character id allocator"""
+
+    def __init__(self, engines: list, shard_map: ShardMap):
+        if len(engines) != shard_map.shard_count:
+            raise ValueError(f"Shard map expects {shard_map.shard_count} shards, got {len(engines)} engines")
+        self.engines = engines
+        self.shard_map = shard_map
+        self.session_factories = [
+            sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False, autocommit=False)
+            for engine in engines
+        ]
+        self._next_ids: Dict[str, int] = {}
+        self._id_lock: Optional[asyncio.Lock] = None
+
+    def __len__(self) -> int:
+        return len(self.engines)
+
+    async def execute_all(self, statement) -> List[List[Row]]:
+        """Rows of a read statement from every shard, queried concurrently, in shard order"""
+        async def read(session_factory) -> List[Row]:
+            async with session_factory() as session:
+                return (await session.execute(statement)).all()
+
+        return await asyncio.gather(*[read(session_factory) for session_factory in self.session_factories])
+
+    async def write_all(self, statement):
+        """Run a write statement on every shard concurrently, one transaction per shard"""
+        async def write(session_factory):
+            async with session_factory() as session:
+                await session.execute(statement)
+                await session.commit()
+
+        await asyncio.gather(*[write(session_factory) for session_factory in self.session_factories])
+
+    async def allocate_id(self, model_class) -> int:
+        """Next id for a new row of a sharded table, unique across shards.
+
+        The counter starts after the highest id on any shard; other workers allocate from
+        their own counter, so a clash shows up as an IntegrityError and the caller calls
+        forget_ids() and retries.
+        """
+        if self._id_lock is None:
+            self._id_lock = asyncio.Lock()
+        table_name = model_class.__tablename__
+        async with self._id_lock:
+            if table_name not in self._next_ids:
+                maxima = await self.execute_all(select(func.max(model_class.id)))
+                self._next_ids[table_name] = max(rows[0][0] or 0 for rows in maxima) + 1
+            next_id = self._next_ids[table_name]
+            self._next_ids[table_name] = next_id + 1
+            return next_id
+
+    def forget_ids(self, model_class):
+        """Re-read the highest id on the next allocation"""
+        self._next_ids.pop(model_class.__tablename__, None)
+
+    async def dispose(self):
+        for engine in self.engines:
+            await engine.dispose()
+
+
+def get_shards(db: AsyncSession) -> Optional[ShardSet]:
+    """Shards of the database a session belongs to, or None when it is not sharded"""
+    return db.info.get("shards")
+
+
+@asynccontextmanager
+async def shard_session(db: AsyncSession, character_id: Optional[int]) -> AsyncIterator[AsyncSession]:
+    """Session on the shard holding a character; db itself when not sharded or character_id is None"""
+    shards = get_shards(db)
+    if shards is None or character_id is None:
+        yield db
+        return
+    async with shards.session_factories[shards.shard_map.shard_for(character_id)]() as session:
+        yield session
+
+
+def database_dialect(db: AsyncSession):
+    """Dialect of the databases holding the sharded tables: the shards' when sharded, otherwise db's"""
+    shards = get_shards(db)
+    return shards.engines[0].dialect if shards is not None else db.get_bind().dialect
+
+
+def sorts_nulls_last(db: AsyncSession) -> bool:
+    """Whether ascending ORDER BY puts NULL after every value (Postgres) rather than before it (SQLite, MySQL)"""
+    return database_dialect(db).name == "postgresql"
+
+
+async def fetch_all(db: AsyncSession, statement, order_by: Optional[List[str]] = None,
+                    descending: bool = False) -> List[Row]:
+    """Rows of a read statement over sharded tables, from every shard when sharded.
+
+    With order_by the shard results are merged in the order of those columns, so the statement
+    must already sort each shard's rows by them; without it they are concatenated.
+    """
+    shards = get_shards(db)
+    if shards is None:
+        return (await db.execute(statement)).all()
+    shard_rows = await shards.execute_all(statement)
+    if not order_by:
+        return [row for rows in shard_rows for row in rows]
+    nulls_last = sorts_nulls_last(db)
+
+    def merge_key(row: Row) -> tuple:
+        values = (row._mapping[column] for column in order_by)
+        return tuple(((value is None) if nulls_last else (value is not None), value) for value in values)
+
+    return list(heapq.merge(*shard_rows, key=merge_key, reverse=descending))
+
+
+async def broadcast(db: AsyncSession, statement):
+    """Repeat a committed write on a replicated table (eye colors) on every shard"""
+    shards = get_shards(db)
+    if shards is not None:
+        await shards.write_all(statement)
+
+
+async def rebalance(primary_session_factory, shards: ShardSet, batch_size: int = REBALANCE_BATCH_SIZE) -> Dict[str, int]:
+    """Move every character (with its key phrases) to the shard the shard map assigns it.
+
+    Run it after adding a shard or changing the range bounds. Eye colors are copied from
+    the primary to every shard first. Each batch is written to its target shard before it
+    is deleted from its source, and rows an interrupted run already copied are replaced,
+    so the tool can simply be run again.
+    """
+    from models.character import Character
+    from models.eye_color import EyeColor
+    from models.key_phrase import KeyPhrase
+
+    async with primary_session_factory() as db:
+        eye_colors = [dict(row) for row in (await db.execute(select(EyeColor.__table__))).mappings()]
+    existing = await shards.execute_all(select(EyeColor.id))
+    for session_factory, rows in zip(shards.session_factories, existing):
+        present = {row[0] for row in rows}
+        missing = [eye_color for eye_color in eye_colors if eye_color["id"] not in present]
+        if missing:
+            async with session_factory() as session:
+                await session.execute(insert(EyeColor.__table__), missing)
+                await session.commit()
+
+    moved = {"characters": 0, "key_phrases": 0}
+    for source, rows in enumerate(await shards.execute_all(select(Character.id))):
+        misplaced: Dict[int, List[int]] = {}
+        for (character_id,) in rows:
+            target = shards.shard_map.shard_for(character_id)
+            if target != source:
+                misplaced.setdefault(target, []).append(character_id)
+        for target, character_ids in misplaced.items():
+            for start in range(0, len(character_ids), batch_size):
+                batch = character_ids[start:start + batch_size]
+                async with shards.session_factories[source]() as source_db, \
+                        shards.session_factories[target]() as target_db:
+                    characters = (await source_db.execute(
+                        select(Character.__table__).where(Character.id.in_(batch))
+                    )).mappings().all()
+                    # Key phrase ids are per shard, the target assigns new ones
+                    phrases = (await source_db.execute(
+                        select(KeyPhrase.character_id, KeyPhrase.phrase, KeyPhrase.normalized_phrase)
+                        .where(KeyPhrase.character_id.in_(batch))
+                    )).mappings().all()
+
+                    await target_db.execute(delete(KeyPhrase).where(KeyPhrase.character_id.in_(batch)))
+                    await target_db.execute(delete(Character).where(Character.id.in_(batch)))
+                    await target_db.execute(insert(Character.__table__), [dict(row) for row in characters])
+                    if phrases:
+                        await target_db.execute(insert(KeyPhrase.__table__), [dict(row) for row in phrases])
+                    await target_db.commit()
+
+                    await source_db.execute(delete(KeyPhrase).where(KeyPhrase.character_id.in_(batch)))
+                    await source_db.execute(delete(Character).where(Character.id.in_(batch)))
+                    await source_db.commit()
+                moved["characters"] += len(characters)
+                moved["key_phrases"] += len(phrases)
+                logging.info(f"Moved {len(characters)} characters from shard {source} to shard {target}")
+    return moved
+
+
+async def _rebalance_command():
+    from .database import DatabaseService
+    database_service = DatabaseService()
+    try:
+        if database_service.shards is None:
+            print("DATABASE_SHARD_URLS is not set, nothing to rebalance")
+            return
+        moved = await rebalance(database_service.SessionLocal, database_service.shards)
+        print(f"Rebalanced shards: moved {moved['characters']} characters and {moved['key_phrases']} key phrases")
+    finally:
+        await database_service.dispose()
+
+
+if __name__ == "__main__":
+    # Usage: python -m services.sharding rebalance
+    if sys.argv[1:] != ["rebalance"]:
+        print("Usage: python -m services.sharding rebalance")
+        sys.exit(2)
+    asyncio.run(_rebalance_command())
@@ -0,0 +1,141 @@
+import asyncio
+import sys
+import time
+import logging
+from collections import Counter
+from fastapi import HTTPException
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Dict, Iterable, List
+from models.key_phrase import KeyPhrase, normalize_phrase
+from .redis_service import redis_service
+from .sharding import get_shards, fetch_all
+
+TRENDING_KEY_PREFIX = "keyphrases:trending"
+
+# Time windows are calendar buckets (the current UTC hour or day), kept for twice
+# their length so the previous bucket is still there right after a rollover
+TRENDING_WINDOWS = {
+    "hour": ("%Y%m%d%H", 2 * 3600),
+    "day": ("%Y%m%d", 2 * 86400),
+}
+
+
+class TrendingService:
+    """Service class for the most frequent key phrases, kept in Redis sorted sets"""
+
+    def get_key(self, window: str, timestamp: float = None) -> str:
+        """Redis key of the sorted set for a window ("all", "hour" or "day")"""
+        if window == "all":
+            return f"{TRENDING_KEY_PREFIX}:all"
+        bucket_format, _ = TRENDING_WINDOWS[window]
+        bucket = time.strftime(bucket_format, time.gmtime(timestamp if timestamp is not None else time.time()))
+        return f"{TRENDING_KEY_PREFIX}:{window}:{bucket}"
+
+    @staticmethod
+    def _count(phrases: Iterable[str]) -> Counter:
+        counts = Counter(normalize_phrase(phrase) for phrase in phrases)
+        counts.pop("", None)
+        return counts
+
+    async def record(self, phrases: Iterable[str]):
+        """Count newly saved phrases in every window"""
+        counts = self._count(phrases)
+        if not counts:
+            return
+        now = time.time()
+        increments = {self.get_key("all"): dict(counts)}
+        expirations = {}
+        for window, (_, expiration) in TRENDING_WINDOWS.items():
+            key = self.get_key(window, now)
+            increments[key] = dict(counts)
+            expirations[key] = expiration
+        await redis_service.increment_scores(increments, expirations)
+
+    async def forget(self, phrases: Iterable[str]):
+        """Uncount deleted phrases from the all-time counters.
+
+        The hour and day windows count saves made during them and are left as they are:
+        phrases have no timestamps telling which bucket counted them.
+        """
+        counts = self._count(phrases)
+        if not counts:
+            return
+        decrements = {phrase: -count for phrase, count in counts.items()}
+        await redis_service.increment_scores({self.get_key("all"): decrements}, prune=True)
+
+    async def get_trending(self, db: AsyncSession, limit: int = 10, window: str = "all") -> List[Dict[str, Any]]:
+        """Most frequent phrases in a window, most frequent first"""
+        if window != "all" and window not in TRENDING_WINDOWS:
+            raise HTTPException(status_code=400, detail=f"Unknown window '{window}'")
+
+        top = await redis_service.top_scores(self.get_key(window), limit)
+        if top is not None:
+            return [{"phrase": phrase, "count": int(count)} for phrase, count in top]
+
+        if window != "all":
+            logging.warning(f"Trending phrases for window '{window}' requested but Redis is not available")
+            raise HTTPException(status_code=503, detail="Trending phrases by time window require Redis")
+        logging.warning("Redis not available, computing trending phrases from the database")
+        return await self.count_phrases(db, limit)
+
+    async def count_phrases(self, db: AsyncSession, limit: int = None) -> List[Dict[str, Any]]:
+        """Phrase counts straight from the key_phrases table"""
+        phrase_count = func.count(KeyPhrase.id)
+        statement = (
+            select(KeyPhrase.normalized_phrase, phrase_count)
+            .group_by(KeyPhrase.normalized_phrase)
+            .order_by(phrase_count.desc(), KeyPhrase.normalized_phrase)
+        )
+        shards = get_shards(db)
+        if limit is not None and shards is None:
+            statement = statement.limit(limit)
+        try:
+            if shards is None:
+                result = await db.execute(statement)
+                return [{"phrase": phrase, "count": count} for phrase, count in result.all()]
+            # A phrase can be counted on several shards, so the limit applies to the summed counts
+            counts = Counter()
+            for phrase, count in await fetch_all(db, statement):
+                counts[phrase] += count
+            ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+            return [{"phrase": phrase, "count": count} for phrase, count in ranked[:limit]]
+        except Exception as e:
+            logging.error(f"Error counting key phrases: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Error counting key phrases: {str(e)}")
+
+    async def rebuild(self, db: AsyncSession) -> int:
+        """Recompute the all-time counters from the key_phrases table.
+
+        The hour and day windows cannot be rebuilt because phrases have no timestamps.
+        """
+        counts = await self.count_phrases(db)
+        if not await redis_service.replace_scores(self.get_key("all"), {row["phrase"]: row["count"] for row in counts}):
+            raise HTTPException(status_code=503, detail="Could not write trending phrases to Redis")
+        logging.info(f"Trending phrases rebuilt with {len(counts)} distinct phrases")
+        return len(counts)
+
+
+# Global trending service instance
+trending_service = TrendingService()
+
+
+async def _rebuild_command():
+    from .database import DatabaseService
+    database_service = DatabaseService()
+    await redis_service.initialize()
+    try:
+        async with database_service.SessionLocal() as db:
+            count = await trending_service.rebuild(db)
+        print(f"Rebuilt trending phrases: {count} distinct phrases")
+    finally:
+        await redis_service.close()
+        await database_service.dispose()
+
+
+if __name__ == "__main__":
+    # Usage: python -m services.trending_service rebuild
+    if sys.argv[1:] != ["rebuild"]:
+        print("Usage: python -m services.trending_service rebuild")
+        sys.exit(2)
+    asyncio.run(_rebuild_command())
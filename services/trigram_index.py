@@ -0,0 +1,85 @@
+import time
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Set, Tuple
+
+
+def normalize_name(name: str) -> str:
+    """Lowercase and strip accents so 'Padmé' and 'padme' match"""
+    decomposed = unicodedata.normalize("NFKD", name.lower())
+    return " ".join("".join(char for char in decomposed if not unicodedata.combining(char)).split())
+
+
+def trigrams(name: str) -> Set[str]:
+    """Trigrams of each word, padded like pg_trgm (two spaces before, one after)"""
+    grams = set()
+    for word in normalize_name(name).split():
+        padded = f"  {word} "
+        grams.update(padded[index:index + 3] for index in range(len(padded) - 2))
+    return grams
+
+
+class TrigramIndex:
+    """In-process trigram index for case-insensitive prefix and typo-tolerant name search"""
+
+    def __init__(self, similarity_threshold: float = 0.3):
+        self.similarity_threshold = similarity_threshold
+        self.postings: Dict[str, Set[int]] = {}
+        self.names: Dict[int, str] = {}
+        self.grams: Dict[int, Set[str]] = {}
+        self.loaded_at = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    def build(self, rows: Iterable[Tuple[int, str]]):
+        """Replace the index contents with (id, name) rows"""
+        self.postings = {}
+        self.names = {}
+        self.grams = {}
+        for record_id, name in rows:
+            self.add(record_id, name)
+        self.loaded_at = time.monotonic()
+
+    def add(self, record_id: int, name: str):
+        """Index a name, replacing any previous name for the same id"""
+        self.remove(record_id)
+        if not name:
+            return
+        name_grams = trigrams(name)
+        self.names[record_id] = normalize_name(name)
+        self.grams[record_id] = name_grams
+        for gram in name_grams:
+            self.postings.setdefault(gram, set()).add(record_id)
+
+    def remove(self, record_id: int):
+        """Remove an id from the index"""
+        for gram in self.grams.pop(record_id, ()):
+            ids = self.postings.get(gram)
+            if ids is not None:
+                ids.discard(record_id)
+                if not ids:
+                    del self.postings[gram]
+        self.names.pop(record_id, None)
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[int, float]]:
+        """Ids of the best matching names with their similarity, prefix matches first"""
+        normalized_query = normalize_name(query)
+        query_grams = trigrams(query)
+        if not query_grams:
+            return []
+
+        shared = Counter()
+        for gram in query_grams:
+            shared.update(self.postings.get(gram, ()))
+
+        matches = []
+        for record_id, count in shared.items():
+            similarity = count / (len(query_grams) + len(self.grams[record_id]) - count)
+            is_prefix = self.names[record_id].startswith(normalized_query)
+            if is_prefix or similarity >= self.similarity_threshold:
+                matches.append((record_id, similarity, is_prefix))
+
+        matches.sort(key=lambda match: (not match[2], -match[1], match[0]))
+        return [(record_id, similarity) for record_id, similarity, _ in matches[:limit]]
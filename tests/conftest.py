@@ -1,6 +1,36 @@
 import sys
 import os
+import sqlite3
+from contextlib import closing
+
+import pytest
 
 os.environ['ENV'] = 'test'
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Schema created by the first release, before any of the migrations in services/schema_migrations.py
+BASELINE_SCHEMA = """
+CREATE TABLE eye_colors (id INTEGER NOT NULL, color VARCHAR(50) NOT NULL, PRIMARY KEY (id), UNIQUE (color));
+CREATE INDEX ix_eye_colors_id ON eye_colors (id);
+CREATE TABLE characters (
+    id INTEGER NOT NULL, name VARCHAR(100), height INTEGER, mass INTEGER, hair_color VARCHAR(50),
+    skin_color VARCHAR(50), eye_color_id INTEGER, PRIMARY KEY (id), FOREIGN KEY(eye_color_id) REFERENCES eye_colors (id)
+);
+CREATE INDEX ix_characters_id ON characters (id);
+CREATE INDEX ix_characters_name ON characters (name);
+CREATE TABLE key_phrases (
+    id INTEGER NOT NULL, character_id INTEGER NOT NULL, phrase VARCHAR(255) NOT NULL, PRIMARY KEY (id),
+    FOREIGN KEY(character_id) REFERENCES characters (id)
+);
+CREATE INDEX ix_key_phrases_id ON key_phrases (id);
+"""
+
+
+@pytest.fixture
+def baseline_database(tmp_path):
+    """Path of a SQLite database created with the first release's schema"""
+    path = tmp_path / "baseline.db"
+    with closing(sqlite3.connect(path)) as connection:
+        connection.executescript(BASELINE_SCHEMA)
+    return path
@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from models.character import Character
+from models.eye_color import EyeColor
+from models.key_phrase import KeyPhrase
+from schemas.character import CharacterQuery
+from services.character_service import character_service
+from services.database import DatabaseService
+
+# (height, mass) of the characters, with NULLs and ties in both columns
+MEASUREMENTS = [(170, 70), (None, 80), (150, None), (170, None), (None, None), (150, 70),
+                (180, 80), (None, 70), (170, 75), (150, 80), (None, 75), (200, None)]
+
+
+async def create_service(tmp_path, shard_count=0):
+    service = DatabaseService(
+        f"sqlite:///{tmp_path / 'listing.db'}", [],
+        shard_urls=[f"sqlite:///{tmp_path / f'shard{index}.db'}" for index in range(shard_count)],
+    )
+    await service.init_db()
+    async with service.SessionLocal() as db:
+        db.add(EyeColor(color="Blue"))
+        await db.commit()
+    for number, (height, mass) in enumerate(MEASUREMENTS):
+        async with service.SessionLocal() as db:
+            await character_service.create(db, {
+                "name": f"Character {number % 5}", "height": height, "mass": mass,
+                "hair_color": "Black", "skin_color": "Fair", "eye_color_id": 1,
+            })
+    return service
+
+
+def expected_order(characters, column, descending):
+    """Ids sorted as SQLite sorts them: NULL below every value, ties broken by id"""
+    def key(character):
+        value = character[column]
+        return (value is not None, value if value is not None else 0, character["id"])
+    return [character["id"] for character in sorted(characters, key=key, reverse=descending)]
+
+
+async def walk(db, limit, **params):
+    """Ids of every page of a listing, following the cursors"""
+    ids, cursor = [], None
+    while True:
+        page, cursor = await character_service.list_characters(db, CharacterQuery(limit=limit, cursor=cursor, **params))
+        ids += [character["id"] for character in page]
+        if cursor is None:
+            return ids
+
+
+def test_cursor_round_trip():
+    values = [None, 170, "Luke", 42]
+    cursor = character_service._encode_cursor(values)
+
+    assert character_service._decode_cursor(cursor, 4) == values
+    for invalid, length in ((cursor, 3), ("not a cursor", 4), (character_service._encode_cursor({"id": 1}), 1)):
+        with pytest.raises(HTTPException) as rejected:
+            character_service._decode_cursor(invalid, length)
+        assert rejected.value.status_code == 400
+
+
+@pytest.mark.parametrize("equality, ranges, sort, expected", [
+    (set(), set(), [], ([], False)),
+    (set(), set(), [("height", True)], (["height"], True)),
+    ({"eye_color_id"}, {"mass"}, [], (["mass"], False)),
+    ({"eye_color_id"}, set(), [("height", False), ("id", False)], (["height"], False)),
+    (set(), set(), [("name", False)], (["name"], False)),
+])
+def test_index_backed_combinations_are_accepted(equality, ranges, sort, expected):
+    assert character_service._plan_list_sort(equality, ranges, sort) == expected
+
+
+@pytest.mark.parametrize("equality, ranges, sort", [
+    ({"hair_color"}, set(), [("height", False)]),
+    ({"eye_color_id", "hair_color"}, set(), []),
+    (set(), {"height", "mass"}, []),
+    (set(), {"height"}, [("mass", False)]),
+    (set(), set(), [("height", False), ("mass", True)]),
+])
+def test_unsupported_combinations_are_rejected(equality, ranges, sort):
+    with pytest.raises(HTTPException) as rejected:
+        character_service._plan_list_sort(equality, ranges, sort)
+    assert rejected.value.status_code == 400
+
+
+@pytest.mark.parametrize("shard_count", [0, 3])
+def test_cursor_walk_returns_every_row_once(tmp_path, shard_count):
+    sorts = ["height", "-height", "mass", "-mass", "name", "-name"]
+
+    async def run():
+        service = await create_service(tmp_path, shard_count)
+        try:
+            async with service.SessionLocal() as db:
+                characters = await character_service.get_all_characters(db)
+                walks = {sort: await walk(db, 3, sort=sort) for sort in sorts}
+                walks["eye_color_id,-height"] = await walk(db, 2, eye_color_id=1, sort="-height")
+                walks["offset"] = await walk(db, 4, sort="mass", offset=1)
+            return characters, walks
+        finally:
+            await service.dispose()
+
+    characters, walks = asyncio.run(run())
+    assert len(characters) == len(MEASUREMENTS)
+    for sort in sorts:
+        column, descending = sort.lstrip("-"), sort.startswith("-")
+        assert walks[sort] == expected_order(characters, column, descending), sort
+    assert walks["eye_color_id,-height"] == expected_order(characters, "height", True)
+    # The offset is applied on every page, after the cursor
+    by_mass = expected_order(characters, "mass", False)
+    assert walks["offset"] == by_mass[1:5] + by_mass[6:10] + by_mass[11:]
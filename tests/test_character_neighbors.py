@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from services.character_neighbors import CharacterNeighborIndex
+
+HAIR = ("black", "brown", "blond", None)
+SKIN = ("fair", "light", "green")
+
+
+def make_characters(ids, seed):
+    rng = np.random.default_rng(seed)
+    return {
+        character_id: {
+            "id": character_id,
+            "height": None if character_id % 9 == 0 else int(rng.integers(60, 260)),
+            "mass": None if character_id % 7 == 0 else int(rng.integers(20, 400)),
+            "hair_color": HAIR[int(rng.integers(len(HAIR)))],
+            "skin_color": SKIN[int(rng.integers(len(SKIN)))],
+            "eye_color_id": int(rng.integers(1, 4)),
+        }
+        for character_id in ids
+    }
+
+
+def apply_writes(index, characters):
+    """Creates (past the initial capacity), updates and deletes, as the CharacterService hooks apply them"""
+    for character_id, character in make_characters(range(13, 25), seed=2).items():
+        index.upsert(character)
+        characters[character_id] = character
+    for character_id, character in make_characters([2, 5, 14, 20], seed=3).items():
+        index.upsert(character)
+        characters[character_id] = character
+    for character_id in (3, 9, 16, 21):
+        index.remove(character_id)
+        del characters[character_id]
+    # New characters reuse the deleted slots
+    for character_id, character in make_characters([25, 26], seed=4).items():
+        index.upsert(character)
+        characters[character_id] = character
+    index.remove(404)
+
+
+def test_incremental_writes_match_a_fresh_build():
+    characters = make_characters(range(1, 13), seed=1)
+    index = CharacterNeighborIndex(initial_capacity=8)
+    index.build(characters.values())
+    apply_writes(index, characters)
+
+    expected = CharacterNeighborIndex()
+    expected.build(characters.values())
+
+    assert len(index) == len(expected) == len(characters)
+    assert index._count == pytest.approx(expected._count)
+    assert index._sum == pytest.approx(expected._sum)
+    assert index._sum_squares == pytest.approx(expected._sum_squares)
+    for column, feature in enumerate(("height", "mass")):
+        values = [character[feature] for character in characters.values() if character[feature] is not None]
+        mean = index._sum[column] / index._count[column]
+        variance = index._sum_squares[column] / index._count[column] - mean ** 2
+        assert mean == pytest.approx(np.mean(values))
+        assert np.sqrt(variance) == pytest.approx(np.std(values))
+
+    for character_id in characters:
+        got = index.nearest(character_id, k=len(characters))
+        wanted = expected.nearest(character_id, k=len(characters))
+        assert [other for other, _ in got] == [other for other, _ in wanted]
+        assert [distance for _, distance in got] == pytest.approx([distance for _, distance in wanted], rel=1e-5)
+        assert character_id not in {other for other, _ in got}
+        assert len(got) == len(characters) - 1
+
+
+def test_distances_count_differing_colors_and_standardized_gaps():
+    index = CharacterNeighborIndex()
+    index.build([
+        {"id": 1, "height": 100, "mass": 50, "hair_color": "Black", "skin_color": "fair", "eye_color_id": 1},
+        {"id": 2, "height": 200, "mass": 50, "hair_color": "black ", "skin_color": "fair", "eye_color_id": 1},
+        {"id": 3, "height": 100, "mass": 50, "hair_color": "brown", "skin_color": "green", "eye_color_id": 1},
+    ])
+    height_std = np.std([100, 200, 100])
+
+    assert dict(index.nearest(1)) == pytest.approx({2: 100 / height_std, 3: np.sqrt(2)})
+    assert index.nearest(404) == []
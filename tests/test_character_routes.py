@@ -4,7 +4,7 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from fastapi import HTTPException
 from app import app
-from services.database import get_db
+from services.database import get_db, get_read_db
 from models.base import Base
 from models.character import Character
 from models.eye_color import EyeColor
@@ -27,6 +27,7 @@ def override_get_db():
         db.close()
 
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_read_db] = override_get_db
 
 client = TestClient(app)
 
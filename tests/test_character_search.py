@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+from models.character import Character
+from models.eye_color import EyeColor
+from models.key_phrase import KeyPhrase
+from services.character_service import character_service
+from services.database import DatabaseService
+from services.eye_color_service import eye_color_service
+from services.trigram_index import TrigramIndex, trigrams
+
+NAMES = [
+    (1, "Luke Skywalker"), (2, "Anakin Skywalker"), (3, "Lars"), (4, "Owen Lars"),
+    (5, "Padmé Amidala"), (6, "Leia Organa"), (7, "Beru Whitesun Lars"), (8, "Lando Calrissian"),
+]
+
+
+@pytest.fixture
+def name_index(monkeypatch):
+    """A fresh index on the shared character_service, so no test sees names from another database"""
+    index = TrigramIndex()
+    monkeypatch.setattr(character_service, "name_index", index)
+    return index
+
+
+def test_prefix_matches_rank_before_trigram_matches():
+    index = TrigramIndex()
+    index.build(NAMES)
+
+    lars = index.search("lars")
+    # In the longer "Beru Whitesun Lars" the shared trigrams fall below the similarity threshold
+    assert [record_id for record_id, _ in lars] == [3, 4]
+    index.add(9, "Old Luke")
+    luke = index.search("luke")
+    # "Old Luke" is more similar, but "Luke Skywalker" starts with the query
+    assert [record_id for record_id, _ in luke] == [1, 9]
+    assert luke[0][1] < luke[1][1]
+    # A short prefix matches although its similarity is below the threshold
+    assert [record_id for record_id, _ in index.search("la")] == [3, 8]
+    assert [record_id for record_id, _ in index.search("Skywlker")] == [1, 2]
+    assert [record_id for record_id, _ in index.search("PADME")] == [5]
+    assert index.search("xyz") == [] and index.search("  ") == []
+
+
+def test_updates_and_removals_keep_the_index_consistent():
+    index = TrigramIndex()
+    index.build(NAMES)
+    index.add(4, "Owen Lars Senior")
+    index.add(9, "Obi-Wan Kenobi")
+    index.add(2, "Darth Vader")
+    index.remove(3)
+    index.remove(404)
+    index.add(6, "")
+
+    final = [(1, "Luke Skywalker"), (2, "Darth Vader"), (4, "Owen Lars Senior"), (5, "Padmé Amidala"),
+             (7, "Beru Whitesun Lars"), (8, "Lando Calrissian"), (9, "Obi-Wan Kenobi")]
+    expected = TrigramIndex()
+    expected.build(final)
+
+    assert index.postings == expected.postings
+    assert index.names == expected.names
+    assert index.grams == {record_id: trigrams(name) for record_id, name in final}
+    for query in ("lars", "skywalker", "vader", "obi", "leia", "anakin"):
+        assert index.search(query) == expected.search(query)
+    assert index.search("anakin") == [] and index.search("leia") == []
+
+
+def test_search_follows_character_writes(tmp_path, name_index):
+    async def search(db, query):
+        return [character["name"] for character in await character_service.search_characters(db, query)]
+
+    async def run():
+        service = DatabaseService(f"sqlite:///{tmp_path / 'search.db'}")
+        await service.init_db()
+        try:
+            async with service.SessionLocal() as db:
+                eye_color = await eye_color_service.create_eye_color(db, {"color": "Blue"})
+                for _, name in NAMES[:4]:
+                    await character_service.create_character(db, {
+                        "name": name, "height": 170, "mass": 70, "hair_color": "Brown",
+                        "skin_color": "Fair", "eye_color_id": eye_color.id,
+                    })
+                before = await search(db, "lars")
+                await character_service.create_character(db, {
+                    "name": "Larsson", "height": 180, "mass": 80, "hair_color": "Blond",
+                    "skin_color": "Fair", "eye_color_id": eye_color.id,
+                })
+                await character_service.patch_character(db, 4, {"name": "Owen"})
+                await character_service.delete_character(db, 3)
+                after = await search(db, "lars")
+                renamed = await search(db, "owen")
+            return before, after, renamed
+        finally:
+            await service.dispose()
+
+    before, after, renamed = asyncio.run(run())
+
+    assert before == ["Lars", "Owen Lars"]
+    assert after == ["Larsson"]
+    assert renamed == ["Owen"]
+    assert name_index.names == {1: "luke skywalker", 2: "anakin skywalker", 4: "owen", 5: "larsson"}
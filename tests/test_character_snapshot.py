@@ -0,0 +1,114 @@
+import numpy as np
+import pytest
+
+from services.character_snapshot import CharacterSnapshot
+
+EYE_COLORS = {1: "Blue", 2: "Brown", 3: "Red"}
+QUERIES = [
+    ({}, []),
+    ({}, [("name", False)]),
+    ({}, [("hair_color", True), ("height", False)]),
+    ({"height_gt": 120, "mass_lt": 150}, [("mass", True)]),
+    ({"eye_color": "Brown"}, [("skin_color", False), ("name", True)]),
+    ({"eye_color_id": 3, "hair_color": "blond"}, []),
+    ({"skin_color": "green", "height_lt": 200}, [("id", True)]),
+    ({"hair_color": "purple"}, []),
+]
+
+
+def make_characters(ids, seed):
+    rng = np.random.default_rng(seed)
+    return {
+        character_id: {
+            "id": character_id,
+            "name": f"Character {int(rng.integers(1000)):03d}",
+            "height": None if character_id % 6 == 0 else int(rng.integers(60, 260)),
+            "mass": None if character_id % 7 == 0 else int(rng.integers(20, 300)),
+            "hair_color": ("black", "brown", "blond", None)[int(rng.integers(4))],
+            "skin_color": ("fair", "green", "gold")[int(rng.integers(3))],
+            "eye_color_id": int(rng.integers(1, 4)),
+        }
+        for character_id in ids
+    }
+
+
+def reference_query(characters, filters, sort):
+    """Same filters and ordering as CharacterSnapshot.query, in plain Python"""
+    def matches(character):
+        for column in ("height", "mass"):
+            value = character[column]
+            if f"{column}_gt" in filters and not (value is not None and value > filters[f"{column}_gt"]):
+                return False
+            if f"{column}_lt" in filters and not (value is not None and value < filters[f"{column}_lt"]):
+                return False
+        if "eye_color" in filters and EYE_COLORS.get(character["eye_color_id"]) != filters["eye_color"]:
+            return False
+        return all(character[column] == filters[column] for column in ("eye_color_id", "hair_color", "skin_color")
+                   if column in filters)
+
+    rows = sorted((character for character in characters.values() if matches(character)), key=lambda row: row["id"])
+    # Stable sorts from the least significant key; missing values last in both directions
+    for column, descending in reversed(sort):
+        present = sorted((row for row in rows if row[column] is not None), key=lambda row: row[column],
+                         reverse=descending)
+        rows = present + [row for row in rows if row[column] is None]
+    return [row["id"] for row in rows]
+
+
+def test_incremental_writes_match_a_fresh_build():
+    characters = make_characters(range(1, 31), seed=1)
+    snapshot = CharacterSnapshot(initial_capacity=16)
+    snapshot.build(characters.values(), {1: "Blue", 2: "Brown"})
+    # Creates past the initial capacity, with an eye color the snapshot has not seen
+    for character_id, character in make_characters(range(31, 41), seed=2).items():
+        snapshot.upsert({**character, "eye_color": EYE_COLORS[character["eye_color_id"]]})
+        characters[character_id] = character
+    updates = make_characters([2, 7, 33], seed=3)
+    updates[7]["hair_color"] = "auburn"
+    for character_id, character in updates.items():
+        snapshot.upsert(character)
+        characters[character_id] = character
+    for character_id in (4, 11, 35):
+        snapshot.remove(character_id)
+        del characters[character_id]
+    snapshot.remove(404)
+    # Reuses a deleted slot
+    for character_id, character in make_characters([41], seed=4).items():
+        snapshot.upsert(character)
+        characters[character_id] = character
+
+    expected = CharacterSnapshot()
+    expected.build(characters.values(), EYE_COLORS)
+
+    assert len(snapshot) == len(expected) == len(characters)
+    for filters, sort in QUERIES:
+        got = snapshot.query(filters, sort, limit=100)
+        assert got == expected.query(filters, sort, limit=100)
+        assert [row["id"] for row in got] == reference_query(characters, filters, sort)
+    assert snapshot.query({}, [("name", False)], limit=5, offset=10) == expected.query({}, [("name", False)], 5, 10)
+
+
+def test_rows_round_trip():
+    character = {"id": 1, "name": "Luke", "height": 172, "mass": None, "hair_color": "blond",
+                 "skin_color": "fair", "eye_color_id": 1}
+    snapshot = CharacterSnapshot()
+    snapshot.build([character], {1: "Blue"})
+
+    assert snapshot.query({}, [], limit=10) == [{**character, "eye_color": "Blue"}]
+    snapshot.upsert({**character, "eye_color_id": None})
+    assert snapshot.query({}, [], limit=10)[0]["eye_color"] is None
+    assert snapshot.query({"mass_gt": 0}, [], limit=10) == []
+
+
+@pytest.mark.parametrize("descending", [False, True])
+def test_missing_values_sort_last(descending):
+    snapshot = CharacterSnapshot()
+    snapshot.build([
+        {"id": 1, "height": None, "hair_color": None},
+        {"id": 2, "height": 150, "hair_color": "brown"},
+        {"id": 3, "height": 90, "hair_color": "black"},
+    ], {})
+
+    expected = [2, 3, 1] if descending else [3, 2, 1]
+    for column in ("height", "hair_color"):
+        assert [row["id"] for row in snapshot.query({}, [(column, descending)], limit=10)] == expected
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from services.character_stats import CharacterStats
+
+EYE_COLORS = {1: "Blue", 2: "Brown", 3: "Red"}
+
+
+def make_characters(ids, seed):
+    rng = np.random.default_rng(seed)
+    return {
+        character_id: {
+            "id": character_id,
+            # Some values past the last bin edge, to cover the overflow bins
+            "height": None if character_id % 8 == 0 else int(rng.integers(50, 350)),
+            "mass": None if character_id % 5 == 0 else int(rng.integers(10, 1700)),
+            "hair_color": ("black", "brown", "blond", None)[int(rng.integers(4))],
+            "skin_color": ("fair", "green")[int(rng.integers(2))],
+            "eye_color_id": int(rng.integers(1, 4)),
+        }
+        for character_id in ids
+    }
+
+
+def test_incremental_writes_match_a_fresh_build():
+    characters = make_characters(range(1, 41), seed=1)
+    stats = CharacterStats()
+    stats.build(characters.values())
+    for character_id, character in {**make_characters(range(41, 61), seed=2),
+                                    **make_characters([4, 8, 15, 42], seed=3)}.items():
+        stats.upsert(character)
+        characters[character_id] = character
+    for character_id in (1, 8, 23, 50):
+        stats.remove(character_id)
+        del characters[character_id]
+    stats.remove(404)
+
+    expected = CharacterStats()
+    expected.build(characters.values())
+
+    for feature in ("height", "mass"):
+        assert stats.histograms[feature].tolist() == expected.histograms[feature].tolist()
+        assert stats.sums[feature] == pytest.approx(expected.sums[feature])
+    got, wanted = stats.to_dict(EYE_COLORS), expected.to_dict(EYE_COLORS)
+    for feature in ("height", "mass"):
+        assert got[feature].pop("mean") == pytest.approx(wanted[feature].pop("mean"))
+    assert got == wanted
+    assert got["total"] == len(characters)
+    assert sum(item["count"] for item in got["eye_colors"]) == len(characters)
+    assert got["height"]["count"] == sum(character["height"] is not None for character in characters.values())
+
+
+def test_histogram_and_percentiles():
+    stats = CharacterStats()
+    stats.build([{"id": character_id, "height": height} for character_id, height in enumerate([105, 112, 118, 171, 400])])
+    height = stats.distribution("height")
+
+    assert height["histogram"] == [
+        {"min": 100, "max": 110, "count": 1},
+        {"min": 110, "max": 120, "count": 2},
+        {"min": 170, "max": 180, "count": 1},
+        {"min": 300, "max": None, "count": 1},
+    ]
+    assert height["mean"] == pytest.approx(181.2)
+    # 2.5 of 5 values lie below p50: 1.5 of the 2 values in [110, 120), interpolated to 117.5
+    assert height["percentiles"]["p50"] == pytest.approx(117.5)
+    assert height["percentiles"]["p25"] == pytest.approx(111.25)
+    assert stats.distribution("mass") == {"count": 0, "mean": None, "histogram": [],
+                                          "percentiles": {f"p{p}": None for p in (25, 50, 75, 90, 99)}}
@@ -0,0 +1,168 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event
+
+from models.character import Character
+from models.eye_color import EyeColor
+from models.key_phrase import KeyPhrase
+from services.character_service import character_service
+from services.database import DatabaseService
+from services.eye_color_service import eye_color_service
+from services.keyphrase_service import keyphrase_service
+from services.redis_service import redis_service
+from tests.test_trending import FakeRedis
+
+LUKE = {"name": "Luke Skywalker", "height": 172, "mass": 77, "hair_color": "Blond", "skin_color": "Fair"}
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    client = FakeRedis()
+    monkeypatch.setattr(redis_service, "redis_client", client)
+    return client
+
+
+async def create_service(tmp_path):
+    service = DatabaseService(f"sqlite:///{tmp_path / 'writes.db'}", [])
+    await service.init_db()
+    async with service.SessionLocal() as db:
+        for color in ("Blue", "Brown"):
+            await eye_color_service.create_eye_color(db, {"color": color})
+        await character_service.create_character(db, {**LUKE, "eye_color_id": 1})
+    return service
+
+
+def record_statements(service):
+    """Leading keyword of every statement sent to the primary from now on"""
+    statements = []
+    event.listen(service.engine.sync_engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement.lstrip().split()[0].upper()))
+    return statements
+
+
+def test_writes_return_the_record_in_one_statement(tmp_path):
+    async def run():
+        service = await create_service(tmp_path)
+        try:
+            statements = record_statements(service)
+            results = []
+            async with service.SessionLocal() as db:
+                for write in (
+                    lambda: character_service.update_character(db, 1, {**LUKE, "name": "Luke", "eye_color_id": 2}),
+                    lambda: character_service.delete_character(db, 1),
+                    lambda: eye_color_service.update_eye_color(db, 2, {"color": "Hazel"}),
+                ):
+                    statements.clear()
+                    results.append((await write(), list(statements)))
+            return results
+        finally:
+            await service.dispose()
+
+    (updated, update_statements), (_, delete_statements), (eye_color, eye_color_statements) = asyncio.run(run())
+
+    # The eye color name comes from a subquery in RETURNING, not from a second SELECT
+    assert updated == {**LUKE, "id": 1, "name": "Luke", "eye_color_id": 2, "eye_color": "Brown"}
+    assert update_statements == ["SELECT", "SELECT", "UPDATE"]  # the eye color check, the stored row, the write
+    assert delete_statements == ["DELETE", "DELETE"]  # the key phrases, then the character
+    assert eye_color == {"id": 2, "color": "Hazel"}
+    assert eye_color_statements == ["UPDATE", "SELECT"]  # the write, then the characters whose caches embed it
+
+
+def test_patch_writes_only_changed_values(tmp_path, fake_redis):
+    async def run():
+        service = await create_service(tmp_path)
+        try:
+            statements = record_statements(service)
+            async with service.SessionLocal() as db:
+                fake_redis.deleted.clear()
+                unchanged = await character_service.patch_character(db, 1, {"height": 172, "eye_color_id": 1})
+                unchanged_writes = (list(statements), list(fake_redis.deleted))
+                statements.clear()
+                changed = await character_service.patch_character(db, 1, {"height": 175, "eye_color_id": 2})
+                changed_writes = (list(statements), list(fake_redis.deleted))
+            return unchanged, unchanged_writes, changed, changed_writes
+        finally:
+            await service.dispose()
+
+    unchanged, (unchanged_statements, unchanged_deletes), changed, (changed_statements, changed_deletes) = \
+        asyncio.run(run())
+
+    assert unchanged == {**LUKE, "id": 1, "eye_color_id": 1, "eye_color": "Blue"}
+    assert "UPDATE" not in unchanged_statements
+    assert unchanged_deletes == []
+
+    assert changed == {**LUKE, "id": 1, "height": 175, "eye_color_id": 2, "eye_color": "Brown"}
+    assert changed_statements.count("UPDATE") == 1
+    assert "items:phrases:1" in changed_deletes and "items:all" in changed_deletes
+
+
+def test_rename_drops_the_old_and_new_name_caches(tmp_path, fake_redis):
+    async def run():
+        service = await create_service(tmp_path)
+        try:
+            async with service.SessionLocal() as db:
+                await character_service.get_character_by_name(db, "Luke Skywalker")
+                cached = "items:name:Luke Skywalker" in fake_redis.values
+                fake_redis.deleted.clear()
+                await character_service.patch_character(db, 1, {"name": "Luke"})
+                patched = list(fake_redis.deleted)
+                fake_redis.deleted.clear()
+                await character_service.update_character(db, 1, {**LUKE, "name": "Old Ben", "eye_color_id": 1})
+                updated = list(fake_redis.deleted)
+            return cached, patched, updated
+        finally:
+            await service.dispose()
+
+    cached, patched, updated = asyncio.run(run())
+
+    assert cached
+    assert {"items:name:Luke Skywalker", "items:name:Luke"} <= set(patched)
+    assert {"items:name:Luke", "items:name:Old Ben"} <= set(updated)
+
+
+def test_writes_evict_the_cached_phrases_document(tmp_path, fake_redis):
+    async def run():
+        service = await create_service(tmp_path)
+        try:
+            evicted = {}
+            async with service.SessionLocal() as db:
+                for name, write in (
+                    ("add phrase", lambda: character_service.add_character_phrase(db, 1, "Use the Force")),
+                    ("save phrases", lambda: keyphrase_service.save_key_phrases_for_character(db, 1, ["Tatooine"])),
+                    ("update", lambda: character_service.update_character(db, 1, {**LUKE, "eye_color_id": 2})),
+                    ("patch", lambda: character_service.patch_character(db, 1, {"height": 175})),
+                    ("eye color rename", lambda: eye_color_service.update_eye_color(db, 2, {"color": "Hazel"})),
+                    ("delete", lambda: character_service.delete_character(db, 1)),
+                ):
+                    document = await character_service.get_character_with_phrases(db, 1)
+                    assert "items:phrases:1" in fake_redis.values
+                    fake_redis.deleted.clear()
+                    await write()
+                    evicted[name] = "items:phrases:1" in fake_redis.deleted
+            return evicted, document
+        finally:
+            await service.dispose()
+
+    evicted, last_document = asyncio.run(run())
+
+    assert evicted == dict.fromkeys(evicted, True)
+    # Read back after the rename, the document carries the new eye color name
+    assert last_document["eye_color"] == "Hazel"
+    assert last_document["key_phrases"] == ["Use the Force", "Tatooine"]
+
+
+def test_patch_unknown_character_is_not_found(tmp_path):
+    async def run():
+        service = await create_service(tmp_path)
+        try:
+            async with service.SessionLocal() as db:
+                with pytest.raises(HTTPException) as not_found:
+                    await character_service.patch_character(db, 9999, {"height": 175})
+            return not_found.value
+        finally:
+            await service.dispose()
+
+    error = asyncio.run(run())
+    assert (error.status_code, error.detail) == (404, "Character not found")
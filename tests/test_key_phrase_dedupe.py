@@ -0,0 +1,140 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import inspect, select, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from models.base import Base
+from models.character import Character
+from models.eye_color import EyeColor
+from models.key_phrase import KeyPhrase
+from services.character_service import character_service
+from services.database import DatabaseService
+from services.keyphrase_service import keyphrase_service
+from services.schema_migrations import KEY_PHRASE_CONSTRAINT
+
+
+async def create_legacy_database(path):
+    """A database whose key_phrases table predates normalized_phrase, with duplicate phrases"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all, tables=[EyeColor.__table__, Character.__table__])
+        await conn.execute(text(
+            "CREATE TABLE key_phrases (id INTEGER PRIMARY KEY, character_id INTEGER NOT NULL "
+            "REFERENCES characters (id), phrase VARCHAR(255) NOT NULL)"
+        ))
+        await conn.execute(Character.__table__.insert(), [{"name": "Luke Skywalker"}, {"name": "Leia Organa"}])
+        await conn.execute(text("INSERT INTO key_phrases (character_id, phrase) VALUES "
+                                "(1, 'The Force'), (1, '  the   force'), (1, 'Lightsaber'), (2, 'The Force')"))
+    await engine.dispose()
+
+
+async def key_phrase_schema(service):
+    async with service.engine.connect() as conn:
+        def read_schema(sync_conn):
+            inspector = inspect(sync_conn)
+            columns = [column["name"] for column in inspector.get_columns("key_phrases")]
+            indexes = [index["name"] for index in inspector.get_indexes("key_phrases") if index["unique"]]
+            return columns, indexes
+
+        columns, indexes = await conn.run_sync(read_schema)
+        rows = (await conn.execute(text(
+            "SELECT id, character_id, phrase, normalized_phrase FROM key_phrases ORDER BY id"
+        ))).all()
+    return columns, indexes, [tuple(row) for row in rows]
+
+
+def test_startup_migrates_a_legacy_key_phrases_table(tmp_path):
+    async def run():
+        path = tmp_path / "legacy.db"
+        await create_legacy_database(path)
+        service = DatabaseService(f"sqlite:///{path}", [])
+        try:
+            await service.init_db()
+            migrated = await key_phrase_schema(service)
+            await service.init_db()
+            again = await key_phrase_schema(service)
+            async with service.SessionLocal() as db:
+                saved = await keyphrase_service.save_key_phrases_for_character(db, 1, ["THE FORCE", "Jedi"])
+            return migrated, again, saved
+        finally:
+            await service.dispose()
+
+    (columns, indexes, rows), again, saved = asyncio.run(run())
+    assert "normalized_phrase" in columns
+    assert KEY_PHRASE_CONSTRAINT in indexes
+    # The oldest of the duplicates is kept
+    assert rows == [(1, 1, "The Force", "the force"), (3, 1, "Lightsaber", "lightsaber"), (4, 2, "The Force", "the force")]
+    assert again == (columns, indexes, rows)
+    assert [row["phrase"] for row in saved] == ["Jedi"]
+
+
+def test_saving_the_same_batch_twice_inserts_nothing_new(tmp_path):
+    async def run():
+        service = DatabaseService(f"sqlite:///{tmp_path / 'dedupe.db'}", [])
+        await service.init_db()
+        try:
+            async with service.SessionLocal() as db:
+                db.add(Character(name="Luke Skywalker"))
+                await db.commit()
+                batch = ["The Force", "Lightsaber", "the  force", "Tatooine"]
+                first = await keyphrase_service.save_key_phrases_for_character(db, 1, batch)
+                second = await keyphrase_service.save_key_phrases_for_character(db, 1, batch)
+                stored = (await db.execute(select(KeyPhrase.phrase).order_by(KeyPhrase.id))).scalars().all()
+            return first, second, stored
+        finally:
+            await service.dispose()
+
+    first, second, stored = asyncio.run(run())
+    assert [row["phrase"] for row in first] == ["The Force", "Lightsaber", "Tatooine"]
+    assert second == []
+    assert stored == ["The Force", "Lightsaber", "Tatooine"]
+
+
+@pytest.mark.parametrize("insert_returning", [True, False], ids=["returning", "no-returning"])
+def test_only_inserted_rows_are_returned(tmp_path, insert_returning):
+    async def run():
+        service = DatabaseService(f"sqlite:///{tmp_path / 'inserted.db'}", [])
+        await service.init_db()
+        # MySQL has no INSERT ... RETURNING
+        service.engine.dialect.insert_returning = insert_returning
+        try:
+            async with service.SessionLocal() as db:
+                db.add_all([Character(name="Luke Skywalker"), Character(name="Leia Organa")])
+                await db.commit()
+                await keyphrase_service.save_key_phrases_for_character(db, 1, ["The Force", "Tatooine"])
+                saved = await keyphrase_service.insert_phrases(db, [
+                    {"character_id": 1, "phrase": "the FORCE", "normalized_phrase": "the force"},
+                    {"character_id": 1, "phrase": "Jedi", "normalized_phrase": "jedi"},
+                    {"character_id": 2, "phrase": "The Force", "normalized_phrase": "the force"},
+                ])
+                await db.commit()
+            return saved
+        finally:
+            await service.dispose()
+
+    saved = asyncio.run(run())
+    assert saved == [{"id": 3, "character_id": 1, "phrase": "Jedi"}, {"id": 4, "character_id": 2, "phrase": "The Force"}]
+
+
+def test_adding_a_duplicate_phrase_is_a_conflict(tmp_path):
+    async def run():
+        service = DatabaseService(f"sqlite:///{tmp_path / 'conflict.db'}", [])
+        await service.init_db()
+        try:
+            async with service.SessionLocal() as db:
+                db.add(Character(name="Luke Skywalker"))
+                await db.commit()
+                saved = await character_service.add_character_phrase(db, 1, "The Force")
+                with pytest.raises(HTTPException) as conflict:
+                    await character_service.add_character_phrase(db, 1, "THE   force ")
+                count = len((await db.execute(select(KeyPhrase.id))).all())
+            return saved, conflict.value.status_code, count
+        finally:
+            await service.dispose()
+
+    saved, status_code, count = asyncio.run(run())
+    assert (saved["character_id"], saved["phrase"]) == (1, "The Force")
+    assert status_code == 409
+    assert count == 1
@@ -0,0 +1,110 @@
+import asyncio
+import sqlite3
+from contextlib import closing
+
+from sqlalchemy import delete, update
+
+from models.character import Character
+from models.eye_color import EyeColor
+from models.key_phrase import KeyPhrase
+from services.database import DatabaseService
+from services.keyphrase_service import keyphrase_service
+from services.schema_migrations import run_migrations
+
+PHRASES = {
+    1: ["Use the Force, Luke", "Force", "A long time ago"],
+    2: ["The Force is strong with this one", "The dark side of the Force"],
+    3: ["Never tell me the odds"],
+}
+
+
+async def create_service(tmp_path):
+    service = DatabaseService(f"sqlite:///{tmp_path / 'search.db'}", [])
+    await service.init_db()
+    async with service.SessionLocal() as db:
+        db.add_all([Character(name=name) for name in ("Luke Skywalker", "Obi-Wan Kenobi", "Han Solo")])
+        await db.commit()
+        for character_id, phrases in PHRASES.items():
+            await keyphrase_service.save_key_phrases_for_character(db, character_id, phrases)
+    return service
+
+
+async def search(db, query, **kwargs):
+    return [row["phrase"] for row in await keyphrase_service.search_key_phrases(db, query, **kwargs)]
+
+
+def test_matches_are_ranked_best_first(tmp_path):
+    async def run():
+        service = await create_service(tmp_path)
+        try:
+            async with service.SessionLocal() as db:
+                results = await keyphrase_service.search_key_phrases(db, "force")
+                return (results, await search(db, "strong FORCE"), await search(db, "forc", limit=2, offset=1),
+                        await search(db, "odd"), await search(db, 'dark" -side* ('), await search(db, "jedi"))
+        finally:
+            await service.dispose()
+
+    results, strong, page, prefix, quoted, missing = asyncio.run(run())
+
+    # BM25: the shorter the phrase, the more the term weighs
+    assert [row["phrase"] for row in results] == [
+        "Force", "Use the Force, Luke", "The dark side of the Force", "The Force is strong with this one",
+    ]
+    assert results[0]["character_name"] == "Luke Skywalker"
+    assert [row["score"] for row in results] == sorted((row["score"] for row in results), reverse=True)
+    # Every term must match
+    assert strong == ["The Force is strong with this one"]
+    # The last term matches as a prefix
+    assert page == ["Use the Force, Luke", "The dark side of the Force"]
+    assert prefix == ["Never tell me the odds"]
+    # Quotes and FTS operators in the query are not parsed as FTS syntax
+    assert quoted == ["The dark side of the Force"]
+    assert missing == []
+
+
+def test_index_follows_inserts_updates_and_deletes(tmp_path):
+    async def run():
+        service = await create_service(tmp_path)
+        try:
+            async with service.SessionLocal() as db:
+                await keyphrase_service.save_key_phrases_for_character(db, 3, ["I have a bad feeling about this"])
+                inserted = await search(db, "feeling")
+                await db.execute(update(KeyPhrase).where(KeyPhrase.phrase == "Force").values(phrase="Jedi"))
+                await db.execute(delete(KeyPhrase).where(KeyPhrase.phrase == "The dark side of the Force"))
+                await db.commit()
+                return inserted, await search(db, "force"), await search(db, "jedi"), await search(db, "dark")
+        finally:
+            await service.dispose()
+
+    inserted, force, jedi, dark = asyncio.run(run())
+
+    assert inserted == ["I have a bad feeling about this"]
+    assert force == ["Use the Force, Luke", "The Force is strong with this one"]
+    assert jedi == ["Jedi"]
+    assert dark == []
+
+
+def test_startup_adds_the_index_to_a_baseline_database(baseline_database):
+    with closing(sqlite3.connect(baseline_database)) as connection, connection:
+        connection.execute("INSERT INTO characters (id, name) VALUES (1, 'Luke Skywalker')")
+        connection.execute("INSERT INTO key_phrases (character_id, phrase) VALUES (1, 'Use the Force'), (1, 'Tatooine')")
+
+    async def run():
+        service = DatabaseService(f"sqlite:///{baseline_database}", [])
+        try:
+            await service.init_db()
+            async with service.engine.begin() as conn:
+                migrated_again = await conn.run_sync(run_migrations)
+            async with service.SessionLocal() as db:
+                existing = await search(db, "force")
+                await keyphrase_service.save_key_phrases_for_character(db, 1, ["Help me, Obi-Wan"])
+                return existing, await search(db, "help"), migrated_again
+        finally:
+            await service.dispose()
+
+    existing, saved, migrated_again = asyncio.run(run())
+
+    # Phrases stored before the upgrade are indexed by the rebuild
+    assert existing == ["Use the Force"]
+    assert saved == ["Help me, Obi-Wan"]
+    assert migrated_again is False
@@ -0,0 +1,114 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from services.keyphrase_batcher import KeyphraseBatcher, TokenBucket
+
+
+class FakeTextAnalyticsClient:
+    """Answers extract_key_phrases like the Azure client; "error" documents fail and "lost" ones get no result"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def extract_key_phrases(self, documents, model_version=None):
+        self.calls.append([document["text"] for document in documents])
+        results = []
+        for document in documents:
+            if document["text"] == "lost":
+                continue
+            if document["text"] == "error":
+                error = SimpleNamespace(code="InvalidDocument", message="Document text is empty")
+                results.append(SimpleNamespace(id=document["id"], is_error=True, error=error))
+            else:
+                results.append(SimpleNamespace(id=document["id"], is_error=False, key_phrases=[document["text"].upper()]))
+        return results
+
+
+def create_batcher(client, **options):
+    async def client_factory():
+        return client
+    options.setdefault("rate_limiter", TokenBucket(1000, 100))
+    return KeyphraseBatcher(client_factory, **options)
+
+
+def test_concurrent_requests_share_one_call():
+    client = FakeTextAnalyticsClient()
+
+    async def run():
+        batcher = create_batcher(client, window_ms=50, max_documents=10)
+        return await asyncio.gather(*[batcher.extract(text) for text in ("luke", "leia", "han")])
+
+    assert asyncio.run(run()) == [["LUKE"], ["LEIA"], ["HAN"]]
+    assert client.calls == [["luke", "leia", "han"]]
+
+
+def test_batches_are_split_at_max_documents():
+    client = FakeTextAnalyticsClient()
+    texts = [f"document {number}" for number in range(10)]
+
+    async def run():
+        batcher = create_batcher(client, window_ms=50, max_documents=4)
+        return await asyncio.gather(*[batcher.extract(text) for text in texts])
+
+    assert asyncio.run(run()) == [[text.upper()] for text in texts]
+    assert client.calls == [texts[:4], texts[4:8], texts[8:]]
+
+
+def test_document_errors_reach_only_their_callers():
+    client = FakeTextAnalyticsClient()
+
+    async def run():
+        batcher = create_batcher(client, window_ms=20)
+        return await asyncio.gather(*[batcher.extract(text) for text in ("luke", "error", "lost", "leia")],
+                                    return_exceptions=True)
+
+    luke, error, lost, leia = asyncio.run(run())
+    assert (luke, leia) == (["LUKE"], ["LEIA"])
+    assert isinstance(error, RuntimeError) and "InvalidDocument" in str(error)
+    assert isinstance(lost, RuntimeError) and "no result" in str(lost)
+    assert len(client.calls) == 1
+
+
+def test_failed_call_fails_every_document():
+    class UnavailableClient:
+        async def extract_key_phrases(self, documents, model_version=None):
+            raise ConnectionError("Azure unavailable")
+
+    async def run():
+        batcher = create_batcher(UnavailableClient(), window_ms=10)
+        return await asyncio.gather(batcher.extract("luke"), batcher.extract("leia"), return_exceptions=True)
+
+    assert [type(result) for result in asyncio.run(run())] == [ConnectionError, ConnectionError]
+
+
+def test_token_bucket_blocks_past_its_burst():
+    async def run():
+        bucket = TokenBucket(rate_per_second=20, capacity=2)
+        started = time.monotonic()
+        elapsed = []
+        for _ in range(4):
+            await bucket.acquire()
+            elapsed.append(time.monotonic() - started)
+        return elapsed
+
+    elapsed = asyncio.run(run())
+    # The burst is free, then one token every 50ms
+    assert elapsed[1] < 0.02
+    assert elapsed[2] == pytest.approx(0.05, abs=0.03)
+    assert elapsed[3] == pytest.approx(0.10, abs=0.04)
+
+
+def test_rate_limit_spaces_batches():
+    client = FakeTextAnalyticsClient()
+
+    async def run():
+        batcher = create_batcher(client, window_ms=1, max_documents=1, rate_limiter=TokenBucket(10, 1))
+        started = time.monotonic()
+        await asyncio.gather(batcher.extract("luke"), batcher.extract("leia"))
+        return time.monotonic() - started
+
+    assert asyncio.run(run()) >= 0.09
+    assert client.calls == [["luke"], ["leia"]]
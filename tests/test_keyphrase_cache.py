@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from services import keyphrase_service as keyphrase_module
+from services.keyphrase_service import keyphrase_service
+from services.redis_service import redis_service
+from tests.test_trending import FakeRedis
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    client = FakeRedis()
+    monkeypatch.setattr(redis_service, "redis_client", client)
+    monkeypatch.setattr(keyphrase_service, "cache_hits", 0)
+    monkeypatch.setattr(keyphrase_service, "cache_misses", 0)
+    return client
+
+
+@pytest.fixture
+def azure_calls(monkeypatch):
+    calls = []
+
+    async def get_azure_client():
+        return object()
+
+    async def call_azure(text, language):
+        calls.append((text, language))
+        return ["Luke Skywalker", "Tatooine"]
+
+    monkeypatch.setattr(keyphrase_service, "get_azure_client", get_azure_client)
+    monkeypatch.setattr(keyphrase_service, "_call_azure", call_azure)
+    return calls
+
+
+def test_equivalent_texts_share_a_cache_key():
+    key = keyphrase_service.get_extraction_cache_key("Luke Skywalker left Tatooine.", "es")
+
+    assert key.startswith("keyphrases:extract:")
+    assert keyphrase_service.get_extraction_cache_key("  luke   SKYWALKER\nleft\ttatooine. ", "es") == key
+    assert keyphrase_service.get_extraction_cache_key("Luke Skywalker left Coruscant.", "es") != key
+
+
+def test_language_and_extractor_are_part_of_the_key():
+    text = "Luke Skywalker left Tatooine."
+    key = keyphrase_service.get_extraction_cache_key(text, "es")
+
+    assert keyphrase_service.get_extraction_cache_key(text, "en") != key
+    assert keyphrase_service.get_extraction_cache_key(text, "es", keyphrase_service.local_extractor) != key
+    assert keyphrase_service.get_extraction_cache_key(text, "es", keyphrase_service.azure_extractor) == key
+
+
+def test_hits_skip_the_extractor(fake_redis, azure_calls):
+    async def run():
+        first = await keyphrase_service.extract_key_phrases_azure("Luke Skywalker left Tatooine.", "es")
+        second = await keyphrase_service.extract_key_phrases_azure("luke skywalker  left tatooine.", "es")
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert first == second == ["Luke Skywalker", "Tatooine"]
+    assert azure_calls == [("Luke Skywalker left Tatooine.", "es")]
+    assert (keyphrase_service.cache_hits, keyphrase_service.cache_misses) == (1, 1)
+    assert keyphrase_service.get_cache_stats()["hit_rate"] == 0.5
+
+
+def test_results_are_cached_with_the_configured_ttl(fake_redis, azure_calls, monkeypatch):
+    monkeypatch.setattr(keyphrase_module, "KEYPHRASE_CACHE_EXPIRATION_SECONDS", 3600)
+
+    asyncio.run(keyphrase_service.extract_key_phrases_azure("Luke Skywalker left Tatooine.", "es"))
+
+    key = keyphrase_service.get_extraction_cache_key("Luke Skywalker left Tatooine.", "es")
+    assert fake_redis.ttls == {key: 3600}
@@ -0,0 +1,68 @@
+import asyncio
+
+from services import keyphrase_service as keyphrase_module
+from services.keyphrase_service import keyphrase_service, merge_chunk_phrases, split_into_chunks
+
+SENTENCES = [f"Sentence {number} tells how Luke Skywalker left Tatooine with Obi-Wan Kenobi." for number in range(400)]
+
+
+def test_short_texts_are_not_split():
+    assert split_into_chunks("Luke uses the Force.", 5120) == ["Luke uses the Force."]
+
+
+def test_chunks_end_on_sentence_boundaries_within_the_limit():
+    text = " ".join(SENTENCES)
+    chunks = split_into_chunks(text, 5120)
+
+    assert len(text) > 5120 and len(chunks) > 1
+    assert all(len(chunk) <= 5120 for chunk in chunks)
+    assert all(chunk.endswith(".") for chunk in chunks)
+    assert " ".join(chunks) == text
+    # Chunks are filled: the next sentence would not have fit
+    assert all(len(chunk) + 1 + len(SENTENCES[0]) > 5120 for chunk in chunks[:-1])
+
+
+def test_long_sentences_are_cut_between_words():
+    words = [f"word{number}" for number in range(3000)]
+    chunks = split_into_chunks("Short opening. " + " ".join(words), 5120)
+
+    assert chunks[0] == "Short opening."
+    assert all(len(chunk) <= 5120 for chunk in chunks)
+    assert [word for chunk in chunks[1:] for word in chunk.split(" ")] == words
+
+
+def test_words_longer_than_the_limit_are_cut():
+    assert split_into_chunks("x" * 25, 10) == ["x" * 10, "x" * 10, "x" * 5]
+
+
+def test_merge_deduplicates_and_ranks_phrases_found_in_more_chunks_first():
+    merged = merge_chunk_phrases([
+        ["Tatooine", "the Force", "Luke"],
+        ["Death Star", "THE  FORCE", "Leia"],
+        ["Luke", "Leia", "the force"],
+    ])
+
+    # the Force: 3 chunks; Luke (best position 0) and Leia (best position 1): 2 chunks;
+    # then single-chunk phrases by position and first appearance
+    assert merged == ["the Force", "Luke", "Leia", "Tatooine", "Death Star"]
+    assert merge_chunk_phrases([]) == []
+
+
+def test_chunks_are_extracted_with_bounded_concurrency(monkeypatch):
+    monkeypatch.setattr(keyphrase_module, "KEYPHRASE_CHUNK_CONCURRENCY", 2)
+    running = []
+    peak = []
+
+    async def call_azure(text, language):
+        running.append(text)
+        peak.append(len(running))
+        await asyncio.sleep(0.01)
+        running.remove(text)
+        return [text.split()[0], "the Force"]
+
+    monkeypatch.setattr(keyphrase_service, "_call_azure", call_azure)
+    chunks = [f"Chunk{number} text." for number in range(6)]
+    merged = asyncio.run(keyphrase_service._extract_chunks(chunks, "en"))
+
+    assert max(peak) == 2
+    assert merged == ["the Force"] + [f"Chunk{number}" for number in range(6)]
@@ -0,0 +1,42 @@
+import json
+from services.keyphrase_extractors import LocalKeyphraseExtractor
+
+
+def test_local_extractor_splits_on_stopwords_and_punctuation():
+    extractor = LocalKeyphraseExtractor(vocabulary_path=None)
+    phrases = extractor.extract_sync("Luke Skywalker es un caballero Jedi de Tatooine.", "es")
+    assert "Luke Skywalker" in phrases
+    assert "caballero Jedi" in phrases
+    assert "Tatooine" in phrases
+    assert all(phrase.lower() not in ("es", "un", "de") for phrase in phrases)
+
+
+def test_local_extractor_uses_english_stopwords():
+    extractor = LocalKeyphraseExtractor(vocabulary_path=None)
+    phrases = extractor.extract_sync("The Death Star is a moon-sized battle station.", "en")
+    assert phrases[0] == "moon-sized battle station"
+    assert "Death Star" in phrases
+
+
+def test_local_extractor_empty_text():
+    extractor = LocalKeyphraseExtractor(vocabulary_path=None)
+    assert extractor.extract_sync("", "es") == []
+    assert extractor.extract_sync("de la y el", "es") == []
+
+
+def test_local_extractor_limits_results():
+    extractor = LocalKeyphraseExtractor(vocabulary_path=None, max_phrases=2)
+    phrases = extractor.extract_sync("Han Solo, Chewbacca, Leia, Yoda, Obi-Wan Kenobi", "es")
+    assert len(phrases) == 2
+
+
+def test_local_extractor_vocabulary_downweights_common_words(tmp_path):
+    vocabulary_path = tmp_path / "vocabulary.json"
+    extractor = LocalKeyphraseExtractor(vocabulary_path=None)
+    corpus = ["Jedi Luke", "Jedi Yoda", "Jedi Obi-Wan", "Sith Vader"]
+    extractor.save_vocabulary(str(vocabulary_path), corpus)
+
+    loaded = LocalKeyphraseExtractor(vocabulary_path=str(vocabulary_path))
+    assert json.loads(vocabulary_path.read_text())["documents"] == 4
+    assert loaded.idf["jedi"] < loaded.idf["sith"]
+    assert loaded.extract_sync("Jedi, Sith", "es") == ["Sith", "Jedi"]
@@ -0,0 +1,178 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from models.character import Character
+from models.eye_color import EyeColor
+from models.key_phrase import KeyPhrase
+from services import keyphrase_job_service as jobs
+from services.database import DatabaseService
+from services.keyphrase_job_service import JOB_QUEUE_KEY, KeyphraseJobService
+from services.keyphrase_service import keyphrase_service
+from services.redis_service import redis_service
+
+real_sleep = asyncio.sleep
+
+
+class FakeRedis:
+    """The few redis.asyncio commands the job queue uses, kept in memory"""
+
+    def __init__(self):
+        self.values = {}
+        self.lists = {}
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def setex(self, key, expiration, value):
+        self.values[key] = value
+
+    async def lpush(self, key, value):
+        self.lists.setdefault(key, []).insert(0, value)
+
+    async def brpop(self, key, timeout=0):
+        for _ in range(max(int(timeout * 100), 1)):
+            if self.lists.get(key):
+                return key, self.lists[key].pop()
+            await real_sleep(0.01)
+        return None
+
+
+@pytest.fixture
+def job_settings(monkeypatch):
+    monkeypatch.setattr(jobs, "KEYPHRASE_JOB_WORKERS", 1)
+    monkeypatch.setattr(jobs, "KEYPHRASE_JOB_MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(jobs, "KEYPHRASE_JOB_BACKOFF_SECONDS", 1)
+    delays = []
+
+    async def sleep(delay, *args, **kwargs):
+        delays.append(delay)
+        await real_sleep(0)
+
+    # Backoff delays are recorded instead of waited for
+    monkeypatch.setattr(jobs.asyncio, "sleep", sleep)
+    return delays
+
+
+def extract_with_failures(monkeypatch, failures):
+    calls = []
+
+    async def extract_key_phrases(text):
+        calls.append(text)
+        if len(calls) <= failures:
+            raise ConnectionError("Azure unavailable")
+        return ["the Force", "Jedi"]
+
+    monkeypatch.setattr(keyphrase_service, "extract_key_phrases", extract_key_phrases)
+    return calls
+
+
+async def create_service(tmp_path):
+    service = DatabaseService(f"sqlite:///{tmp_path / 'jobs.db'}", [])
+    await service.init_db()
+    async with service.SessionLocal() as db:
+        db.add(Character(name="Luke Skywalker"))
+        await db.commit()
+    return service
+
+
+async def run_job(tmp_path, character_id=1, backend="memory"):
+    """Submit one job, wait for it to finish and return its first and final status and the saved phrases"""
+    service = await create_service(tmp_path)
+    job_service = KeyphraseJobService()
+    job_service.backend = backend
+    await job_service.start(service.SessionLocal)
+    try:
+        submitted = await job_service.submit(character_id, "Luke uses the Force like a Jedi")
+        for _ in range(500):
+            job = await job_service.get_job(submitted["id"])
+            if job["status"] in ("completed", "failed"):
+                break
+            await real_sleep(0.01)
+        async with service.SessionLocal() as db:
+            phrases = (await db.execute(select(KeyPhrase.phrase).order_by(KeyPhrase.id))).scalars().all()
+        return submitted, job, phrases
+    finally:
+        await job_service.stop()
+        await service.dispose()
+
+
+def test_job_runs_to_completion(tmp_path, monkeypatch, job_settings):
+    extract_with_failures(monkeypatch, 0)
+    submitted, job, phrases = asyncio.run(run_job(tmp_path))
+
+    assert submitted["status"] == "queued" and "text" not in submitted
+    assert (job["status"], job["attempts"], job["phrases"], job["error"]) == ("completed", 1, ["the Force", "Jedi"], None)
+    assert phrases == ["the Force", "Jedi"]
+    assert job_settings == []
+
+
+def test_server_errors_are_retried_with_exponential_backoff(tmp_path, monkeypatch, job_settings):
+    calls = extract_with_failures(monkeypatch, 2)
+    _, job, phrases = asyncio.run(run_job(tmp_path))
+
+    assert (job["status"], job["attempts"]) == ("completed", 3)
+    assert len(calls) == 3
+    assert job_settings == [1, 2]
+    assert phrases == ["the Force", "Jedi"]
+
+
+def test_job_fails_after_the_last_attempt(tmp_path, monkeypatch, job_settings):
+    extract_with_failures(monkeypatch, 3)
+    _, job, phrases = asyncio.run(run_job(tmp_path))
+
+    assert (job["status"], job["attempts"], job["error"]) == ("failed", 3, "Azure unavailable")
+    assert job_settings == [1, 2]
+    assert phrases == []
+
+
+def test_client_errors_are_not_retried(tmp_path, monkeypatch, job_settings):
+    calls = extract_with_failures(monkeypatch, 0)
+    _, unknown_character, _ = asyncio.run(run_job(tmp_path, character_id=99))
+
+    async def reject(text):
+        raise HTTPException(status_code=400, detail="Document text is empty")
+
+    monkeypatch.setattr(keyphrase_service, "extract_key_phrases", reject)
+    _, invalid_text, _ = asyncio.run(run_job(tmp_path))
+
+    assert (unknown_character["status"], unknown_character["attempts"]) == ("failed", 1)
+    assert unknown_character["error"] == "Character not found"
+    assert (invalid_text["status"], invalid_text["attempts"], invalid_text["error"]) == ("failed", 1, "Document text is empty")
+    assert len(calls) == 1
+    assert job_settings == []
+
+
+def test_redis_backend_shares_queue_and_status(tmp_path, monkeypatch, job_settings):
+    extract_with_failures(monkeypatch, 0)
+    client = FakeRedis()
+    monkeypatch.setattr(redis_service, "redis_client", client)
+    submitted, job, phrases = asyncio.run(run_job(tmp_path, backend="redis"))
+
+    assert job["status"] == "completed"
+    assert f"keyphrases:jobs:{submitted['id']}" in client.values
+    assert client.lists[JOB_QUEUE_KEY] == []
+    assert phrases == ["the Force", "Jedi"]
+
+
+@pytest.mark.parametrize("connected", [True, False], ids=["redis", "no-redis"])
+def test_jobs_are_shared_through_redis_by_default(tmp_path, monkeypatch, connected):
+    monkeypatch.setattr(redis_service, "redis_client", FakeRedis() if connected else None)
+
+    async def run():
+        service = await create_service(tmp_path)
+        job_service = KeyphraseJobService()
+        await job_service.start(service.SessionLocal)
+        await job_service.stop()
+        await service.dispose()
+        return job_service.backend
+
+    assert asyncio.run(run()) == ("redis" if connected else "memory")
+
+
+def test_submit_without_workers_is_rejected():
+    with pytest.raises(HTTPException) as rejected:
+        asyncio.run(KeyphraseJobService().submit(1, "text"))
+    assert rejected.value.status_code == 503
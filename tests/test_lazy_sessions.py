@@ -0,0 +1,60 @@
+import asyncio
+from types import SimpleNamespace
+
+from sqlalchemy import select
+
+from models.character import Character
+from models.eye_color import EyeColor
+from models.key_phrase import KeyPhrase
+from services.database import DatabaseService
+from services.sharding import database_dialect
+
+
+async def create_service(tmp_path):
+    service = DatabaseService(f"sqlite:///{tmp_path / 'lazy.db'}")
+    await service.init_db()
+    return service
+
+
+def test_session_is_created_on_first_use(tmp_path):
+    async def run():
+        service = await create_service(tmp_path)
+        try:
+            checkouts = service.engine.pool.metrics.checkouts
+            async for db in service.get_db():
+                unused = db
+            idle_checkouts = service.engine.pool.metrics.checkouts - checkouts
+
+            # Reading the dialect builds the session but checks out no connection
+            async for db in service.get_db():
+                bound = db
+                database_dialect(db)
+            bound_checkouts = service.engine.pool.metrics.checkouts - checkouts
+
+            async for db in service.get_db():
+                used = db
+                await db.execute(select(EyeColor.id))
+            return (unused.is_used, bound.is_used, idle_checkouts, bound_checkouts, used.is_used,
+                    service.pool_stats()["sessions"])
+        finally:
+            await service.dispose()
+
+    unused, bound, idle_checkouts, bound_checkouts, used, sessions = asyncio.run(run())
+    assert (unused, bound, idle_checkouts, bound_checkouts, used) == (False, False, 0, 0, True)
+    assert sessions == {"requests": 3, "requests_without_queries": 2, "unused_ratio": 2 / 3}
+
+
+def test_info_set_before_first_use_reaches_the_session(tmp_path):
+    async def run():
+        service = await create_service(tmp_path)
+        request_state = SimpleNamespace()
+        try:
+            async for db in service.get_db():
+                db.info["request_state"] = request_state
+                db.add(EyeColor(color="Green"))
+                await db.commit()
+            return getattr(request_state, "committed_write", False)
+        finally:
+            await service.dispose()
+
+    assert asyncio.run(run()) is True
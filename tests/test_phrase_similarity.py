@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from services.phrase_similarity import PhraseSimilarityIndex
+
+PHRASES = [
+    (1, "the Force"), (1, "Jedi"), (1, "lightsaber"), (1, "Tatooine"),
+    (2, "the Force"), (2, "Jedi"), (2, "lightsaber"),
+    (3, "the Force"), (3, "Sith"), (3, "lightsaber"),
+    (4, "Tatooine"), (4, "moisture farm"),
+    (5, "Sith"), (5, "Death Star"),
+    (6, "Kessel Run"),
+]
+
+
+def reference_scores(rows, character_id):
+    """Cosine similarity of smoothed TF-IDF vectors, computed densely"""
+    characters = sorted({row_character for row_character, _ in rows})
+    terms = sorted({phrase.lower() for _, phrase in rows})
+    matrix = np.zeros((len(characters), len(terms)))
+    for row_character, phrase in rows:
+        matrix[characters.index(row_character), terms.index(phrase.lower())] = 1
+    idf = np.log((1 + len(characters)) / (1 + matrix.sum(axis=0))) + 1
+    vectors = matrix * idf
+    query = vectors[characters.index(character_id)]
+    scores = vectors @ query / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query))
+    return {other: score for other, score in zip(characters, scores) if other != character_id and score > 0}
+
+
+def assert_same_results(index, expected_index, character_ids):
+    for character_id in character_ids:
+        got, expected = index.most_similar(character_id, 10), expected_index.most_similar(character_id, 10)
+        assert [other for other, _ in got] == [other for other, _ in expected]
+        assert [score for _, score in got] == pytest.approx([score for _, score in expected])
+
+
+def test_ranks_by_cosine_similarity():
+    index = PhraseSimilarityIndex()
+    index.build(PHRASES)
+
+    results = index.most_similar(1, limit=10)
+    expected = reference_scores(PHRASES, 1)
+    assert [character_id for character_id, _ in results] == sorted(expected, key=lambda other: -expected[other])
+    assert dict(results) == pytest.approx(expected)
+    assert [character_id for character_id, _ in index.most_similar(1, limit=2)] == [2, 3]
+    assert index.most_similar(6) == []
+    assert index.most_similar(99) == []
+
+
+def test_removed_characters_are_masked():
+    index = PhraseSimilarityIndex(compaction_ratio=1.0)
+    index.build(PHRASES)
+    index.remove(2)
+
+    remaining = [row for row in PHRASES if row[0] != 2]
+    assert 2 not in dict(index.most_similar(1))
+    assert index.most_similar(2) == []
+    assert dict(index.most_similar(1)) == pytest.approx(reference_scores(remaining, 1))
+
+
+def test_incremental_adds_match_a_full_build():
+    index = PhraseSimilarityIndex(initial_capacity=2)
+    index.build(PHRASES[:5])
+    for character_id, phrase in PHRASES[5:]:
+        index.add(character_id, [phrase, phrase.upper()])
+    full = PhraseSimilarityIndex()
+    full.build(PHRASES)
+
+    assert index.character_count == full.character_count
+    assert_same_results(index, full, range(1, 7))
+
+
+def test_compacts_once_enough_entries_are_masked():
+    index = PhraseSimilarityIndex(compaction_ratio=0.25)
+    index.build(PHRASES)
+    loaded_at = index.loaded_at
+    index.remove(5)
+    masked_size = index._size
+    index.remove(1)
+    remaining = [row for row in PHRASES if row[0] not in (1, 5)]
+    fresh = PhraseSimilarityIndex()
+    fresh.build(remaining)
+
+    # 2 of 15 entries masked stay in place; 6 of 15 trigger the compaction
+    assert masked_size == len(PHRASES)
+    assert index._size == len(remaining) and index._inactive == 0
+    assert 1 not in index.row_ids and "death star" not in index.term_ids
+    assert index.loaded_at == loaded_at
+    assert_same_results(index, fresh, [2, 3, 4, 6])
+    index.add(1, ["Jedi"])
+    assert 1 in dict(index.most_similar(2))
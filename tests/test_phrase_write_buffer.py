@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from models.character import Character
+from models.eye_color import EyeColor
+from models.key_phrase import KeyPhrase
+from services.character_service import character_service
+from services.database import DatabaseService
+from services.phrase_write_buffer import PhraseWriteBuffer, phrase_write_buffer
+
+
+async def create_service(tmp_path):
+    service = DatabaseService(f"sqlite:///{tmp_path / 'buffer.db'}", [])
+    await service.init_db()
+    async with service.SessionLocal() as db:
+        db.add_all([Character(name="Luke Skywalker"), Character(name="Leia Organa")])
+        await db.commit()
+    return service
+
+
+async def saved_phrases(service):
+    async with service.SessionLocal() as db:
+        result = await db.execute(select(KeyPhrase.character_id, KeyPhrase.phrase).order_by(KeyPhrase.id))
+        return result.all()
+
+
+def test_flushes_when_max_rows_are_pending(tmp_path):
+    async def run():
+        service = await create_service(tmp_path)
+        buffer = PhraseWriteBuffer(enabled=True, flush_ms=60000, max_rows=3)
+        buffer.start(service.SessionLocal)
+        try:
+            saved = await asyncio.wait_for(asyncio.gather(
+                buffer.add(1, "the Force", wait=True),
+                buffer.add(1, "lightsaber", wait=True),
+                buffer.add(2, "the Force", wait=True),
+            ), timeout=5)
+            return saved, await saved_phrases(service)
+        finally:
+            await buffer.stop()
+            await service.dispose()
+
+    saved, rows = asyncio.run(run())
+    assert [(row["character_id"], row["phrase"]) for row in saved] == [(1, "the Force"), (1, "lightsaber"), (2, "the Force")]
+    assert all(row["id"] is not None for row in saved)
+    assert rows == [(1, "the Force"), (1, "lightsaber"), (2, "the Force")]
+
+
+def test_flushes_on_the_timer(tmp_path):
+    async def run():
+        service = await create_service(tmp_path)
+        buffer = PhraseWriteBuffer(enabled=True, flush_ms=20, max_rows=100)
+        buffer.start(service.SessionLocal)
+        try:
+            await buffer.add(1, "the Force")
+            pending = await saved_phrases(service)
+            await asyncio.sleep(0.2)
+            return pending, await saved_phrases(service)
+        finally:
+            await buffer.stop()
+            await service.dispose()
+
+    pending, rows = asyncio.run(run())
+    assert pending == []
+    assert rows == [(1, "the Force")]
+
+
+def test_stop_flushes_pending_rows(tmp_path):
+    async def run():
+        service = await create_service(tmp_path)
+        buffer = PhraseWriteBuffer(enabled=True, flush_ms=60000, max_rows=100)
+        buffer.start(service.SessionLocal)
+        try:
+            await buffer.add(1, "the Force")
+            await buffer.add(2, "Alderaan")
+        finally:
+            await buffer.stop()
+        try:
+            return buffer.is_active, await saved_phrases(service)
+        finally:
+            await service.dispose()
+
+    active, rows = asyncio.run(run())
+    assert active is False
+    assert rows == [(1, "the Force"), (2, "Alderaan")]
+
+
+def test_waiting_for_the_flush_returns_the_row_or_409(tmp_path, monkeypatch):
+    monkeypatch.setattr(phrase_write_buffer, "enabled", True)
+
+    async def run():
+        service = await create_service(tmp_path)
+        phrase_write_buffer.start(service.SessionLocal)
+        try:
+            async for db in service.get_db():
+                saved = await character_service.add_character_phrase(db, 1, "The Force", wait_for_flush=True)
+                buffered = await character_service.add_character_phrase(db, 2, "Alderaan")
+                with pytest.raises(HTTPException) as duplicate:
+                    await character_service.add_character_phrase(db, 1, "  the   force ", wait_for_flush=True)
+                with pytest.raises(HTTPException) as missing:
+                    await character_service.add_character_phrase(db, 99, "Tatooine", wait_for_flush=True)
+            return saved, buffered, duplicate.value.status_code, missing.value.status_code, await saved_phrases(service)
+        finally:
+            await phrase_write_buffer.stop()
+            await service.dispose()
+
+    saved, buffered, duplicate, missing, rows = asyncio.run(run())
+    assert (saved["character_id"], saved["phrase"]) == (1, "The Force") and saved["id"] is not None
+    # Without waiting the row is not written yet, so it has no id
+    assert buffered == {"id": None, "character_id": 2, "phrase": "Alderaan"}
+    assert (duplicate, missing) == (409, 404)
+    assert sorted(rows) == [(1, "The Force"), (2, "Alderaan")]
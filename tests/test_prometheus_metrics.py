@@ -0,0 +1,53 @@
+import os
+import subprocess
+import sys
+
+from fastapi import FastAPI
+from prometheus_client import REGISTRY
+from starlette.requests import Request
+
+from services.prometheus_metrics import count_query, route_label, UNMATCHED_ROUTE
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def query_count(operation):
+    return REGISTRY.get_sample_value("db_queries_total", {"operation": operation}) or 0.0
+
+
+def test_queries_are_counted_by_operation():
+    before = {operation: query_count(operation) for operation in ("SELECT", "UPDATE", "OTHER")}
+    for statement in ("SELECT 1", "  select id FROM characters", "UPDATE characters SET name = ?", "PRAGMA query_only=ON"):
+        count_query(None, None, statement, (), None, False)
+
+    assert query_count("SELECT") - before["SELECT"] == 2
+    assert query_count("UPDATE") - before["UPDATE"] == 1
+    assert query_count("OTHER") - before["OTHER"] == 1
+
+
+def test_route_label_uses_the_route_template():
+    app = FastAPI()
+
+    @app.get("/character/{character_id}")
+    async def get_character(character_id: int):
+        return {}
+
+    def request(path, method="GET"):
+        return Request({"type": "http", "method": method, "path": path, "headers": [], "query_string": b"", "app": app})
+
+    # Not routed yet, as for requests the rate limiter answers
+    assert route_label(request("/character/42")) == "/character/{character_id}"
+    assert route_label(request("/character/42", "DELETE")) == UNMATCHED_ROUTE
+    assert route_label(request("/nowhere")) == UNMATCHED_ROUTE
+
+
+def test_multiprocess_mode_aggregates_workers(tmp_path):
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path), "PYTHONPATH": ROOT}
+    worker = "from services.prometheus_metrics import count_query; count_query(None, None, 'SELECT 1', (), None, False)"
+    for _ in range(2):
+        subprocess.run([sys.executable, "-c", worker], env=env, check=True, cwd=ROOT)
+    scrape = "from services.prometheus_metrics import render_metrics; print(render_metrics()[0].decode())"
+    output = subprocess.run([sys.executable, "-c", scrape], env=env, check=True, cwd=ROOT,
+                            capture_output=True, text=True).stdout
+
+    assert 'db_queries_total{operation="SELECT"} 2.0' in output
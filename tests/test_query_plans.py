@@ -0,0 +1,173 @@
+import asyncio
+import re
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from models.base import Base
+from models.character import Character
+from models.eye_color import EyeColor
+from models.key_phrase import KeyPhrase
+from schemas.character import CharacterQuery
+from services.character_service import character_service
+from services.database import DatabaseService
+from services.eye_color_service import eye_color_service
+from services.keyphrase_service import keyphrase_service
+from services.trending_service import trending_service
+
+# "SCAN <table>" with nothing after it means SQLite reads every row of the table;
+# index walks ("USING INDEX") and full-text lookups ("VIRTUAL TABLE") are fine
+FULL_SCAN = re.compile(r"^SCAN \w+$")
+
+
+class QueryRecorder:
+    """Records the statements sent to the database so their plans can be checked afterwards"""
+
+    def __init__(self, engine):
+        self.statements = []
+        self._allow_full_scans = False
+        event.listen(engine.sync_engine, "before_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+            self.statements.append((statement, parameters, self._allow_full_scans))
+
+    @contextmanager
+    def full_scans_allowed(self):
+        """Statements issued inside this block read whole tables on purpose"""
+        self._allow_full_scans = True
+        try:
+            yield
+        finally:
+            self._allow_full_scans = False
+
+
+async def explain(engine, statement, parameters):
+    async with engine.connect() as conn:
+        result = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        return [row[-1] for row in result.all()]
+
+
+async def full_scans(engine, recorder):
+    """(statement, plan) of every recorded statement that scans a table and was not allowed to"""
+    violations = []
+    for statement, parameters, allowed in recorder.statements:
+        if allowed:
+            continue
+        plan = await explain(engine, statement, parameters)
+        if any(FULL_SCAN.match(detail) for detail in plan):
+            violations.append((statement, plan))
+    return violations
+
+
+async def create_database(path, upgrade=False):
+    """Seeded database at path, created from the models or (upgrade) migrated from the schema already there"""
+    if upgrade:
+        service = DatabaseService(f"sqlite:///{path}", [])
+        await service.init_db()
+        await service.dispose()
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    if not upgrade:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    async with session_factory() as db:
+        eye_colors = [EyeColor(color=color) for color in ("Blue", "Brown", "Yellow")]
+        db.add_all(eye_colors)
+        await db.flush()
+        for number in range(60):
+            db.add(Character(
+                name=f"Character {number}", height=100 + number, mass=50 + number % 30,
+                hair_color=("Blond", "Brown", "Black")[number % 3], skin_color=("Fair", "Light")[number % 2],
+                eye_color_id=eye_colors[number % 3].id,
+            ))
+        await db.flush()
+        db.add_all([KeyPhrase(character_id=1, phrase="Use the force"), KeyPhrase(character_id=2, phrase="The force is strong")])
+        await db.commit()
+    return engine, session_factory
+
+
+async def exercise_services(session_factory, recorder):
+    async with session_factory() as db:
+        with recorder.full_scans_allowed():
+            # Whole-table reads: the unfiltered list and the in-process index builds
+            await character_service.get_all_characters(db)
+            await character_service.search_characters(db, "char")
+            await character_service.get_similar_by_phrases(db, 1)
+            await character_service.get_neighbors(db, 1)
+            await character_service.get_stats(db)
+            await character_service.load_snapshot(db)
+            await eye_color_service.get_all_eye_colors(db)
+            await trending_service.count_phrases(db, 10)
+
+        await character_service.get_character_by_name(db, "Character 1")
+        await character_service.search_characters(db, "character 1")
+        await character_service.get_similar_by_phrases(db, 1)
+        await character_service.get_neighbors(db, 1)
+        for params in (
+            {"eye_color_id": 1},
+            {"eye_color": "Brown"},
+            {"eye_color_id": 1, "height_gt": 120},
+            {"eye_color_id": 2, "mass_lt": 70, "sort": "-mass"},
+            {"height_gt": 110, "height_lt": 150},
+            {"hair_color": "Blond"},
+            {"skin_color": "Fair", "sort": "-id"},
+            {"sort": "name"},
+        ):
+            await character_service.list_characters(db, CharacterQuery(**params))
+        for sort in ("-height", "mass"):
+            # Cursor pages read the keyset ranges after the cursor, NULLs included
+            _, cursor = await character_service.list_characters(db, CharacterQuery(sort=sort, limit=5))
+            await character_service.list_characters(db, CharacterQuery(sort=sort, limit=5, cursor=cursor))
+        await character_service.update_character(db, 3, {
+            "name": "Character 3", "height": 150, "mass": 60,
+            "hair_color": "Black", "skin_color": "Fair", "eye_color_id": 2,
+        })
+        await character_service.patch_character(db, 4, {"height": 160})
+        await character_service.patch_character(db, 4, {"height": 160})
+        await character_service.delete_character(db, 10)
+        await character_service.get_character_with_phrases(db, 1)
+        await character_service.add_character_phrase(db, 3, "A new hope")
+        await eye_color_service.get_eye_color_by_id(db, 1)
+        await eye_color_service.get_eye_color_by_color(db, "Blue")
+        await keyphrase_service.get_keyphrases_by_character(db, 1)
+        await keyphrase_service.save_key_phrases_for_character(db, 2, ["Help me", "The force is strong"])
+        await keyphrase_service.search_key_phrases(db, "force")
+
+
+@pytest.mark.parametrize("upgrade", [False, True], ids=["created", "upgraded"])
+def test_service_queries_use_indexes(tmp_path, baseline_database, upgrade):
+    async def run():
+        # The upgraded database starts with the first release's schema and is migrated by init_db
+        path = baseline_database if upgrade else tmp_path / "plans.db"
+        engine, session_factory = await create_database(path, upgrade)
+        try:
+            recorder = QueryRecorder(engine)
+            await exercise_services(session_factory, recorder)
+            return await full_scans(engine, recorder)
+        finally:
+            await engine.dispose()
+
+    violations = asyncio.run(run())
+    assert not violations, "Queries falling back to a full table scan:\n" + "\n".join(
+        f"{statement}\n  -> {plan}" for statement, plan in violations
+    )
+
+
+@pytest.mark.parametrize("statement, index", [
+    ("SELECT id FROM characters WHERE eye_color_id = 1 ORDER BY id LIMIT 10", "ix_characters_eye_color_id_id"),
+    ("SELECT id, phrase FROM key_phrases WHERE character_id = 1", "(character_id=?)"),
+])
+def test_foreign_key_lookups_are_indexed(tmp_path, statement, index):
+    async def run():
+        engine, _ = await create_database(tmp_path / "plans.db")
+        try:
+            return await explain(engine, statement, ())
+        finally:
+            await engine.dispose()
+
+    plan = asyncio.run(run())
+    assert any(index in detail for detail in plan), plan
+    assert not any("TEMP B-TREE" in detail for detail in plan), plan
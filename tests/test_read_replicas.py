@@ -0,0 +1,115 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from models.base import Base
+from models.character import Character
+from models.eye_color import EyeColor
+from models.key_phrase import KeyPhrase
+from services import database
+from services.database import DatabaseService, issue_consistency_token, is_pinned_to_primary
+
+
+async def create_service(tmp_path, replica_count=1, strategy="round_robin"):
+    """Primary and replica SQLite files, each holding one eye color named after the database"""
+    replica_urls = [f"sqlite:///{tmp_path / f'replica{index}.db'}" for index in range(replica_count)]
+    for name in ["primary"] + [f"replica{index}" for index in range(replica_count)]:
+        # Replica engines are read-only, so the files are seeded with their own engine
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / f'{name}.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(EyeColor.__table__.insert().values(color=name))
+        await engine.dispose()
+    return DatabaseService(f"sqlite:///{tmp_path / 'primary.db'}", replica_urls, strategy)
+
+
+async def read_source(service, consistency_token=None):
+    sessions = service.get_read_db(consistency_token)
+    db = await sessions.__anext__()
+    try:
+        return (await db.execute(select(EyeColor.color))).scalar_one()
+    finally:
+        await sessions.aclose()
+
+
+def test_reads_go_to_replica_unless_pinned(tmp_path):
+    async def run():
+        service = await create_service(tmp_path)
+        try:
+            return (
+                await read_source(service),
+                await read_source(service, issue_consistency_token()),
+                await read_source(service, str(int((time.time() - 1) * 1000))),
+            )
+        finally:
+            await service.dispose()
+
+    assert asyncio.run(run()) == ("replica0", "primary", "replica0")
+
+
+def test_reads_use_primary_without_replicas(tmp_path, monkeypatch):
+    # The tuned SQLite profile would add a reader pool on the primary file
+    monkeypatch.setattr(database, "SQLITE_TUNED", False)
+
+    async def run():
+        service = await create_service(tmp_path, replica_count=0)
+        try:
+            return await read_source(service), len(service.replicas)
+        finally:
+            await service.dispose()
+
+    assert asyncio.run(run()) == ("primary", 0)
+
+
+def test_round_robin_alternates_replicas(tmp_path):
+    async def run():
+        service = await create_service(tmp_path, replica_count=2)
+        try:
+            return [await read_source(service) for _ in range(4)]
+        finally:
+            await service.dispose()
+
+    assert asyncio.run(run()) == ["replica0", "replica1", "replica0", "replica1"]
+
+
+def test_least_latency_prefers_fastest_replica(tmp_path):
+    async def run():
+        service = await create_service(tmp_path, replica_count=2, strategy="least_latency")
+        try:
+            await read_source(service)
+            await read_source(service)
+            service.replicas.latencies = [0.050, 0.001]
+            return [await read_source(service) for _ in range(2)], service.replicas.latencies
+        finally:
+            await service.dispose()
+
+    sources, latencies = asyncio.run(run())
+    assert sources == ["replica1", "replica1"]
+    assert latencies[0] == 0.050
+
+
+def test_commit_flags_request_state(tmp_path):
+    async def run():
+        service = await create_service(tmp_path)
+        request_state = SimpleNamespace()
+        try:
+            async for db in service.get_db():
+                db.info["request_state"] = request_state
+                await db.execute(select(EyeColor.id))
+                read_only = getattr(request_state, "committed_write", False)
+                db.add(EyeColor(color="Green"))
+                await db.commit()
+            return read_only, getattr(request_state, "committed_write", False)
+        finally:
+            await service.dispose()
+
+    assert asyncio.run(run()) == (False, True)
+
+
+def test_invalid_consistency_token_is_ignored():
+    assert not is_pinned_to_primary(None)
+    assert not is_pinned_to_primary("not-a-timestamp")
+    assert is_pinned_to_primary(issue_consistency_token())
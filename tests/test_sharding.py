@@ -0,0 +1,160 @@
+import asyncio
+
+import pytest
+from sqlalchemy import select
+
+from models.character import Character
+from models.eye_color import EyeColor
+from models.key_phrase import KeyPhrase
+from schemas.character import CharacterQuery
+from services.character_service import character_service
+from services.database import DatabaseService
+from services.eye_color_service import eye_color_service
+from services.keyphrase_service import keyphrase_service
+from services.sharding import ShardMap, rebalance
+
+
+async def create_service(tmp_path, shard_count):
+    service = DatabaseService(
+        f"sqlite:///{tmp_path / 'primary.db'}",
+        shard_urls=[f"sqlite:///{tmp_path / f'shard{index}.db'}" for index in range(shard_count)],
+    )
+    await service.init_db()
+    return service
+
+
+async def seed(service, count):
+    async with service.SessionLocal() as db:
+        eye_colors = [await eye_color_service.create_eye_color(db, {"color": color}) for color in ("Blue", "Brown")]
+        for number in range(count):
+            character = await character_service.create_character(db, {
+                "name": f"Character {number}", "height": 100 + number * 7 % 50, "mass": 50 + number % 20,
+                "hair_color": "Black", "skin_color": "Fair", "eye_color_id": eye_colors[number % 2].id,
+            })
+            await keyphrase_service.save_key_phrases_for_character(db, character.id, [f"phrase {number}", "the force"])
+
+
+async def placement(shards):
+    """Character ids and key phrase character ids stored on each shard"""
+    characters = await shards.execute_all(select(Character.id))
+    phrases = await shards.execute_all(select(KeyPhrase.character_id))
+    return [[row[0] for row in rows] for rows in characters], [[row[0] for row in rows] for rows in phrases]
+
+
+def assert_placed(shards, characters, phrases):
+    for shard, (character_ids, phrase_character_ids) in enumerate(zip(characters, phrases)):
+        assert all(shards.shard_map.shard_for(character_id) == shard for character_id in character_ids)
+        assert set(phrase_character_ids) <= set(character_ids)
+
+
+def test_hash_map_moves_only_keys_of_the_new_shard():
+    three, four = ShardMap(3), ShardMap(4)
+    ids = range(1, 4001)
+    moved = [character_id for character_id in ids if three.shard_for(character_id) != four.shard_for(character_id)]
+
+    assert {three.shard_for(character_id) for character_id in ids} == {0, 1, 2}
+    assert all(four.shard_for(character_id) == 3 for character_id in moved)
+    assert 0.2 < len(moved) / len(ids) < 0.3
+
+
+def test_range_map():
+    shard_map = ShardMap(3, "range", [100, 200])
+
+    assert [shard_map.shard_for(character_id) for character_id in (1, 99, 100, 199, 200, 10 ** 9)] == [0, 0, 1, 1, 2, 2]
+    with pytest.raises(ValueError):
+        ShardMap(3, "range", [200, 100])
+    with pytest.raises(ValueError):
+        ShardMap(3, "unknown")
+
+
+@pytest.mark.parametrize("shard_count", [0, 3], ids=["unsharded", "sharded"])
+def test_get_all_returns_dicts_with_or_without_shards(tmp_path, shard_count):
+    async def run():
+        service = await create_service(tmp_path, shard_count)
+        try:
+            await seed(service, 5)
+            async with service.SessionLocal() as db:
+                return await character_service.get_all(db), await eye_color_service.get_all(db)
+        finally:
+            await service.dispose()
+
+    characters, eye_colors = asyncio.run(run())
+
+    assert [character["id"] for character in characters] == [1, 2, 3, 4, 5]
+    assert characters[0] == {"id": 1, "name": "Character 0", "height": 100, "mass": 50, "hair_color": "Black",
+                             "skin_color": "Fair", "eye_color_id": 1}
+    assert eye_colors == [{"id": 1, "color": "Blue"}, {"id": 2, "color": "Brown"}]
+
+
+def test_reads_and_writes_are_routed_to_shards(tmp_path):
+    async def run():
+        service = await create_service(tmp_path, 3)
+        try:
+            await seed(service, 30)
+            characters, phrases = await placement(service.shards)
+            shard_eye_colors = await service.shards.execute_all(select(EyeColor.id, EyeColor.color))
+            async with service.SessionLocal() as db:
+                all_characters = await character_service.get_all_characters(db)
+                first_page, cursor = await character_service.list_characters(db, CharacterQuery(sort="-height", limit=7))
+                second_page, _ = await character_service.list_characters(
+                    db, CharacterQuery(sort="-height", limit=7, cursor=cursor)
+                )
+                offset_page, _ = await character_service.list_characters(db, CharacterQuery(eye_color="Brown", offset=3, limit=5))
+                await character_service.patch_character(db, 5, {"name": "Renamed"})
+                await character_service.delete_character(db, 6)
+                renamed = await character_service.get_character_with_phrases(db, 5)
+                matches = await keyphrase_service.search_key_phrases(db, "force", limit=4, offset=2)
+                after_delete, _ = await placement(service.shards)
+            return (characters, phrases, shard_eye_colors, all_characters, first_page + second_page,
+                    offset_page, renamed, matches, after_delete, service.shards)
+        finally:
+            await service.dispose()
+
+    (characters, phrases, shard_eye_colors, all_characters, pages, offset_page,
+     renamed, matches, after_delete, shards) = asyncio.run(run())
+
+    assert sorted(character_id for ids in characters for character_id in ids) == list(range(1, 31))
+    assert all(ids for ids in characters)
+    assert_placed(shards, characters, phrases)
+    assert all(sorted(rows) == [(1, "Blue"), (2, "Brown")] for rows in shard_eye_colors)
+
+    assert [character["id"] for character in all_characters] == list(range(1, 31))
+    by_height = sorted(all_characters, key=lambda character: (-character["height"], -character["id"]))
+    assert [character["id"] for character in pages] == [character["id"] for character in by_height[:14]]
+    brown = [character["id"] for character in all_characters if character["eye_color"] == "Brown"]
+    assert [character["id"] for character in offset_page] == brown[3:8]
+
+    assert renamed["name"] == "Renamed" and renamed["key_phrases"] == ["phrase 4", "the force"]
+    assert [match["phrase"] for match in matches] == ["the force"] * 4
+    assert 6 not in {character_id for ids in after_delete for character_id in ids}
+
+
+def test_rebalance_after_adding_a_shard(tmp_path):
+    async def run():
+        service = await create_service(tmp_path, 2)
+        try:
+            await seed(service, 40)
+        finally:
+            await service.dispose()
+
+        service = await create_service(tmp_path, 3)
+        try:
+            before, _ = await placement(service.shards)
+            moved = await rebalance(service.SessionLocal, service.shards, batch_size=4)
+            characters, phrases = await placement(service.shards)
+            moved_again = await rebalance(service.SessionLocal, service.shards)
+            new_shard_eye_colors = (await service.shards.execute_all(select(EyeColor.color)))[2]
+            return before, moved, characters, phrases, moved_again, new_shard_eye_colors, service.shards
+        finally:
+            await service.dispose()
+
+    before, moved, characters, phrases, moved_again, new_shard_eye_colors, shards = asyncio.run(run())
+
+    assert before[2] == []
+    assert moved["characters"] == len(characters[2]) > 0
+    assert moved["key_phrases"] == 2 * moved["characters"]
+    assert sorted(character_id for ids in characters for character_id in ids) == list(range(1, 41))
+    assert sum(len(ids) for ids in phrases) == 80
+    assert_placed(shards, characters, phrases)
+    assert moved_again == {"characters": 0, "key_phrases": 0}
+    assert sorted(color for (color,) in new_shard_eye_colors) == ["Blue", "Brown"]
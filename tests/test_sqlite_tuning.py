@@ -0,0 +1,101 @@
+import asyncio
+
+from sqlalchemy import select, text
+
+from models.base import Base
+from models.character import Character
+from models.eye_color import EyeColor
+from models.key_phrase import KeyPhrase
+from services import database
+from services.character_service import character_service
+from services.database import DatabaseService, issue_consistency_token
+from services.phrase_write_buffer import phrase_write_buffer
+
+
+async def create_service(tmp_path):
+    service = DatabaseService(f"sqlite:///{tmp_path / 'tuned.db'}", [])
+    await service.init_db()
+    return service
+
+
+def test_tuned_sqlite_pragmas_and_pools(tmp_path):
+    async def run():
+        service = await create_service(tmp_path)
+        try:
+            async with service.engine.connect() as conn:
+                writer = [(await conn.exec_driver_sql(f"PRAGMA {name}")).scalar() for name in
+                          ("journal_mode", "synchronous", "busy_timeout", "query_only")]
+            async with service.replicas.engines[0].connect() as conn:
+                reader = (await conn.exec_driver_sql("PRAGMA query_only")).scalar()
+            return writer, reader, service.pool_stats()
+        finally:
+            await service.dispose()
+
+    writer, reader, stats = asyncio.run(run())
+    # synchronous=NORMAL is 1
+    assert writer == ["wal", 1, 5000, 0]
+    assert reader == 1
+    assert stats["size"] == 1
+    assert stats["replicas"][0]["size"] == 8
+
+
+def test_readers_see_commits_without_pinning(tmp_path):
+    async def run():
+        service = await create_service(tmp_path)
+        try:
+            async for db in service.get_db():
+                db.add(EyeColor(color="Blue"))
+                await db.commit()
+            # The reader pool serves reads even right after a write, and sees the write
+            sessions = service.get_read_db(issue_consistency_token())
+            db = await sessions.__anext__()
+            try:
+                color = (await db.execute(select(EyeColor.color))).scalar_one()
+                engine = db.get_bind()
+            finally:
+                await sessions.aclose()
+            return color, engine is service.replicas.engines[0].sync_engine
+        finally:
+            await service.dispose()
+
+    assert asyncio.run(run()) == ("Blue", True)
+
+
+def test_reads_do_not_wait_for_the_writer(tmp_path):
+    async def run():
+        service = await create_service(tmp_path)
+        try:
+            async with service.engine.begin() as writer:
+                await writer.execute(EyeColor.__table__.insert().values(color="Pending"))
+                # The single writer connection holds an open write transaction; readers still answer
+                counts = []
+                for _ in range(3):
+                    async with service.replicas.engines[0].connect() as reader:
+                        counts.append((await reader.execute(text("SELECT count(*) FROM eye_colors"))).scalar())
+            return counts
+        finally:
+            await service.dispose()
+
+    assert asyncio.run(run()) == [0, 0, 0]
+
+
+def test_buffered_phrase_does_not_wait_on_the_request_connection(tmp_path, monkeypatch):
+    # A deadlock would otherwise only show up after the default 30s pool timeout
+    monkeypatch.setattr(database, "DB_POOL_TIMEOUT", 1)
+    monkeypatch.setattr(phrase_write_buffer, "enabled", True)
+
+    async def run():
+        service = await create_service(tmp_path)
+        phrase_write_buffer.start(service.SessionLocal)
+        try:
+            async for db in service.get_db():
+                db.add(Character(name="Luke Skywalker"))
+                await db.commit()
+                # The writer pool has a single connection, which the flush needs
+                return await character_service.add_character_phrase(db, 1, "The Force", wait_for_flush=True)
+        finally:
+            await phrase_write_buffer.stop()
+            await service.dispose()
+
+    saved = asyncio.run(run())
+    assert (saved["character_id"], saved["phrase"]) == (1, "The Force")
@@ -0,0 +1,215 @@
+import asyncio
+import calendar
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from models.character import Character
+from models.eye_color import EyeColor
+from models.key_phrase import KeyPhrase
+from services import trending_service as trending
+from services.character_service import character_service
+from services.database import DatabaseService
+from services.eye_color_service import eye_color_service
+from services.keyphrase_service import keyphrase_service
+from services.redis_service import redis_service
+from services.trending_service import trending_service
+
+# 2024-03-05 23:30 UTC
+NOW = calendar.timegm((2024, 3, 5, 23, 30, 0))
+PHRASES = {1: ["the Force", "Jedi", "Tatooine"], 2: ["The Force", "jedi"], 3: ["the force", "Sith"]}
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def __getattr__(self, name):
+        return lambda *args: self.commands.append((name, args))
+
+    async def execute(self):
+        for name, args in self.commands:
+            await getattr(self.client, name)(*args)
+
+
+class FakeRedis:
+    """The redis.asyncio commands the caches and trending counters use, kept in memory"""
+
+    def __init__(self):
+        self.values = {}
+        self.sorted_sets = {}
+        self.expirations = {}
+        self.ttls = {}
+        self.deleted = []
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def setex(self, key, expiration, value):
+        self.values[key] = value
+        self.ttls[key] = expiration
+
+    async def incr(self, key):
+        self.values[key] = int(self.values.get(key, 0)) + 1
+        return self.values[key]
+
+    async def delete(self, key):
+        self.deleted.append(key)
+        self.values.pop(key, None)
+        self.sorted_sets.pop(key, None)
+        self.expirations.pop(key, None)
+
+    async def zincrby(self, key, amount, member):
+        scores = self.sorted_sets.setdefault(key, {})
+        scores[member] = scores.get(member, 0) + amount
+
+    async def zadd(self, key, mapping):
+        self.sorted_sets.setdefault(key, {}).update(mapping)
+
+    async def zremrangebyscore(self, key, low, high):
+        scores = self.sorted_sets.get(key, {})
+        for member in [member for member, score in scores.items() if float(low) <= score <= float(high)]:
+            del scores[member]
+
+    async def expire(self, key, seconds):
+        self.expirations[key] = seconds
+
+    async def zrevrange(self, key, start, end, withscores=False):
+        ranked = sorted(self.sorted_sets.get(key, {}).items(), key=lambda item: (item[1], item[0]), reverse=True)
+        return [(member, float(score)) for member, score in ranked[start:end + 1]]
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    client = FakeRedis()
+    monkeypatch.setattr(redis_service, "redis_client", client)
+    # Freeze the clock the window buckets are taken from
+    monkeypatch.setattr(trending, "time", SimpleNamespace(time=lambda: NOW, gmtime=time.gmtime, strftime=time.strftime))
+    return client
+
+
+async def create_service(tmp_path):
+    service = DatabaseService(f"sqlite:///{tmp_path / 'trending.db'}")
+    await service.init_db()
+    async with service.SessionLocal() as db:
+        eye_color = await eye_color_service.create_eye_color(db, {"color": "Blue"})
+        for character_id, phrases in PHRASES.items():
+            await character_service.create_character(db, {
+                "name": f"Character {character_id}", "height": 170, "mass": 70, "hair_color": "Brown",
+                "skin_color": "Fair", "eye_color_id": eye_color.id,
+            })
+            await keyphrase_service.save_key_phrases_for_character(db, character_id, phrases)
+    return service
+
+
+def test_window_keys_are_utc_buckets():
+    assert trending_service.get_key("all") == "keyphrases:trending:all"
+    assert trending_service.get_key("hour", NOW) == "keyphrases:trending:hour:2024030523"
+    assert trending_service.get_key("day", NOW) == "keyphrases:trending:day:20240305"
+    # Half an hour later both buckets roll over
+    assert trending_service.get_key("hour", NOW + 1800) == "keyphrases:trending:hour:2024030600"
+    assert trending_service.get_key("day", NOW + 1800) == "keyphrases:trending:day:20240306"
+
+
+def test_saved_phrases_are_counted_in_every_window(tmp_path, fake_redis):
+    async def run():
+        service = await create_service(tmp_path)
+        try:
+            async with service.SessionLocal() as db:
+                return {window: await trending_service.get_trending(db, limit=2, window=window)
+                        for window in ("all", "hour", "day")}
+        finally:
+            await service.dispose()
+
+    results = asyncio.run(run())
+
+    expected = [{"phrase": "the force", "count": 3}, {"phrase": "jedi", "count": 2}]
+    assert results == {"all": expected, "hour": expected, "day": expected}
+    assert fake_redis.sorted_sets["keyphrases:trending:hour:2024030523"] == {
+        "the force": 3, "jedi": 2, "tatooine": 1, "sith": 1,
+    }
+    assert fake_redis.expirations == {
+        "keyphrases:trending:hour:2024030523": 2 * 3600, "keyphrases:trending:day:20240305": 2 * 86400,
+    }
+
+
+def test_deleted_characters_are_uncounted(tmp_path, fake_redis):
+    async def run():
+        service = await create_service(tmp_path)
+        try:
+            async with service.SessionLocal() as db:
+                # Duplicates are not inserted, so they are not counted either
+                await keyphrase_service.save_key_phrases_for_character(db, 3, ["THE FORCE", "Jedi"])
+                await character_service.delete_character(db, 1)
+                return await trending_service.get_trending(db, limit=10), await trending_service.count_phrases(db)
+        finally:
+            await service.dispose()
+
+    trending_phrases, stored_counts = asyncio.run(run())
+
+    counts = {row["phrase"]: row["count"] for row in trending_phrases}
+    assert counts == {row["phrase"]: row["count"] for row in stored_counts} == {"the force": 2, "jedi": 2, "sith": 1}
+    # The time windows keep counting the saves made during them
+    assert fake_redis.sorted_sets["keyphrases:trending:hour:2024030523"] == {
+        "the force": 3, "jedi": 3, "tatooine": 1, "sith": 1,
+    }
+
+
+def test_without_redis_all_time_counts_come_from_the_database(tmp_path):
+    async def run():
+        service = await create_service(tmp_path)
+        try:
+            async with service.SessionLocal() as db:
+                trending_phrases = await trending_service.get_trending(db, limit=3)
+                errors = []
+                for window in ("hour", "week"):
+                    try:
+                        await trending_service.get_trending(db, window=window)
+                    except HTTPException as e:
+                        errors.append(e.status_code)
+                try:
+                    await trending_service.rebuild(db)
+                except HTTPException as e:
+                    errors.append(e.status_code)
+            return trending_phrases, errors
+        finally:
+            await service.dispose()
+
+    assert redis_service.redis_client is None
+    trending_phrases, errors = asyncio.run(run())
+
+    # Ties are ordered by phrase
+    assert trending_phrases == [
+        {"phrase": "the force", "count": 3}, {"phrase": "jedi", "count": 2}, {"phrase": "sith", "count": 1},
+    ]
+    assert errors == [503, 400, 503]
+
+
+def test_rebuild_replaces_the_all_time_counters(tmp_path, fake_redis):
+    async def run():
+        service = await create_service(tmp_path)
+        fake_redis.sorted_sets["keyphrases:trending:all"].update({"the force": 40, "stale phrase": 7})
+        try:
+            async with service.SessionLocal() as db:
+                count = await trending_service.rebuild(db)
+                return count, await trending_service.get_trending(db, limit=10)
+        finally:
+            await service.dispose()
+
+    count, trending_phrases = asyncio.run(run())
+
+    assert count == 4
+    assert fake_redis.sorted_sets["keyphrases:trending:all"] == {"the force": 3, "jedi": 2, "sith": 1, "tatooine": 1}
+    assert [row["phrase"] for row in trending_phrases] == ["the force", "jedi", "tatooine", "sith"]
@@ -0,0 +1,35 @@
+# Stopword lists used by the local key phrase extractor
+
+SPANISH_STOPWORDS = frozenset("""
+a al algo algunas algunos ante antes como con contra cual cuales cuando de del desde donde durante
+e el ella ellas ello ellos en entre era erais eran eras eres es esa esas ese eso esos esta estaba
+estaban estado estais estamos estan estar estas este esto estos estoy fue fueron fui fuimos ha
+habia habian han has hasta hay la las le les lo los mas me mi mis mucho muchos muy nada ni no
+nos nosotras nosotros nuestra nuestras nuestro nuestros o os otra otras otro otros para pero
+poco por porque que quien quienes se sea sean ser si sido siempre sin sobre sois solo somos son
+soy su sus suya suyas suyo suyos tambien tanto te tenia tenian tener tengo ti tiene tienen todo
+todos tu tus un una unas uno unos vosotras vosotros vuestra vuestras vuestro vuestros y ya yo
+él ésta éste está están estás había habían más mí qué sí también tú tenía tenían sólo aún así
+cada cual cuál cuáles cómo dónde cuándo quién quiénes les muy entonces luego aunque mientras
+""".split())
+
+ENGLISH_STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being
+below between both but by can could did do does doing down during each few for from further
+had has have having he her here hers herself him himself his how i if in into is it its itself
+just me more most my myself no nor not now of off on once only or other our ours ourselves out
+over own same she should so some such than that the their theirs them themselves then there
+these they this those through to too under until up very was we were what when where which
+while who whom why will with would you your yours yourself yourselves also may might must
+shall upon us
+""".split())
+
+STOPWORDS_BY_LANGUAGE = {
+    "es": SPANISH_STOPWORDS,
+    "en": ENGLISH_STOPWORDS,
+}
+
+
+def get_stopwords(language: str) -> frozenset:
+    """Get the stopwords for a language, or the union of all lists for unknown languages"""
+    return STOPWORDS_BY_LANGUAGE.get(language, SPANISH_STOPWORDS | ENGLISH_STOPWORDS)